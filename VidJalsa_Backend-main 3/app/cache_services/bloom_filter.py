@@ -0,0 +1,35 @@
+import math
+
+
+class BloomFilter:
+    """
+    Bloom filter of hex SHA-256 keys.
+
+    The keys are already uniformly distributed, so the bit positions are derived from two 64-bit
+    slices of the key by double hashing instead of hashing it again.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        first, second = int(key[:16], 16), int(key[16:32], 16) | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, key: str, count: bool = True):
+        """
+        Adds a key to the filter. A key that will be added again later is added with `count=False`,
+        so it is counted once.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        if count:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+
+from app.cache_services.bloom_filter import BloomFilter
+from app.database import database_connection
+from app.database.cruds.deployment_crud import DeploymentCRUD
+
+DEPLOYMENT_FILTER_ENABLED = os.getenv('DEPLOYMENT_FILTER_ENABLED', 'true').lower() == 'true'
+DEPLOYMENT_FILTER_CAPACITY = int(os.getenv('DEPLOYMENT_FILTER_CAPACITY', '2000000'))
+DEPLOYMENT_FILTER_ERROR_RATE = float(os.getenv('DEPLOYMENT_FILTER_ERROR_RATE', '0.01'))
+# Seconds after which the deployments stored by other workers are read into the filter
+DEPLOYMENT_FILTER_SYNC_INTERVAL = float(os.getenv('DEPLOYMENT_FILTER_SYNC_INTERVAL', '5'))
+DEPLOYMENT_FILTER_BATCH_SIZE = int(os.getenv('DEPLOYMENT_FILTER_BATCH_SIZE', '50000'))
+
+
+class DeploymentFilter:
+    """
+    In-process negative cache of the reuse check, telling which video sets certainly have no deployment.
+
+    A Bloom filter holds the video set hash of every deployment. It is loaded at startup and then read
+    incrementally, by ascending ID, for the deployments stored by other workers since the last sync.
+    Those syncs run in the background, lookups keep answering from the current filter meanwhile.
+    A video set absent from the filter is new, and the reuse check skips the database. A video set in
+    the filter is looked up with an index seek, which also catches the rare false positive. While it
+    is not loaded, every lookup goes to the database.
+
+    A deployment stored by another worker within the last sync interval, or while a sync runs, can be
+    missed, as can one whose transaction committed after a deployment with a higher ID was read. The
+    unique index of `deployment_video_hash` keeps the deployment table consistent in those cases.
+    """
+
+    def __init__(self, deployment_crud: DeploymentCRUD, enabled: bool, capacity: int, error_rate: float,
+                 sync_interval: float, batch_size: int):
+        self.deployment_crud = deployment_crud
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = 0
+        self._loaded = False
+        self._rebuilding = None
+        self._sync_task = None
+        self._synced_at = 0.0
+        self._sync_lock = asyncio.Lock()
+        self._counters = {"lookups": 0, "skipped_db": 0, "db_lookups": 0, "false_positives": 0, "syncs": 0,
+                          "sync_failures": 0, "rebuilds": 0}
+
+    async def load(self):
+        """
+        Reads the video set hash of every stored deployment into the filter.
+        """
+        if self.enabled:
+            await self.sync(force=True)
+
+    async def sync(self, force: bool = False):
+        """
+        Reads the deployments stored since the last sync into the filter. A filter filled to its capacity is
+        rebuilt twice as large, and replaces the current one once it holds every deployment.
+
+        Parameters:
+        - force (bool): Sync even if the last sync is more recent than the sync interval.
+        """
+        async with self._sync_lock:
+            if not force and time.monotonic() - self._synced_at <= self.sync_interval:
+                # Synced by another lookup while this one waited for the lock
+                return
+            rebuilding = self._bloom.count >= self._bloom.capacity
+            bloom = BloomFilter(self._bloom.capacity * 2, self._bloom.error_rate) if rebuilding else self._bloom
+            last_id = 0 if rebuilding else self._last_id
+            self._rebuilding = bloom if rebuilding else None
+            try:
+                while True:
+                    rows = await asyncio.to_thread(self.deployment_crud.get_video_hashes, last_id, self.batch_size)
+                    for _, hash_value in rows:
+                        if hash_value is not None:
+                            bloom.add(hash_value)
+                    if rows:
+                        last_id = rows[-1][0]
+                    if not rebuilding:
+                        self._last_id = last_id
+                    if len(rows) < self.batch_size:
+                        break
+            except Exception as e:
+                self._counters["sync_failures"] += 1
+                print(f"Syncing the deployment filter failed: {e}")
+            else:
+                if rebuilding:
+                    self._bloom, self._last_id = bloom, last_id
+                    self._counters["rebuilds"] += 1
+                self._loaded = True
+                self._counters["syncs"] += 1
+            finally:
+                self._rebuilding = None
+                self._synced_at = time.monotonic()
+
+    def add(self, video_set: str):
+        """
+        Adds the video set hash of a deployment stored by this worker. It is not counted, the next sync reads
+        the deployment again and counts it then.
+        """
+        self._bloom.add(video_set, count=False)
+        if self._rebuilding is not None:
+            self._rebuilding.add(video_set, count=False)
+
+    async def might_exist(self, video_set: str) -> bool:
+        """
+        Returns whether a video set may have a deployment. False is certain, True has to be checked in the database.
+
+        Parameters:
+        - video_set (str): The hash of the sorted video IDs.
+
+        Returns:
+        - bool: False if the video set has no deployment.
+        """
+        self._counters["lookups"] += 1
+        if self.enabled and time.monotonic() - self._synced_at > self.sync_interval:
+            self._start_sync()
+        if not self.enabled or not self._loaded or video_set in self._bloom:
+            self._counters["db_lookups"] += 1
+            return True
+        self._counters["skipped_db"] += 1
+        return False
+
+    def _start_sync(self):
+        # A rebuild scans the whole table, so lookups never wait for a sync
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self.sync())
+
+    def record_false_positive(self):
+        """Counts a video set the filter reported but the database did not have."""
+        self._counters["false_positives"] += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the lookup counters, the measured false positive rate and the size of the filter.
+        """
+        return {
+            "enabled": self.enabled,
+            "loaded": self._loaded,
+            **self._counters,
+            "false_positive_rate": round(self._counters["false_positives"] / self._counters["db_lookups"], 4)
+            if self._counters["db_lookups"] else 0.0,
+            "entries": self._bloom.count,
+            "capacity": self._bloom.capacity,
+            "bytes": len(self._bloom.bits),
+            "hash_count": self._bloom.hash_count,
+        }
+
+
+deployment_filter = DeploymentFilter(DeploymentCRUD(database_connection), DEPLOYMENT_FILTER_ENABLED,
+                                     DEPLOYMENT_FILTER_CAPACITY, DEPLOYMENT_FILTER_ERROR_RATE,
+                                     DEPLOYMENT_FILTER_SYNC_INTERVAL, DEPLOYMENT_FILTER_BATCH_SIZE)
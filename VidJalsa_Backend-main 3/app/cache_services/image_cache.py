@@ -0,0 +1,77 @@
+import re
+import asyncio
+from app.database import database_connection
+from app.database.cruds.image_crud import ImageCRUD
+from app.cache_services.image_store import ImageStore, image_store
+from app.cache_services.single_flight import SingleFlight
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercases a topic and strips its punctuation and extra whitespace, so spellings of one topic share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.lower()).split())[:255]
+
+
+class ImageCache:
+    """
+    Cache of the generated blog images keyed by normalized topic and image prompt hash.
+
+    A miss generates the image, saves it in the local image store and records it in the
+    `generated_images` table, so later blogs on the same topic reuse the stored image instead of
+    paying for another generation. Concurrent misses on the same key share one generation.
+    """
+
+    def __init__(self, image_crud: ImageCRUD, store: ImageStore):
+        self.image_crud = image_crud
+        self.store = store
+        self._single_flight = SingleFlight()
+        self._counters = {"hits": 0, "misses": 0, "shared_generations": 0, "store_failures": 0}
+
+    async def get_or_generate(self, topic: str, prompt_hash: str, generate) -> tuple:
+        """
+        Returns the cached image of a topic, generating and storing it on a miss.
+
+        Parameters:
+        - topic (str): The topic of the blog.
+        - prompt_hash (str): The hash of the image prompt template.
+        - generate (callable): A function without arguments returning the awaitable image generation,
+          which resolves to the temporary URL of the generated image.
+
+        Returns:
+        - tuple: The image URL and whether it came from the cache.
+        """
+        key = (normalize_topic(topic), prompt_hash)
+        stored_image = await asyncio.to_thread(self.image_crud.get_by_key, *key)
+        if stored_image is not None:
+            self._counters["hits"] += 1
+            return stored_image.image_url, True
+
+        if self._single_flight.in_flight(key):
+            self._counters["shared_generations"] += 1
+        else:
+            self._counters["misses"] += 1
+        return await self._single_flight.do(key, lambda: self._generate_and_store(key, generate)), False
+
+    async def _generate_and_store(self, key: tuple, generate) -> str:
+        source_url = await generate()
+        try:
+            stored = await self.store.save_from_url(source_url)
+        except Exception as e:
+            # The provider URL still works for a while, so the blog is not failed over the store
+            print(f"Could not store the generated image, using the provider URL: {e}")
+            self._counters["store_failures"] += 1
+            return source_url
+        stored_image = await asyncio.to_thread(self.image_crud.add, *key, stored["image_hash"], stored["image_url"],
+                                               stored["variants"])
+        return stored_image.image_url
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the cache and the counters of the image store.
+        """
+        lookups = self._counters["hits"] + self._counters["misses"] + self._counters["shared_generations"]
+        hits = self._counters["hits"] + self._counters["shared_generations"]
+        return {**self._counters, "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "store": self.store.stats()}
+
+
+image_cache = ImageCache(ImageCRUD(database_connection), image_store)
@@ -0,0 +1,97 @@
+import io
+import os
+import hashlib
+import tempfile
+import asyncio
+
+import httpx
+from PIL import Image
+
+IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR', 'app/user/images')
+# The store lives under the app/user static mount, so this prefix serves the files
+IMAGE_STORE_URL_PREFIX = os.getenv('IMAGE_STORE_URL_PREFIX', '/app/user/images')
+IMAGE_STORE_WIDTHS = [int(width) for width in os.getenv('IMAGE_STORE_WIDTHS', '1024,512').split(',')]
+IMAGE_STORE_QUALITY = int(os.getenv('IMAGE_STORE_QUALITY', '80'))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv('IMAGE_DOWNLOAD_TIMEOUT', '30'))
+
+
+class ImageStore:
+    """
+    Content-addressed store of the blog images, served from the static mount.
+
+    Generated images are downloaded once from their temporary provider URL and saved as WebP variants
+    of the configured widths, named after the SHA-256 of the downloaded bytes. The same image is
+    therefore stored only once whatever blog or topic it is used for, and its files never change.
+    """
+
+    def __init__(self, directory: str, url_prefix: str, widths: list, quality: int, download_timeout: float):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.widths = sorted(widths, reverse=True)
+        self.quality = quality
+        self.download_timeout = download_timeout
+        self._counters = {"downloads": 0, "download_bytes": 0, "stored_images": 0, "already_stored": 0,
+                          "stored_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    async def save_from_url(self, source_url: str) -> dict:
+        """
+        Downloads an image and stores its variants.
+
+        Parameters:
+        - source_url (str): The temporary URL returned by the image provider.
+
+        Returns:
+        - dict: The SHA-256 of the image as "image_hash", the URL of the largest variant as "image_url",
+          and the URLs of every variant keyed by width as "variants".
+
+        Raises:
+        - httpx.HTTPError: If the download fails.
+        """
+        async with httpx.AsyncClient(timeout=self.download_timeout, follow_redirects=True) as http_client:
+            response = await http_client.get(source_url)
+            response.raise_for_status()
+        self._counters["downloads"] += 1
+        self._counters["download_bytes"] += len(response.content)
+        return await asyncio.to_thread(self._store, response.content)
+
+    def stats(self) -> dict:
+        """
+        Returns the download and storage counters of the store.
+        """
+        return {**self._counters, "widths": self.widths}
+
+    def _store(self, data: bytes) -> dict:
+        image_hash = hashlib.sha256(data).hexdigest()
+        # Spread the files over subdirectories so no directory grows too large
+        subdirectory = os.path.join(self.directory, image_hash[:2])
+        os.makedirs(subdirectory, exist_ok=True)
+
+        variants = {}
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            for width in self.widths:
+                file_name = f"{image_hash}_{width}.webp"
+                variants[str(width)] = f"{self.url_prefix}/{image_hash[:2]}/{file_name}"
+                path = os.path.join(subdirectory, file_name)
+                if os.path.exists(path):
+                    self._counters["already_stored"] += 1
+                    continue
+                variant = image.copy()
+                # Only ever downscale, and keep the aspect ratio
+                variant.thumbnail((width, width * image.height // image.width), Image.LANCZOS)
+                self._write(path, variant)
+                self._counters["stored_bytes"] += os.path.getsize(path)
+        self._counters["stored_images"] += 1
+        return {"image_hash": image_hash, "image_url": variants[str(self.widths[0])], "variants": variants}
+
+    def _write(self, path: str, image: Image.Image):
+        # Write to a temporary file first so the static server never serves a partial image
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as image_file:
+            image.save(image_file, format="WEBP", quality=self.quality, method=6)
+        os.replace(temporary_path, path)
+
+
+image_store = ImageStore(IMAGE_STORE_DIR, IMAGE_STORE_URL_PREFIX, IMAGE_STORE_WIDTHS, IMAGE_STORE_QUALITY,
+                         IMAGE_DOWNLOAD_TIMEOUT)
@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from app.cache_services.single_flight import SingleFlight
+
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '900'))
+SEARCH_CACHE_STALE_TTL = int(os.getenv('SEARCH_CACHE_STALE_TTL', '3600'))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000'))
+# Video durations never change, so they are kept much longer than search results, one entry per video
+VIDEO_DETAILS_CACHE_TTL = int(os.getenv('VIDEO_DETAILS_CACHE_TTL', str(7 * 24 * 3600)))
+VIDEO_DETAILS_CACHE_MAX_ENTRIES = int(os.getenv('VIDEO_DETAILS_CACHE_MAX_ENTRIES', '20000'))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a search query and collapses its whitespace, so spellings of one query share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    In-process cache of YouTube API responses with stale-while-revalidate.
+
+    Entries younger than the TTL are served as they are. Entries past the TTL but still within the
+    stale window are served immediately while one background call refreshes them. Older entries
+    and misses are fetched in the foreground, and concurrent fetches of the same key share one call.
+    The cache is an LRU bounded by its number of entries.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int, stale_seconds: int, max_entries: int):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._single_flight = SingleFlight()
+        self._refresh_tasks = {}
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_failures": 0,
+                          "evictions": 0}
+
+    async def get_or_fetch(self, key: tuple, fetch, revalidate: bool = True):
+        """
+        Returns the cached value of a key, fetching it when it is missing or too old.
+
+        Parameters:
+        - key (tuple): The normalized request, e.g. ("search", query, max_results).
+        - fetch (callable): A function without arguments returning the awaitable API call.
+        - revalidate (bool): Whether a stale entry triggers a background refresh.
+
+        Returns:
+        - The cached or freshly fetched value.
+
+        Raises:
+        - Exception: The error of the fetch, when no usable entry is cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return value
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self._counters["stale_hits"] += 1
+                if revalidate:
+                    self._refresh_in_background(key, fetch)
+                return value
+
+        self._counters["misses"] += 1
+        return await self._single_flight.do(key, lambda: self._fetch_and_store(key, fetch))
+
+    def peek(self, key: tuple, max_age: float = None):
+        """
+        Returns the cached value of a key, or None, without ever fetching it.
+
+        Parameters:
+        - key (tuple): The normalized request.
+        - max_age (float): The oldest entry to return in seconds, any age if None.
+        """
+        entry = self._entries.get(key)
+        age = time.time() - entry[0] if entry is not None else None
+        if entry is None or (max_age is not None and age > max_age):
+            self._counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters["stale_hits" if age > self.ttl_seconds else "hits"] += 1
+        return entry[1]
+
+    def put(self, key: tuple, value):
+        """Stores a value fetched outside of `get_or_fetch`, e.g. one item of a batched call."""
+        self._store(key, value)
+
+    def _refresh_in_background(self, key: tuple, fetch):
+        if key in self._refresh_tasks or self._single_flight.in_flight(key):
+            return
+        self._counters["refreshes"] += 1
+        self._refresh_tasks[key] = asyncio.create_task(self._refresh(key, fetch))
+        self._refresh_tasks[key].add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+
+    async def _refresh(self, key: tuple, fetch):
+        try:
+            await self._single_flight.do(key, lambda: self._fetch_and_store(key, fetch))
+        except Exception as e:
+            # The stale entry keeps being served until it leaves the stale window
+            self._counters["refresh_failures"] += 1
+            print(f"{self.name} cache: refreshing {key} failed: {e}")
+
+    async def _fetch_and_store(self, key: tuple, fetch):
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def _store(self, key: tuple, value):
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the cache and its number of entries.
+        """
+        hits = self._counters["hits"] + self._counters["stale_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "coalesced_fetches": self._single_flight.stats()["shared"],
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+search_cache = SearchCache("search", SEARCH_CACHE_TTL, SEARCH_CACHE_STALE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+video_details_cache = SearchCache("video_details", VIDEO_DETAILS_CACHE_TTL, 0, VIDEO_DETAILS_CACHE_MAX_ENTRIES)
@@ -0,0 +1,109 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls of the same key into one.
+
+    The first caller of a key starts the operation, callers arriving while it runs wait for the same
+    result instead of starting their own. A caller that is cancelled does not cancel the shared
+    operation for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._counters = {"calls": 0, "shared": 0}
+
+    async def do(self, key, operation):
+        """
+        Runs `operation` for `key` unless a call of the same key is already running, and returns its result.
+
+        Parameters:
+        - key: Any hashable value identifying the call.
+        - operation (callable): A function without arguments returning the awaitable to run.
+
+        Returns:
+        - The result of the operation.
+
+        Raises:
+        - Exception: The error of the operation, raised to every caller sharing it.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self._counters["shared"] += 1
+            return await asyncio.shield(future)
+
+        self._counters["calls"] += 1
+        future = asyncio.ensure_future(operation())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return await asyncio.shield(future)
+
+    def in_flight(self, key) -> bool:
+        """Returns whether a call of the given key is running."""
+        return key in self._calls
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark the error as retrieved even if every caller was cancelled meanwhile
+            future.exception()
+
+    def stats(self) -> dict:
+        """
+        Returns the number of calls started and shared, and the calls currently running.
+        """
+        return {**self._counters, "in_flight": len(self._calls)}
+
+
+class RefCountedSingleFlight(SingleFlight):
+    """
+    Coalesces concurrent calls of the same key into one, cancelling it once nobody waits for it anymore.
+
+    Like SingleFlight, a caller that is cancelled does not cancel the shared operation while other
+    callers still wait for it. When the last one is cancelled, the operation is cancelled too instead
+    of running for nobody, and the next call of the key starts a new one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._waiters = {}
+        self._counters["cancelled"] = 0
+
+    async def do(self, key, operation):
+        """
+        Runs `operation` for `key` unless a call of the same key is already running, and returns its result.
+
+        Parameters:
+        - key: Any hashable value identifying the call.
+        - operation (callable): A function without arguments returning the awaitable to run.
+
+        Returns:
+        - The result of the operation.
+
+        Raises:
+        - Exception: The error of the operation, raised to every caller sharing it.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            self._counters["calls"] += 1
+            future = asyncio.ensure_future(operation())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+        else:
+            self._counters["shared"] += 1
+
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    self._counters["cancelled"] += 1
+                    future.cancel()
+                    # Forget it right away, a task being cancelled is not done yet and must not be joined
+                    if self._calls.get(key) is future:
+                        del self._calls[key]
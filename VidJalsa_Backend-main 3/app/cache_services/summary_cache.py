@@ -0,0 +1,66 @@
+import asyncio
+from app.database import database_connection
+from app.database.cruds.summary_crud import SummaryCRUD
+
+
+class SummaryCache:
+    """
+    Cache of per-video transcript summaries stored in the `video_summaries` table.
+
+    Entries are keyed by (video ID, prompt template hash, model), so a summary produced for one
+    combination of videos is reused by any later combination containing the same video, by every
+    worker, and across restarts. The model is the one whose answer the summary router kept, so
+    summaries of a hedged provider are told apart from those of the primary one.
+    """
+
+    def __init__(self, summary_crud: SummaryCRUD):
+        self.summary_crud = summary_crud
+        self._counters = {"hits": 0, "misses": 0, "writes": 0}
+
+    async def get_many(self, video_ids: list, prompt_hash: str, models: list) -> dict:
+        """
+        Looks up the cached summaries of several videos in a single query.
+
+        Parameters:
+        - video_ids (list): The YouTube video IDs.
+        - prompt_hash (str): The hash of the prompt templates.
+        - models (list): The names of the summarization models whose summaries are accepted, preferred first.
+
+        Returns:
+        - dict: The cached summaries keyed by video ID. Videos without a cached summary are left out.
+        """
+        video_ids = [video_id for video_id in video_ids if video_id]
+        if not video_ids:
+            return {}
+        rows = await asyncio.to_thread(self.summary_crud.get_many, video_ids, prompt_hash, models)
+        # A video summarized by several models keeps the summary of the most preferred one
+        rows = sorted(rows, key=lambda row: models.index(row.model), reverse=True)
+        summaries = {row.video_id: row.summary for row in rows}
+        self._counters["hits"] += len(summaries)
+        self._counters["misses"] += len(set(video_ids) - set(summaries))
+        return summaries
+
+    async def set(self, video_id: str, prompt_hash: str, model: str, summary: str):
+        """
+        Stores the summary of a video.
+
+        Parameters:
+        - video_id (str): The YouTube video ID.
+        - prompt_hash (str): The hash of the prompt templates.
+        - model (str): The name of the summarization model.
+        - summary (str): The summary text.
+        """
+        if not video_id or not summary:
+            return
+        await asyncio.to_thread(self.summary_crud.add, video_id, prompt_hash, model, summary)
+        self._counters["writes"] += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the cache.
+        """
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {**self._counters, "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0}
+
+
+summary_cache = SummaryCache(SummaryCRUD(database_connection))
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import time
+import zlib
+import asyncio
+from collections import OrderedDict
+
+TRANSCRIPT_CACHE_DIR = os.getenv('TRANSCRIPT_CACHE_DIR', 'app/cache/transcripts')
+TRANSCRIPT_CACHE_MEMORY_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', str(30 * 24 * 3600)))
+# Budget of the files on disk, enforced by a sweep that also removes the expired ones
+TRANSCRIPT_CACHE_DISK_BYTES = int(os.getenv('TRANSCRIPT_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
+TRANSCRIPT_CACHE_SWEEP_INTERVAL = int(os.getenv('TRANSCRIPT_CACHE_SWEEP_INTERVAL', '3600'))
+
+
+class TranscriptCache:
+    """
+    Two-tier cache of YouTube transcripts keyed by video ID.
+
+    Transcripts are stored as zlib-compressed JSON. The first tier is an in-process LRU bounded by
+    the total size of the compressed entries, the second tier is one file per video on disk, so
+    cached transcripts survive restarts and are shared by every worker on the host. Entries older
+    than the TTL are treated as misses in both tiers, and an expired file is deleted when it is read.
+
+    The disk tier is bounded by a byte budget. A periodic sweep deletes the expired files and, while
+    the remaining ones exceed the budget, the oldest ones. Writes that push the size measured by the
+    last sweep over the budget start a sweep right away instead of waiting for the next one.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int, ttl_seconds: int, max_disk_bytes: int,
+                 sweep_interval: int):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_interval = sweep_interval
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._runner = None
+        self._sweep_task = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0,
+                          "sweeps": 0, "disk_expired_removed": 0, "disk_evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    async def start(self):
+        """
+        Starts the periodic sweep of the disk tier.
+        """
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """
+        Stops the periodic sweep of the disk tier, interrupting the current one.
+        """
+        for task in (self._runner, self._sweep_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._runner = None
+        self._sweep_task = None
+
+    async def get(self, video_id: str):
+        """
+        Returns the cached transcript of a video, or None on a miss.
+
+        Parameters:
+        - video_id (str): The YouTube video ID.
+
+        Returns:
+        - list: The transcript segments, or None if the video is not cached or the entry expired.
+        """
+        entry = self._memory.get(video_id)
+        if entry is not None:
+            stored_at, data = entry
+            if not self._is_expired(stored_at):
+                self._memory.move_to_end(video_id)
+                self._counters["memory_hits"] += 1
+                return self._decode(data)
+            self._discard_from_memory(video_id)
+            self._counters["expired"] += 1
+
+        entry = await asyncio.to_thread(self._read_from_disk, video_id)
+        if entry is not None:
+            stored_at, data = entry
+            if not self._is_expired(stored_at):
+                self._store_in_memory(video_id, stored_at, data)
+                self._counters["disk_hits"] += 1
+                return self._decode(data)
+            await asyncio.to_thread(self._remove_expired_from_disk, video_id)
+            self._counters["expired"] += 1
+
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, video_id: str, transcript: list):
+        """
+        Stores a transcript in both tiers.
+
+        Parameters:
+        - video_id (str): The YouTube video ID.
+        - transcript (list): The transcript segments.
+        """
+        stored_at = time.time()
+        data = zlib.compress(json.dumps(transcript, separators=(",", ":")).encode("utf-8"))
+        self._store_in_memory(video_id, stored_at, data)
+        await asyncio.to_thread(self._write_to_disk, video_id, stored_at, data)
+        self._counters["writes"] += 1
+        # Overwritten entries are counted twice until the next sweep, which only makes it come earlier
+        self._disk_bytes += len(data)
+        if self._disk_bytes > self.max_disk_bytes and (self._sweep_task is None or self._sweep_task.done()):
+            self._sweep_task = asyncio.create_task(self.sweep())
+
+    async def sweep(self) -> dict:
+        """
+        Deletes the expired files of the disk tier, then the oldest ones until it fits the byte budget.
+
+        Returns:
+        - dict: The number of files removed and the bytes left on disk.
+        """
+        expired, evicted, disk_bytes = await asyncio.to_thread(self._sweep_disk)
+        self._disk_bytes = disk_bytes
+        self._counters["sweeps"] += 1
+        self._counters["disk_expired_removed"] += expired
+        self._counters["disk_evictions"] += evicted
+        return {"expired_removed": expired, "evicted": evicted, "disk_bytes": disk_bytes}
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the current memory usage of the cache.
+        """
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "disk_bytes": self._disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    @staticmethod
+    def _decode(data: bytes) -> list:
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def _store_in_memory(self, video_id: str, stored_at: float, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        self._discard_from_memory(video_id)
+        self._memory[video_id] = (stored_at, data)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_id, (_, evicted_data) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted_data)
+            self._counters["evictions"] += 1
+
+    def _discard_from_memory(self, video_id: str):
+        entry = self._memory.pop(video_id, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+
+    def _path(self, video_id: str) -> str:
+        # Video IDs come from user supplied URLs, anything that is not a plain ID is hashed
+        file_name = video_id if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", video_id) else hashlib.sha1(video_id.encode()).hexdigest()
+        return os.path.join(self.directory, f"{file_name}.json.z")
+
+    def _read_from_disk(self, video_id: str):
+        try:
+            with open(self._path(video_id), "rb") as cache_file:
+                return os.fstat(cache_file.fileno()).st_mtime, cache_file.read()
+        except OSError:
+            return None
+
+    def _write_to_disk(self, video_id: str, stored_at: float, data: bytes):
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as cache_file:
+            cache_file.write(data)
+        os.utime(temporary_path, (stored_at, stored_at))
+        os.replace(temporary_path, self._path(video_id))
+
+    def _remove_expired_from_disk(self, video_id: str):
+        # Another worker may have rewritten the entry since it was read, only a still expired file is removed
+        path = self._path(video_id)
+        try:
+            if self._is_expired(os.stat(path).st_mtime):
+                os.remove(path)
+        except OSError:
+            pass
+
+    def _sweep_disk(self):
+        expired = evicted = 0
+        entries = []
+        for directory_entry in os.scandir(self.directory):
+            try:
+                file_stat = directory_entry.stat()
+                if directory_entry.name.endswith(".tmp"):
+                    # Leftover of a write interrupted by a crash, a live one is never this old
+                    if time.time() - file_stat.st_mtime > 3600:
+                        os.remove(directory_entry.path)
+                    continue
+                if not directory_entry.name.endswith(".json.z"):
+                    continue
+                if self._is_expired(file_stat.st_mtime):
+                    os.remove(directory_entry.path)
+                    expired += 1
+                    continue
+            except OSError:
+                # Removed or replaced by another worker meanwhile
+                continue
+            entries.append((file_stat.st_mtime, file_stat.st_size, directory_entry.path))
+
+        disk_bytes = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except OSError:
+                pass
+            disk_bytes -= size
+        return expired, evicted, disk_bytes
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Sweeping the transcript cache failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+
+transcript_cache = TranscriptCache(TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MEMORY_BYTES, TRANSCRIPT_CACHE_TTL,
+                                   TRANSCRIPT_CACHE_DISK_BYTES, TRANSCRIPT_CACHE_SWEEP_INTERVAL)
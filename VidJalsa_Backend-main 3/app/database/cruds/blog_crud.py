@@ -20,7 +20,8 @@ class BlogCRUD(ICRUD):
         """
         self.db = db
 
-    def add(self, author_id: int, title: str, question: str, paragraphs: list, image_url: str) -> Blog:
+    def add(self, author_id: int, title: str, question: str, paragraphs: list, image_url: str,
+            pending_image_deployments: list = None) -> Blog:
         """
         Adds a new blog to the database.
 
@@ -29,12 +30,14 @@ class BlogCRUD(ICRUD):
             title (str): The title of the blog.
             question (str): The question associated with the blog.
             paragraphs (list): A list of paragraphs for the blog.
+            pending_image_deployments (list): The deployments published with the placeholder image, if any.
 
         Returns:
             Blog: The newly created blog object.
         """
         session: Session = self.db.get_session()
-        new_blog = Blog(user_id=author_id, title=title, question=question, paragraphs=paragraphs,image_url=image_url)
+        new_blog = Blog(user_id=author_id, title=title, question=question, paragraphs=paragraphs,image_url=image_url,
+                        pending_image_deployments=pending_image_deployments)
         session.add(new_blog)
         session.commit()
         print(new_blog.id)
@@ -59,6 +62,64 @@ class BlogCRUD(ICRUD):
         finally:
             self.db.close_session(session)
 
+    def add_pending_image_deployment(self, blog_id: int, deployment_name: str, placeholder_url: str) -> bool:
+        """
+        Records a deployment published with the placeholder image, if the blog still waits for its image.
+        The blog row is locked, so the worker storing the image either sees the deployment or has stored
+        the image before.
+
+        Args:
+            blog_id (int): The ID of the blog.
+            deployment_name (str): The name of the deployment directory.
+            placeholder_url (str): The URL of the placeholder image.
+
+        Returns:
+            bool: True if the deployment was recorded, False if the image was stored meanwhile.
+        """
+        session: Session = self.db.get_session()
+        try:
+            blog = session.query(Blog).filter(Blog.id == blog_id).with_for_update().first()
+            if blog is None or blog.image_url != placeholder_url:
+                session.rollback()
+                return False
+            blog.pending_image_deployments = (blog.pending_image_deployments or []) + [deployment_name]
+            session.commit()
+            return True
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def take_pending_image_deployments(self, blog_id: int, image_url: str = None) -> list:
+        """
+        Stores the image of a blog, if given, and clears the deployments waiting for it, in one locked update.
+
+        Args:
+            blog_id (int): The ID of the blog.
+            image_url (str): The generated image, None if its generation failed.
+
+        Returns:
+            list: The names of the deployments published with the placeholder image.
+        """
+        session: Session = self.db.get_session()
+        try:
+            blog = session.query(Blog).filter(Blog.id == blog_id).with_for_update().first()
+            if blog is None:
+                session.rollback()
+                return []
+            deployment_names = list(blog.pending_image_deployments or [])
+            if image_url is not None:
+                blog.image_url = image_url
+            blog.pending_image_deployments = None
+            session.commit()
+            return deployment_names
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
     def update(self, blog_id: int, **kwargs) -> Blog:
         """
         Updates a blog in the database.
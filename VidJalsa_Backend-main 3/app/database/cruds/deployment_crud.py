@@ -1,4 +1,4 @@
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.orm import Session
 
 from app.database.database import AbstractDatabase
@@ -19,25 +19,42 @@ class DeploymentCRUD(ICRUD):
         """
         self.db = db
 
-    def add(self, deployment_name: str, deployment_video: str, user_id: int, blog_id: int) -> Deployments:
+    def add(self, deployment_name: str, deployment_video: str, user_id: int, blog_id: int,
+            deployment_video_hash: str = None) -> Deployments:
         """
-        Add a new deployment to the database.
+        Add a new deployment to the database. If another worker stored a deployment of the same video set first,
+        the stored deployment is returned instead.
 
         Args:
         - deployment_name: The name of the deployment.
         - deployment_video: The video of the deployment.
         - user_id: The ID of the user associated with the deployment.
         - blog_id: The ID of the blog associated with the deployment.
+        - deployment_video_hash: The hash of the sorted video IDs.
 
         Returns:
-        - The newly created Deployments object.
+        - The stored Deployments object.
+
+        Raises:
+        - IntegrityError: If the insert conflicts with a deployment that no longer exists once it is looked up.
         """
         session: Session = self.db.get_session()
-        new_deployment = Deployments(deployment_name=deployment_name, deployment_video=deployment_video, user_id=user_id, blog_id=blog_id)
+        new_deployment = Deployments(deployment_name=deployment_name, deployment_video=deployment_video, user_id=user_id, blog_id=blog_id,
+                                     deployment_video_hash=deployment_video_hash)
         try:
             session.add(new_deployment)
             session.commit()
+            session.refresh(new_deployment)
             return new_deployment
+        except IntegrityError as e:
+            session.rollback()
+            if deployment_video_hash is None:
+                raise e
+            existing_deployment = self.get_by_video_hash(deployment_video_hash)
+            if existing_deployment is None:
+                # The conflicting deployment was deleted before it could be read
+                raise e
+            return existing_deployment
         except SQLAlchemyError as e:
             session.rollback()
             raise e
@@ -63,6 +80,70 @@ class DeploymentCRUD(ICRUD):
         finally:
             self.db.close_session(session)
 
+    def get_by_video_hash(self, deployment_video_hash: str) -> Deployments:
+        """
+        Get the deployment of a video set, with an index seek.
+
+        Args:
+        - deployment_video_hash: The hash of the sorted video IDs.
+
+        Returns:
+        - The Deployments object of the video set, or None if it has none.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return session.query(Deployments).filter(Deployments.deployment_video_hash == deployment_video_hash).first()
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_video_hashes(self, after_id: int, limit: int) -> list:
+        """
+        Get the video set hashes of the deployments stored after a given ID, in ID order.
+
+        Args:
+        - after_id: The last deployment ID already read.
+        - limit: The maximum number of rows to return.
+
+        Returns:
+        - A list of (id, deployment_video_hash) tuples; the hash is None for rows not backfilled yet.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(Deployments.id, Deployments.deployment_video_hash)
+                    .filter(Deployments.id > after_id)
+                    .order_by(Deployments.id)
+                    .limit(limit)
+                    .all())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_without_video_hash(self, after_id: int, limit: int) -> list:
+        """
+        Get the deployments stored before the video set hash existed, in ID order.
+
+        Args:
+        - after_id: The last deployment ID already read.
+        - limit: The maximum number of rows to return.
+
+        Returns:
+        - A list of (id, deployment_video) tuples.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(Deployments.id, Deployments.deployment_video)
+                    .filter(Deployments.id > after_id, Deployments.deployment_video_hash.is_(None))
+                    .order_by(Deployments.id)
+                    .limit(limit)
+                    .all())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
     def update(self, deployment_id: int, **kwargs) -> Deployments:
         """
         Update a deployment in the database.
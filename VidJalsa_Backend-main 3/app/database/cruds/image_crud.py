@@ -0,0 +1,142 @@
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.database import AbstractDatabase
+from app.database.models.models import GeneratedImages
+from app.database.cruds.crud_interface import ICRUD
+
+
+class ImageCRUD(ICRUD):
+    def __init__(self, db: AbstractDatabase):
+        """
+        Initialize the ImageCRUD class.
+
+        Args:
+        - db: An instance of AbstractDatabase.
+
+        Returns:
+        - None
+        """
+        self.db = db
+
+    def add(self, topic_key: str, prompt_hash: str, image_hash: str, image_url: str, variants: dict) -> GeneratedImages:
+        """
+        Add a generated image to the database. If another worker stored an image for the same key first,
+        the stored image is returned instead.
+
+        Args:
+        - topic_key: The normalized topic the image was generated for.
+        - prompt_hash: The hash of the image prompt template.
+        - image_hash: The SHA-256 of the stored image.
+        - image_url: The URL of the default variant in the local image store.
+        - variants: The URLs of every stored variant, keyed by width.
+
+        Returns:
+        - The stored GeneratedImages object.
+        """
+        session: Session = self.db.get_session()
+        new_image = GeneratedImages(topic_key=topic_key, prompt_hash=prompt_hash, image_hash=image_hash,
+                                    image_url=image_url, variants=variants)
+        try:
+            session.add(new_image)
+            session.commit()
+            session.refresh(new_image)
+            return new_image
+        except IntegrityError:
+            session.rollback()
+            return self.get_by_key(topic_key, prompt_hash)
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get(self, image_id: int) -> GeneratedImages:
+        """
+        Get a generated image from the database by its ID.
+
+        Args:
+        - image_id: The ID of the image.
+
+        Returns:
+        - The GeneratedImages object with the specified ID.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return session.query(GeneratedImages).filter(GeneratedImages.id == image_id).first()
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_by_key(self, topic_key: str, prompt_hash: str) -> GeneratedImages:
+        """
+        Get the image generated for a topic with the given prompt template.
+
+        Args:
+        - topic_key: The normalized topic.
+        - prompt_hash: The hash of the image prompt template.
+
+        Returns:
+        - The matching GeneratedImages object, or None.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(GeneratedImages)
+                    .filter(GeneratedImages.topic_key == topic_key, GeneratedImages.prompt_hash == prompt_hash)
+                    .first())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def update(self, image_id: int, **kwargs) -> GeneratedImages:
+        """
+        Update a generated image in the database.
+
+        Args:
+        - image_id: The ID of the image.
+        - kwargs: Keyword arguments representing the fields to be updated.
+
+        Returns:
+        - The updated GeneratedImages object.
+        """
+        session: Session = self.db.get_session()
+        try:
+            image = session.query(GeneratedImages).filter(GeneratedImages.id == image_id).first()
+            if image:
+                for key, value in kwargs.items():
+                    setattr(image, key, value)
+                session.commit()
+                session.refresh(image)
+                return image
+            return None
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def delete(self, image_id: int) -> bool:
+        """
+        Delete a generated image from the database.
+
+        Args:
+        - image_id: The ID of the image.
+
+        Returns:
+        - True if the image was successfully deleted, False otherwise.
+        """
+        session: Session = self.db.get_session()
+        try:
+            image = session.query(GeneratedImages).filter(GeneratedImages.id == image_id).first()
+            if image:
+                session.delete(image)
+                session.commit()
+                return True
+            return False
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
@@ -0,0 +1,242 @@
+import uuid
+import datetime
+
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.database.database import AbstractDatabase
+from app.database.models.models import Jobs
+from app.database.cruds.crud_interface import ICRUD
+
+
+class JobCRUD(ICRUD):
+    def __init__(self, db: AbstractDatabase):
+        """
+        Initialize the JobCRUD class.
+
+        Args:
+        - db: An instance of AbstractDatabase.
+
+        Returns:
+        - None
+        """
+        self.db = db
+
+    def add(self, topic: str, video_urls: list, active_video_set: str = None, owner: str = None) -> Jobs:
+        """
+        Add a new queued job to the database.
+
+        Args:
+        - topic: The topic the blog is generated for.
+        - video_urls: The video URLs the blog is generated from.
+        - active_video_set: The hash of the job's video set, None to allow concurrent jobs of the same videos.
+        - owner: The worker process that runs the job.
+
+        Returns:
+        - The newly created Jobs object.
+
+        Raises:
+        - IntegrityError: If an unfinished job already holds the same video set.
+        """
+        session: Session = self.db.get_session()
+        new_job = Jobs(id=str(uuid.uuid4()), status="queued", topic=topic, video_urls=video_urls, stage_timings={},
+                       stats={}, active_video_set=active_video_set, owner=owner)
+        try:
+            session.add(new_job)
+            session.commit()
+            session.refresh(new_job)
+            return new_job
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get(self, job_id: str) -> Jobs:
+        """
+        Get a job from the database by its ID.
+
+        Args:
+        - job_id: The ID of the job.
+
+        Returns:
+        - The Jobs object with the specified ID.
+        """
+        session: Session = self.db.get_session()
+        try:
+            job = session.query(Jobs).filter(Jobs.id == job_id).first()
+            return job
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_by_active_video_set(self, active_video_set: str) -> Jobs:
+        """
+        Get the unfinished job holding a video set.
+
+        Args:
+        - active_video_set: The hash of the video set.
+
+        Returns:
+        - The Jobs object holding the video set, or None if no unfinished job holds it.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return session.query(Jobs).filter(Jobs.active_video_set == active_video_set).first()
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_unfinished(self) -> list:
+        """
+        Get the jobs that were queued or running, oldest first.
+
+        Returns:
+        - A list of Jobs objects that have not finished yet.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(Jobs)
+                    .filter(Jobs.status.in_(["queued", "running"]))
+                    .order_by(Jobs.created_at)
+                    .all())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def claim(self, job_id: str, owner: str, stale_before: datetime.datetime) -> bool:
+        """
+        Take over an unfinished job, if no other live worker process owns it, and queue it again.
+        The check and the update run as one statement, so only one process can claim a job.
+
+        Args:
+        - job_id: The ID of the job.
+        - owner: The worker process claiming the job.
+        - stale_before: Jobs of other owners not updated since then are presumed lost with their process.
+
+        Returns:
+        - True if the job was claimed, False if it finished or another process owns it.
+        """
+        session: Session = self.db.get_session()
+        try:
+            claimed_rows = (session.query(Jobs)
+                            .filter(Jobs.id == job_id,
+                                    Jobs.status.in_(["queued", "running"]),
+                                    or_(Jobs.owner.is_(None), Jobs.owner == owner, Jobs.updated_at < stale_before))
+                            .update({Jobs.owner: owner, Jobs.status: "queued",
+                                     Jobs.updated_at: datetime.datetime.utcnow()},
+                                    synchronize_session=False))
+            session.commit()
+            return claimed_rows == 1
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def heartbeat(self, job_ids: list, owner: str) -> int:
+        """
+        Mark the unfinished jobs of a worker process as alive, so no other process takes them over.
+
+        Args:
+        - job_ids: The IDs of the jobs the process has queued or running.
+        - owner: The worker process running the jobs.
+
+        Returns:
+        - The number of jobs still owned by the process.
+        """
+        session: Session = self.db.get_session()
+        try:
+            updated_rows = (session.query(Jobs)
+                            .filter(Jobs.id.in_(job_ids), Jobs.owner == owner, Jobs.status.in_(["queued", "running"]))
+                            .update({Jobs.updated_at: datetime.datetime.utcnow()}, synchronize_session=False))
+            session.commit()
+            return updated_rows
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def release_stale(self, job_id: str, seen_updated_at: datetime.datetime, error: str) -> bool:
+        """
+        Fail an unfinished job presumed lost with its process and free its video set, unless it was updated
+        since it was read as stale. The check and the update run as one statement.
+
+        Args:
+        - job_id: The ID of the job.
+        - seen_updated_at: The update time read when the job was found stale.
+        - error: The error stored on the job.
+
+        Returns:
+        - True if the job was released, False if it was updated or finished meanwhile.
+        """
+        session: Session = self.db.get_session()
+        try:
+            released_rows = (session.query(Jobs)
+                             .filter(Jobs.id == job_id, Jobs.updated_at == seen_updated_at,
+                                     Jobs.status.in_(["queued", "running"]))
+                             .update({Jobs.status: "failed", Jobs.error: error, Jobs.active_video_set: None},
+                                     synchronize_session=False))
+            session.commit()
+            return released_rows == 1
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def update(self, job_id: str, **kwargs) -> Jobs:
+        """
+        Update a job in the database.
+
+        Args:
+        - job_id: The ID of the job.
+        - kwargs: Keyword arguments representing the fields to be updated.
+
+        Returns:
+        - The updated Jobs object.
+        """
+        session: Session = self.db.get_session()
+        try:
+            job = session.query(Jobs).filter(Jobs.id == job_id).first()
+            if job:
+                for key, value in kwargs.items():
+                    setattr(job, key, value)
+                session.commit()
+                session.refresh(job)
+                return job
+            return None
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def delete(self, job_id: str) -> bool:
+        """
+        Delete a job from the database.
+
+        Args:
+        - job_id: The ID of the job.
+
+        Returns:
+        - True if the job was successfully deleted, False otherwise.
+        """
+        session: Session = self.db.get_session()
+        try:
+            job = session.query(Jobs).filter(Jobs.id == job_id).first()
+            if job:
+                session.delete(job)
+                session.commit()
+                return True
+            return False
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
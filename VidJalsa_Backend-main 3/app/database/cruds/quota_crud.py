@@ -0,0 +1,174 @@
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.database import AbstractDatabase
+from app.database.models.models import YouTubeQuotaUsage
+from app.database.cruds.crud_interface import ICRUD
+
+
+class QuotaCRUD(ICRUD):
+    def __init__(self, db: AbstractDatabase):
+        """
+        Initialize the QuotaCRUD class.
+
+        Args:
+        - db: An instance of AbstractDatabase.
+
+        Returns:
+        - None
+        """
+        self.db = db
+
+    def add(self, day: str, endpoint: str, calls: int = 0, units: int = 0) -> YouTubeQuotaUsage:
+        """
+        Add the quota usage of an endpoint for a day to the database.
+
+        Args:
+        - day: The Pacific date of the usage (YYYY-MM-DD).
+        - endpoint: The name of the YouTube API endpoint, e.g. "search".
+        - calls: The number of calls made.
+        - units: The quota units used.
+
+        Returns:
+        - The newly created YouTubeQuotaUsage object.
+        """
+        session: Session = self.db.get_session()
+        new_usage = YouTubeQuotaUsage(day=day, endpoint=endpoint, calls=calls, units=units)
+        try:
+            session.add(new_usage)
+            session.commit()
+            session.refresh(new_usage)
+            return new_usage
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get(self, usage_id: int) -> YouTubeQuotaUsage:
+        """
+        Get a quota usage row from the database by its ID.
+
+        Args:
+        - usage_id: The ID of the row.
+
+        Returns:
+        - The YouTubeQuotaUsage object with the specified ID.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return session.query(YouTubeQuotaUsage).filter(YouTubeQuotaUsage.id == usage_id).first()
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_days(self, days: list) -> list:
+        """
+        Get the quota usage of every endpoint for the given days.
+
+        Args:
+        - days: The Pacific dates (YYYY-MM-DD).
+
+        Returns:
+        - A list of YouTubeQuotaUsage objects, ordered by day.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(YouTubeQuotaUsage)
+                    .filter(YouTubeQuotaUsage.day.in_(days))
+                    .order_by(YouTubeQuotaUsage.day)
+                    .all())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def increment(self, day: str, endpoint: str, calls: int, units: int) -> None:
+        """
+        Add calls and units to the usage of an endpoint for a day, creating its row if needed.
+
+        Args:
+        - day: The Pacific date of the usage (YYYY-MM-DD).
+        - endpoint: The name of the YouTube API endpoint.
+        - calls: The number of calls to add.
+        - units: The quota units to add.
+
+        Returns:
+        - None
+        """
+        session: Session = self.db.get_session()
+        try:
+            for _ in range(2):
+                # The increment runs in SQL so concurrent workers never overwrite each other's counts
+                updated_rows = (session.query(YouTubeQuotaUsage)
+                                .filter(YouTubeQuotaUsage.day == day, YouTubeQuotaUsage.endpoint == endpoint)
+                                .update({YouTubeQuotaUsage.calls: YouTubeQuotaUsage.calls + calls,
+                                         YouTubeQuotaUsage.units: YouTubeQuotaUsage.units + units},
+                                        synchronize_session=False))
+                if updated_rows:
+                    session.commit()
+                    return
+                try:
+                    session.add(YouTubeQuotaUsage(day=day, endpoint=endpoint, calls=calls, units=units))
+                    session.commit()
+                    return
+                except IntegrityError:
+                    # Another worker created the row first, update it instead
+                    session.rollback()
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def update(self, usage_id: int, **kwargs) -> YouTubeQuotaUsage:
+        """
+        Update a quota usage row in the database.
+
+        Args:
+        - usage_id: The ID of the row.
+        - kwargs: Keyword arguments representing the fields to be updated.
+
+        Returns:
+        - The updated YouTubeQuotaUsage object.
+        """
+        session: Session = self.db.get_session()
+        try:
+            usage = session.query(YouTubeQuotaUsage).filter(YouTubeQuotaUsage.id == usage_id).first()
+            if usage:
+                for key, value in kwargs.items():
+                    setattr(usage, key, value)
+                session.commit()
+                session.refresh(usage)
+                return usage
+            return None
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def delete(self, usage_id: int) -> bool:
+        """
+        Delete a quota usage row from the database.
+
+        Args:
+        - usage_id: The ID of the row.
+
+        Returns:
+        - True if the row was successfully deleted, False otherwise.
+        """
+        session: Session = self.db.get_session()
+        try:
+            usage = session.query(YouTubeQuotaUsage).filter(YouTubeQuotaUsage.id == usage_id).first()
+            if usage:
+                session.delete(usage)
+                session.commit()
+                return True
+            return False
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
@@ -0,0 +1,167 @@
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.database import AbstractDatabase
+from app.database.models.models import VideoSummaries
+from app.database.cruds.crud_interface import ICRUD
+
+
+class SummaryCRUD(ICRUD):
+    def __init__(self, db: AbstractDatabase):
+        """
+        Initialize the SummaryCRUD class.
+
+        Args:
+        - db: An instance of AbstractDatabase.
+
+        Returns:
+        - None
+        """
+        self.db = db
+
+    def add(self, video_id: str, prompt_hash: str, model: str, summary: str) -> VideoSummaries:
+        """
+        Add a video summary to the database. If another worker stored the same key first,
+        the stored summary is returned instead.
+
+        Args:
+        - video_id: The YouTube video ID.
+        - prompt_hash: The hash of the prompt templates used to produce the summary.
+        - model: The name of the model that produced the summary.
+        - summary: The summary text.
+
+        Returns:
+        - The stored VideoSummaries object.
+        """
+        session: Session = self.db.get_session()
+        new_summary = VideoSummaries(video_id=video_id, prompt_hash=prompt_hash, model=model, summary=summary)
+        try:
+            session.add(new_summary)
+            session.commit()
+            session.refresh(new_summary)
+            return new_summary
+        except IntegrityError:
+            session.rollback()
+            return self.get_by_key(video_id, prompt_hash, model)
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get(self, summary_id: int) -> VideoSummaries:
+        """
+        Get a video summary from the database by its ID.
+
+        Args:
+        - summary_id: The ID of the summary.
+
+        Returns:
+        - The VideoSummaries object with the specified ID.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return session.query(VideoSummaries).filter(VideoSummaries.id == summary_id).first()
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_by_key(self, video_id: str, prompt_hash: str, model: str) -> VideoSummaries:
+        """
+        Get the summary of a video produced with the given prompts and model.
+
+        Args:
+        - video_id: The YouTube video ID.
+        - prompt_hash: The hash of the prompt templates.
+        - model: The name of the model.
+
+        Returns:
+        - The matching VideoSummaries object, or None.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(VideoSummaries)
+                    .filter(VideoSummaries.video_id == video_id,
+                            VideoSummaries.prompt_hash == prompt_hash,
+                            VideoSummaries.model == model)
+                    .first())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def get_many(self, video_ids: list, prompt_hash: str, models: list) -> list:
+        """
+        Get the summaries of several videos produced with the given prompts and any of the given models in one query.
+
+        Args:
+        - video_ids: The YouTube video IDs.
+        - prompt_hash: The hash of the prompt templates.
+        - models: The names of the models.
+
+        Returns:
+        - A list of the matching VideoSummaries objects.
+        """
+        session: Session = self.db.get_session()
+        try:
+            return (session.query(VideoSummaries)
+                    .filter(VideoSummaries.video_id.in_(video_ids),
+                            VideoSummaries.prompt_hash == prompt_hash,
+                            VideoSummaries.model.in_(models))
+                    .all())
+        except SQLAlchemyError as e:
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def update(self, summary_id: int, **kwargs) -> VideoSummaries:
+        """
+        Update a video summary in the database.
+
+        Args:
+        - summary_id: The ID of the summary.
+        - kwargs: Keyword arguments representing the fields to be updated.
+
+        Returns:
+        - The updated VideoSummaries object.
+        """
+        session: Session = self.db.get_session()
+        try:
+            video_summary = session.query(VideoSummaries).filter(VideoSummaries.id == summary_id).first()
+            if video_summary:
+                for key, value in kwargs.items():
+                    setattr(video_summary, key, value)
+                session.commit()
+                session.refresh(video_summary)
+                return video_summary
+            return None
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
+
+    def delete(self, summary_id: int) -> bool:
+        """
+        Delete a video summary from the database.
+
+        Args:
+        - summary_id: The ID of the summary.
+
+        Returns:
+        - True if the summary was successfully deleted, False otherwise.
+        """
+        session: Session = self.db.get_session()
+        try:
+            video_summary = session.query(VideoSummaries).filter(VideoSummaries.id == summary_id).first()
+            if video_summary:
+                session.delete(video_summary)
+                session.commit()
+                return True
+            return False
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session(session)
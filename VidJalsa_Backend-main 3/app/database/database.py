@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from abc import ABC, abstractmethod
 
@@ -86,3 +86,49 @@ class SqlAlchemyDatabaseConnection(AbstractDatabase):
             session (Session): The database session to close.
         """
         session.close()
+
+    def add_missing_columns(self, table):
+        """
+        Adds the columns of a model that its existing table lacks, with their indexes.
+        `create_all` only creates missing tables, so columns added to a model later go through here.
+
+        Args:
+            table (Table): The table of the model, e.g. Jobs.__table__. Its new columns must be nullable.
+        """
+        inspector = inspect(self.engine)
+        if not inspector.has_table(table.name):
+            return
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        with self.engine.begin() as connection:
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=self.engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NULL"))
+                for index in table.indexes:
+                    if column.name in index.columns:
+                        index.create(connection)
+                print(f"Added the column {table.name}.{column.name}")
+
+    def widen_text_columns(self, table):
+        """
+        Turns the length-limited string columns of an existing table into TEXT where the model now declares Text.
+        Only MySQL is altered, SQLite does not enforce string lengths.
+
+        Args:
+            table (Table): The table of the model, e.g. Deployments.__table__.
+        """
+        if self.engine.dialect.name != "mysql":
+            return
+        inspector = inspect(self.engine)
+        if not inspector.has_table(table.name):
+            return
+        stored_types = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        with self.engine.begin() as connection:
+            for column in table.columns:
+                stored_type = stored_types.get(column.name)
+                if (isinstance(column.type, Text) and isinstance(stored_type, String)
+                        and not isinstance(stored_type, Text)):
+                    null = "NULL" if column.nullable else "NOT NULL"
+                    connection.execute(text(f"ALTER TABLE {table.name} MODIFY COLUMN {column.name} TEXT {null}"))
+                    print(f"Widened the column {table.name}.{column.name} to TEXT")
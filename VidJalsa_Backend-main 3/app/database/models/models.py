@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey
+import datetime
+
+from sqlalchemy import Column, Integer, String, CHAR, JSON, ForeignKey, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.database.database import SqlAlchemyDatabaseConnection
@@ -19,6 +21,9 @@ class Blog(SqlAlchemyDatabaseConnection.Base):
     question = Column(String(255), nullable=False)
     paragraphs = Column(JSON, nullable=False)
     image_url = Column(String(1000), nullable=False)
+    # Names of the deployments published with the placeholder image while the image is generating,
+    # re-rendered by whichever worker stores the image. NULL once nothing waits for it.
+    pending_image_deployments = Column(JSON)
 
     # Foreign key to associate a blog with a user
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -32,7 +37,11 @@ class Deployments(SqlAlchemyDatabaseConnection.Base):
     __tablename__ = 'deployments'
     id = Column(Integer, primary_key=True)
     deployment_name = Column(String(255), nullable=False)
-    deployment_video = Column(String(255), nullable=False)
+    # The space separated sorted video IDs; Text because large selections overflowed String(255)
+    deployment_video = Column(Text, nullable=False)
+    # SHA-256 of the sorted, de-duplicated video IDs, the indexed key of the reuse check.
+    # Nullable for the rows stored before it existed, until they are backfilled.
+    deployment_video_hash = Column(CHAR(64), unique=True, index=True)
 
     # Foreign key to associate a deployment with a user
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -44,3 +53,80 @@ class Deployments(SqlAlchemyDatabaseConnection.Base):
 
     def __repr__(self):
         return f"<Deployments(deployment_name='{self.deployment_name}', user_id='{self.user_id}', blog_id='{self.blog_id}')>"
+
+
+class Jobs(SqlAlchemyDatabaseConnection.Base):
+    __tablename__ = 'jobs'
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    topic = Column(String(255), nullable=False)
+    video_urls = Column(JSON, nullable=False)
+
+    # Seconds spent in each pipeline stage, filled in while the job runs
+    stage_timings = Column(JSON, nullable=False, default=dict)
+    # Counters such as tokens and LLM calls spent or saved by the job
+    stats = Column(JSON, nullable=False, default=dict)
+    deployment_url = Column(String(1000))
+    error = Column(Text)
+    # SHA-256 of the sorted video IDs while the job is queued or running, NULL once it finished.
+    # The unique index lets a single job run per video set across every worker process.
+    active_video_set = Column(String(64), unique=True, index=True)
+    # The worker process that queued or claimed the job. Another process only takes the job over once
+    # it stops being updated, so a job is never run by two processes at the same time.
+    owner = Column(String(100), index=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Jobs(id='{self.id}', status='{self.status}', topic='{self.topic}')>"
+
+
+class VideoSummaries(SqlAlchemyDatabaseConnection.Base):
+    __tablename__ = 'video_summaries'
+    __table_args__ = (UniqueConstraint('video_id', 'prompt_hash', 'model', name='uq_video_summaries_key'),)
+    id = Column(Integer, primary_key=True)
+    video_id = Column(String(64), nullable=False)
+
+    # Hash of the prompt templates the summary was produced with, so prompt changes invalidate it
+    prompt_hash = Column(String(64), nullable=False)
+    model = Column(String(100), nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<VideoSummaries(video_id='{self.video_id}', model='{self.model}')>"
+
+
+class GeneratedImages(SqlAlchemyDatabaseConnection.Base):
+    __tablename__ = 'generated_images'
+    __table_args__ = (UniqueConstraint('topic_key', 'prompt_hash', name='uq_generated_images_key'),)
+    id = Column(Integer, primary_key=True)
+
+    # Normalized topic, so "AI News" and "ai  news!" share an image
+    topic_key = Column(String(255), nullable=False)
+    prompt_hash = Column(String(64), nullable=False)
+
+    # SHA-256 of the downloaded image, which is also its name in the local image store
+    image_hash = Column(String(64), nullable=False)
+    image_url = Column(String(1000), nullable=False)
+    variants = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GeneratedImages(topic_key='{self.topic_key}', image_hash='{self.image_hash}')>"
+
+
+class YouTubeQuotaUsage(SqlAlchemyDatabaseConnection.Base):
+    __tablename__ = 'youtube_quota_usage'
+    __table_args__ = (UniqueConstraint('day', 'endpoint', name='uq_youtube_quota_usage_key'),)
+    id = Column(Integer, primary_key=True)
+
+    # The quota resets at midnight Pacific time, so days are Pacific dates (YYYY-MM-DD)
+    day = Column(String(10), nullable=False, index=True)
+    endpoint = Column(String(50), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<YouTubeQuotaUsage(day='{self.day}', endpoint='{self.endpoint}', units='{self.units}')>"
@@ -1,5 +1,9 @@
+from sqlalchemy.exc import SQLAlchemyError
+
 from app.database import database_connection
 from app.database.models.models import User, Blog, Deployments
+from app.database.cruds.deployment_crud import DeploymentCRUD
+from app.main_processing_services.utils import video_set_hash
 
 
 def get_blogs_by_username(username):
@@ -24,16 +28,59 @@ def get_blogs_by_username(username):
         return None
 
 
-def check_deployment_video_exists(video_name):
+def check_deployment_video_exists(video_set_hash):
     """
-    Check if a deployment video with the given name exists.
+    Check if a deployment of the given video set exists.
 
     Args:
-    session (Session): The database session to use for the query.
-    video_name (str): The name of the video to check.
+    video_set_hash (str): The hash of the sorted video IDs, see `video_set_hash`.
 
     Returns:
-    bool: True if the video exists, False otherwise.
+    Deployments: The deployment of the video set, or None if it has none.
     """
     session = database_connection.get_session()
-    return session.query(Deployments).filter(Deployments.deployment_video == video_name).first()
\ No newline at end of file
+    try:
+        return session.query(Deployments).filter(Deployments.deployment_video_hash == video_set_hash).first()
+    finally:
+        session.close()
+
+
+def backfill_deployment_video_hashes(batch_size=1000):
+    """
+    Fill in the video set hash of the deployments stored before the column existed.
+
+    Several old deployments can cover the same video set; the oldest one keeps the hash, as it is
+    the one the reuse check used to find, and the others stay without one.
+
+    Args:
+    batch_size (int): The number of deployments read and updated per transaction.
+
+    Returns:
+    int: The number of deployments that got a hash.
+    """
+    deployment_crud = DeploymentCRUD(database_connection)
+    filled = 0
+    last_id = 0
+    while True:
+        rows = deployment_crud.get_without_video_hash(last_id, batch_size)
+        if not rows:
+            return filled
+        last_id = rows[-1][0]
+        session = database_connection.get_session()
+        try:
+            hashes = {}
+            for deployment_id, deployment_video in rows:
+                hashes.setdefault(video_set_hash(deployment_video.split()), deployment_id)
+            taken = {row[0] for row in session.query(Deployments.deployment_video_hash)
+                     .filter(Deployments.deployment_video_hash.in_(list(hashes))).all()}
+            for hash_value, deployment_id in hashes.items():
+                if hash_value not in taken:
+                    session.query(Deployments).filter(Deployments.id == deployment_id).update(
+                        {Deployments.deployment_video_hash: hash_value}, synchronize_session=False)
+                    filled += 1
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
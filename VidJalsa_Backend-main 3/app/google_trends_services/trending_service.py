@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from email.utils import formatdate
+
+from fastapi import HTTPException
+from pytrends.request import TrendReq
+from app.google_trends_services.trends_api_interaction import get_trending_topics
+
+# Regions refreshed in the background from startup, other regions are added on their first request
+TRENDING_REGIONS = [region.strip() for region in os.getenv('TRENDING_REGIONS', 'united_states').split(',') if region.strip()]
+TRENDING_REFRESH_INTERVAL = int(os.getenv('TRENDING_REFRESH_INTERVAL', '900'))
+TRENDING_TOPICS_COUNT = int(os.getenv('TRENDING_TOPICS_COUNT', '8'))
+TRENDING_MAX_REGIONS = int(os.getenv('TRENDING_MAX_REGIONS', '20'))
+# Regions that may be requested besides the configured ones, by default those pytrends' trending searches know
+TRENDING_ALLOWED_REGIONS = [region.strip() for region in os.getenv(
+    'TRENDING_ALLOWED_REGIONS',
+    'argentina,australia,austria,belgium,brazil,canada,chile,colombia,czech_republic,denmark,egypt,finland,'
+    'france,germany,greece,hong_kong,hungary,india,indonesia,israel,italy,japan,kenya,malaysia,mexico,'
+    'netherlands,new_zealand,nigeria,norway,philippines,poland,portugal,romania,russia,saudi_arabia,singapore,'
+    'south_africa,south_korea,sweden,switzerland,taiwan,thailand,turkey,ukraine,united_kingdom,united_states,'
+    'vietnam').split(',') if region.strip()]
+
+
+class TrendingService:
+    """
+    Keeps the trending topics of each region in memory, refreshed from Google Trends on a schedule.
+
+    Requests only read the latest snapshot of their region, with its last update time and an ETag.
+    A failed refresh keeps serving the last good list and is retried on the next tick. The upstream
+    calls of all regions are serialized on one reused pytrends session, to stay clear of the
+    Google Trends rate limits.
+    """
+
+    def __init__(self, regions: list, refresh_interval: int, topics_count: int, max_regions: int,
+                 allowed_regions: list):
+        self.regions = list(dict.fromkeys(regions))
+        self.allowed_regions = set(allowed_regions) | set(self.regions)
+        self.refresh_interval = refresh_interval
+        self.topics_count = topics_count
+        self.max_regions = max_regions
+        self._snapshots = {}
+        self._errors = {}
+        self._pytrends = None
+        self._upstream_lock = asyncio.Lock()
+        self._refresher = None
+        self._counters = {"refreshes": 0, "refresh_failures": 0, "reads": 0, "unknown_regions": 0}
+
+    async def start(self):
+        """
+        Starts the background refresher, which loads every configured region right away.
+        """
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """
+        Stops the background refresher.
+        """
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    async def get(self, pn: str) -> dict:
+        """
+        Returns the latest snapshot of a region.
+
+        A region that is not refreshed yet is fetched once and added to the refreshed regions. Regions
+        outside the allowed ones are rejected without calling Google Trends.
+
+        Parameters:
+        - pn (str): The pytrends name of the region.
+
+        Returns:
+        - dict: The "topics", their "updated_at" timestamp and their "etag".
+
+        Raises:
+        - HTTPException: 503 if the region has no snapshot and could not be fetched, 400 if the region is
+          unknown or too many regions are already refreshed.
+        """
+        self._counters["reads"] += 1
+        snapshot = self._snapshots.get(pn)
+        if snapshot is not None:
+            return snapshot
+
+        if pn not in self.allowed_regions:
+            self._counters["unknown_regions"] += 1
+            raise HTTPException(status_code=400, detail=f"Unknown region {pn}")
+        if pn not in self.regions:
+            if len(self.regions) >= self.max_regions:
+                raise HTTPException(status_code=400, detail=f"Trending topics are limited to {self.max_regions} regions")
+            self.regions.append(pn)
+        await self.refresh(pn)
+        snapshot = self._snapshots.get(pn)
+        if snapshot is None:
+            if pn not in TRENDING_REGIONS and pn in self.regions:
+                # Do not keep refreshing a region that never worked, it is most likely not a valid name
+                self.regions.remove(pn)
+            raise HTTPException(status_code=503, detail=f"Trending topics for {pn} are not available: "
+                                                        f"{self._errors.get(pn)}")
+        return snapshot
+
+    def peek(self, pn: str):
+        """
+        Returns the latest snapshot of a region without fetching it, or None if it has none.
+        """
+        return self._snapshots.get(pn)
+
+    async def refresh(self, pn: str):
+        """
+        Fetches the trending topics of a region and replaces its snapshot. On failure the previous
+        snapshot is kept and the error is recorded.
+
+        Parameters:
+        - pn (str): The pytrends name of the region.
+        """
+        async with self._upstream_lock:
+            try:
+                topics = await asyncio.to_thread(self._fetch, pn)
+            except Exception as e:
+                self._counters["refresh_failures"] += 1
+                self._errors[pn] = e.detail if isinstance(e, HTTPException) else str(e)
+                # A failed session may be blocked or stale, start a new one next time
+                self._pytrends = None
+                print(f"Refreshing the trending topics for {pn} failed, serving the last good list: {self._errors[pn]}")
+                return
+        self._counters["refreshes"] += 1
+        self._errors.pop(pn, None)
+        previous = self._snapshots.get(pn)
+        if previous is not None and previous["topics"] == topics:
+            # Unchanged topics keep their ETag so clients keep getting 304s
+            self._snapshots[pn] = {**previous, "checked_at": time.time()}
+            return
+        updated_at = time.time()
+        etag = '"' + hashlib.sha256(json.dumps(topics).encode("utf-8")).hexdigest()[:32] + '"'
+        self._snapshots[pn] = {"topics": topics, "updated_at": updated_at, "checked_at": updated_at,
+                               "last_modified": formatdate(updated_at, usegmt=True), "etag": etag}
+
+    def stats(self) -> dict:
+        """
+        Returns the refresh counters and, for each region, the age of its snapshot and its last error.
+        """
+        now = time.time()
+        return {
+            **self._counters,
+            "refresh_interval": self.refresh_interval,
+            "regions": {pn: {"topics": len(self._snapshots[pn]["topics"]) if pn in self._snapshots else 0,
+                             "updated_seconds_ago": round(now - self._snapshots[pn]["updated_at"], 1)
+                             if pn in self._snapshots else None,
+                             "checked_seconds_ago": round(now - self._snapshots[pn]["checked_at"], 1)
+                             if pn in self._snapshots else None,
+                             "last_error": self._errors.get(pn)}
+                        for pn in self.regions},
+        }
+
+    def _fetch(self, pn: str) -> list:
+        if self._pytrends is None:
+            self._pytrends = TrendReq(hl='en-US', tz=360)
+        return get_trending_topics(pn, self.topics_count, self._pytrends)
+
+    async def _refresh_loop(self):
+        while True:
+            for pn in list(self.regions):
+                await self.refresh(pn)
+            await asyncio.sleep(self.refresh_interval)
+
+
+trending_service = TrendingService(TRENDING_REGIONS, TRENDING_REFRESH_INTERVAL, TRENDING_TOPICS_COUNT,
+                                   TRENDING_MAX_REGIONS, TRENDING_ALLOWED_REGIONS)
@@ -1,9 +1,14 @@
 from pytrends.request import TrendReq
 from fastapi import HTTPException
 
-def get_trending_topics() -> list:
+def get_trending_topics(pn: str = 'united_states', count: int = 8, pytrends: TrendReq = None) -> list:
     """
-    Fetches the current trending search topics from Google Trends for the United States.
+    Fetches the current trending search topics from Google Trends for a region.
+
+    Parameters:
+        pn (str): The pytrends name of the region, e.g. "united_states" or "india".
+        count (int): The number of topics to return.
+        pytrends (TrendReq): An existing session to reuse, a new one is created if None.
 
     Returns:
         list: A list of the top trending search topics.
@@ -12,9 +17,10 @@ def get_trending_topics() -> list:
         HTTPException: If an error occurs during the request to Google Trends.
     """
     try:
-        pytrends = TrendReq(hl='en-US', tz=360)
-        trending = pytrends.trending_searches(pn='united_states')
-        topics = trending[0].head(8).tolist()
+        if pytrends is None:
+            pytrends = TrendReq(hl='en-US', tz=360)
+        trending = pytrends.trending_searches(pn=pn)
+        topics = trending[0].head(count).tolist()
         return topics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while fetching trending topics: {e}")
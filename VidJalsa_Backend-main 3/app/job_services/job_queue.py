@@ -0,0 +1,315 @@
+import os
+import socket
+import asyncio
+import datetime
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from app.database import database_connection
+from app.database.cruds.job_crud import JobCRUD
+from app.main_processing_services.llm_chains_interactions import process_videos
+from app.main_processing_services.progress import ProgressTracker
+from app.main_processing_services.utils import extract_video_ids, video_set_hash
+
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', '4'))
+# Seconds between the reads of a job run by another worker process, while waiting for it
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+# Seconds between the heartbeats that keep the jobs of this process from being taken over
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '30'))
+# An unfinished job without a heartbeat for this long is presumed lost with its process: it is claimed by
+# another process, or failed to release its video set
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '300'))
+# Identifies this worker process as the owner of the jobs it runs, unique per process
+JOB_WORKER_ID = os.getenv('JOB_WORKER_ID', f"{socket.gethostname()}-{os.getpid()}")
+
+
+class JobQueue:
+    """
+    Runs blog generation jobs on a bounded pool of asyncio workers.
+
+    Every job is stored in the `jobs` table before it is queued, together with the worker process that
+    owns it. The owner refreshes its queued and running jobs on every heartbeat, so the jobs of a
+    stopped process go stale. `start`, and then every heartbeat, claims the unfinished jobs that no live
+    process owns and queues them again. While a job is queued or running, its
+    progress tracker is kept in memory so clients can follow its events live, including the events
+    of background work that finishes after the job, like the blog image.
+
+    Submissions of a video set that an unfinished job already covers attach to that job instead of
+    starting another one, and get the same deployment URL. The unfinished job holds the hash of its
+    video set in the unique `active_video_set` column, so this also holds across worker processes:
+    the insert of a duplicate fails and the submission attaches to the stored job, whose progress is
+    then followed by polling the database.
+    """
+
+    def __init__(self, job_crud: JobCRUD, concurrency: int, owner: str):
+        self.job_crud = job_crud
+        self.concurrency = concurrency
+        self.owner = owner
+        self._queue = asyncio.Queue()
+        self._workers = []
+        self._heartbeat = None
+        self._results = {}
+        self._trackers = {}
+        self._closing_tasks = set()
+        self._active_video_sets = {}
+        self._counters = {"submitted": 0, "attached": 0, "attached_across_workers": 0, "stale_released": 0,
+                          "claimed": 0}
+
+    async def start(self):
+        """
+        Claims and re-queues the unfinished jobs no live worker process owns, then starts the workers and
+        the heartbeat.
+        """
+        await self._claim_orphaned_jobs()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        """
+        Cancels the workers and the heartbeat. Jobs interrupted here stay marked as running, and are claimed
+        again once they go stale, by the next start or by another worker process.
+        """
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+
+    def pending_jobs(self) -> int:
+        """Returns the number of jobs queued or running."""
+        return len(self._results)
+
+    def stats(self) -> dict:
+        """
+        Returns the jobs submitted and attached to running ones, and the jobs currently queued or running.
+        """
+        return {**self._counters, "pending": self.pending_jobs(), "active_video_sets": len(self._active_video_sets)}
+
+    async def submit(self, video_urls: list, topic: str) -> str:
+        """
+        Stores a new job and queues it for processing, or attaches to the unfinished job of the same video set.
+
+        Parameters:
+        - video_urls (list): The video URLs to generate the blog from.
+        - topic (str): The topic of the videos.
+
+        Returns:
+        - str: The ID of the queued job, or of the job the submission attached to.
+
+        Raises:
+        - HTTPException: 503 if the video set kept changing hands and no job could be stored.
+        """
+        video_ids = extract_video_ids(video_urls)
+        video_set = video_set_hash(video_ids) if video_ids else None
+        job_id = self._active_video_sets.get(video_set)
+        if job_id is not None:
+            self._counters["attached"] += 1
+            self._trackers[job_id].emit("job_attached")
+            return job_id
+
+        for _ in range(3):
+            try:
+                job = await asyncio.to_thread(self.job_crud.add, topic, video_urls, video_set, self.owner)
+            except IntegrityError:
+                existing_job = await asyncio.to_thread(self.job_crud.get_by_active_video_set, video_set)
+                if existing_job is None:
+                    # The job finished between the insert and the lookup
+                    continue
+                if existing_job.updated_at < datetime.datetime.utcnow() - datetime.timedelta(seconds=JOB_STALE_AFTER):
+                    # Released only if no heartbeat or claim touched the job since it was read
+                    if await asyncio.to_thread(self.job_crud.release_stale, existing_job.id,
+                                               existing_job.updated_at, "Abandoned by its worker"):
+                        self._counters["stale_released"] += 1
+                    continue
+                # A concurrent submission of this process may have inserted it while this one was inserting
+                self._counters["attached" if existing_job.id in self._trackers else "attached_across_workers"] += 1
+                return existing_job.id
+            self._counters["submitted"] += 1
+            self._enqueue(job.id, video_urls, topic, video_set)
+            return job.id
+        raise HTTPException(status_code=503, detail="The videos are being processed, try again shortly")
+
+    async def get(self, job_id: str):
+        """
+        Returns the stored job with the given ID.
+
+        Raises:
+        - HTTPException: If no job with this ID exists.
+        """
+        job = await asyncio.to_thread(self.job_crud.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    async def events(self, job_id: str, heartbeat_interval: float = 15.0):
+        """
+        Yields the progress events of a job as they happen, starting with the ones already emitted.
+
+        Jobs that are not tracked in memory, because they finished or run in another worker process,
+        yield an event built from the stored job every time its status changes.
+        A `None` item is yielded whenever no event arrived for `heartbeat_interval` seconds, so
+        callers can keep idle connections alive.
+
+        Raises:
+        - HTTPException: If no job with this ID exists.
+        """
+        tracker = self._trackers.get(job_id)
+        if tracker is None:
+            # Finished, or run by another worker process: follow the stored status instead
+            job = await self.get(job_id)
+            last_status = None
+            idle_seconds = 0.0
+            while True:
+                if job.status != last_status:
+                    last_status = job.status
+                    idle_seconds = 0.0
+                    yield {"event": f"job_{job.status}", "stage_timings": job.stage_timings, "stats": job.stats,
+                           "deployment_url": job.deployment_url, "error": job.error}
+                if job.status not in ("queued", "running"):
+                    return
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                idle_seconds += JOB_POLL_INTERVAL
+                if idle_seconds >= heartbeat_interval:
+                    idle_seconds = 0.0
+                    yield None
+                job = await self.get(job_id)
+
+        queue = tracker.subscribe()
+        try:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            tracker.unsubscribe(queue)
+
+    async def wait(self, job_id: str) -> dict:
+        """
+        Waits until the given job finishes.
+
+        Returns:
+        - dict: A dictionary containing a message and the deployment URL.
+
+        Raises:
+        - HTTPException: If the job failed.
+        """
+        result = self._results.get(job_id)
+        if result is not None:
+            status, payload = await asyncio.shield(result)
+        else:
+            job = await self.get(job_id)
+            while job.status in ("queued", "running"):
+                # Run by another worker process
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                job = await self.get(job_id)
+            status = job.status
+            payload = job.error if status == "failed" else {"message": "The Processing Is Finished!",
+                                                             "deployment_url": job.deployment_url}
+        if status == "failed":
+            raise HTTPException(status_code=500, detail=payload)
+        return payload
+
+    async def _claim_orphaned_jobs(self):
+        stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=JOB_STALE_AFTER)
+        claimed_jobs = 0
+        for job in await asyncio.to_thread(self.job_crud.get_unfinished):
+            if job.id in self._results:
+                continue
+            # Jobs of other live processes are left to them, only one process wins the claim of an orphan
+            if await asyncio.to_thread(self.job_crud.claim, job.id, self.owner, stale_before):
+                claimed_jobs += 1
+                self._enqueue(job.id, job.video_urls, job.topic, job.active_video_set)
+        self._counters["claimed"] += claimed_jobs
+        if claimed_jobs:
+            print(f"Re-queued {claimed_jobs} unfinished jobs")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                if self._results:
+                    await asyncio.to_thread(self.job_crud.heartbeat, list(self._results), self.owner)
+                await self._claim_orphaned_jobs()
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def _enqueue(self, job_id: str, video_urls: list, topic: str, video_set: str = None):
+        persist_lock = asyncio.Lock()
+
+        async def persist_stage_timings(progress: ProgressTracker):
+            async with persist_lock:
+                await asyncio.to_thread(self.job_crud.update, job_id, stage_timings=dict(progress.stage_timings))
+
+        self._trackers[job_id] = ProgressTracker(on_change=persist_stage_timings)
+        self._trackers[job_id].emit("job_queued", job_id=job_id)
+        self._results[job_id] = asyncio.get_running_loop().create_future()
+        if video_set is not None:
+            self._active_video_sets[video_set] = job_id
+        self._queue.put_nowait((job_id, video_urls, topic, video_set))
+
+    async def _worker(self):
+        while True:
+            job_id, video_urls, topic, video_set = await self._queue.get()
+            try:
+                await self._run(job_id, video_urls, topic, video_set)
+            except Exception as e:
+                # A failing job must not take its worker down with it
+                print(f"Worker failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, video_urls: list, topic: str, video_set: str = None):
+        progress = self._trackers[job_id]
+        result = ("failed", "The worker stopped before the job finished")
+        try:
+            await asyncio.to_thread(self.job_crud.update, job_id, status="running")
+            progress.emit("job_running")
+            response = await process_videos(video_urls, topic, progress)
+            await asyncio.to_thread(self.job_crud.update, job_id, status="succeeded",
+                                    deployment_url=response["deployment_url"], active_video_set=None,
+                                    stage_timings=dict(progress.stage_timings), stats=dict(progress.stats))
+            result = ("succeeded", response)
+            progress.emit("job_succeeded", deployment_url=response["deployment_url"],
+                          stage_timings=dict(progress.stage_timings), stats=dict(progress.stats))
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            result = ("failed", error)
+            progress.emit("job_failed", error=error, stage_timings=dict(progress.stage_timings))
+            try:
+                await asyncio.to_thread(self.job_crud.update, job_id, status="failed", error=error,
+                                        active_video_set=None, stage_timings=dict(progress.stage_timings),
+                                        stats=dict(progress.stats))
+            except Exception as update_error:
+                # The stored job is released as stale once it stops being updated
+                print(f"Storing the failure of job {job_id} failed: {update_error}")
+        finally:
+            # Whatever happened, waiters get an answer and the video set is free for new submissions
+            if self._active_video_sets.get(video_set) == job_id:
+                del self._active_video_sets[video_set]
+            future = self._results.pop(job_id, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+            if progress.background_tasks:
+                # The worker moves on; the tracker stays subscribable until the background work is done
+                closing_task = asyncio.create_task(self._close_tracker(job_id, progress))
+                self._closing_tasks.add(closing_task)
+                closing_task.add_done_callback(self._closing_tasks.discard)
+            else:
+                self._close_tracker_now(job_id, progress)
+
+    async def _close_tracker(self, job_id: str, progress: ProgressTracker):
+        await progress.wait_background_tasks()
+        self._close_tracker_now(job_id, progress)
+
+    def _close_tracker_now(self, job_id: str, progress: ProgressTracker):
+        progress.close()
+        self._trackers.pop(job_id, None)
+
+
+job_queue = JobQueue(JobCRUD(database_connection), JOB_CONCURRENCY, JOB_WORKER_ID)
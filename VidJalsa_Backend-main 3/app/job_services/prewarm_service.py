@@ -0,0 +1,209 @@
+import os
+import time
+import asyncio
+
+from fastapi import HTTPException
+from app.job_services.job_queue import job_queue, JobQueue
+from app.google_trends_services.trending_service import trending_service, TRENDING_REGIONS
+from app.youtube_services.youtube_api_interaction import (fill_previews, PREVIEW_PAGE_MAX_UNITS,
+                                                          YOUTUBE_PREVIEW_MAX_PAGES)
+from app.youtube_services.quota_ledger import quota_ledger
+from app.cache_services.summary_cache import summary_cache
+from app.main_processing_services.llm_chains_interactions import transcript_processor, summarize_video
+from app.main_processing_services.progress import ProgressTracker
+
+# Scheduled warming of the previews, transcripts and summaries of the trending topics, off unless enabled
+TRENDING_PREWARM_ENABLED = os.getenv('TRENDING_PREWARM_ENABLED', 'false').lower() == 'true'
+TRENDING_PREWARM_INTERVAL = int(os.getenv('TRENDING_PREWARM_INTERVAL', '3600'))
+# Leaves the trending topics time to load after startup
+TRENDING_PREWARM_INITIAL_DELAY = int(os.getenv('TRENDING_PREWARM_INITIAL_DELAY', '60'))
+# Videos per preview, matching the default of /videos_preview so the warmed search is the one users hit
+TRENDING_PREWARM_MAX_RESULTS = int(os.getenv('TRENDING_PREWARM_MAX_RESULTS', '10'))
+# Top-ranked videos of each topic whose transcript and summary are prepared
+TRENDING_PREWARM_VIDEOS_PER_TOPIC = int(os.getenv('TRENDING_PREWARM_VIDEOS_PER_TOPIC', '3'))
+# Budgets: summaries generated per run and YouTube quota units spent per day
+TRENDING_PREWARM_MAX_SUMMARIES = int(os.getenv('TRENDING_PREWARM_MAX_SUMMARIES', '8'))
+TRENDING_PREWARM_DAILY_QUOTA_UNITS = int(os.getenv('TRENDING_PREWARM_DAILY_QUOTA_UNITS', '2000'))
+
+
+class PrewarmService:
+    """
+    Prepares the work of the trending topics before users ask for it.
+
+    Every run takes the trending topics of the configured regions and, for each of them, builds the
+    video preview, which fills the search and video details caches, then fetches the transcripts and
+    generates the summaries of its top-ranked videos into the transcript and summary caches. The
+    first user on a trending topic then gets a cached preview, and a generation that only needs the
+    article call.
+
+    The run is bounded by a daily budget of YouTube quota units and a number of summaries per run.
+    A preview is only built if the remaining budget covers its worst-case cost, with as many search
+    pages as the budget allows, and only the calls of the prewarm itself are charged to the budget.
+    It only searches while the quota ledger is in its normal mode, and it leaves the LLM providers to
+    user jobs: summaries are generated one at a time and deferred to the next run while jobs are queued
+    or running.
+    """
+
+    def __init__(self, job_queue: JobQueue, enabled: bool, interval: int, initial_delay: int, max_results: int,
+                 videos_per_topic: int, max_summaries: int, daily_quota_units: int):
+        self.job_queue = job_queue
+        self.enabled = enabled
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.max_results = max_results
+        self.videos_per_topic = videos_per_topic
+        self.max_summaries = max_summaries
+        self.daily_quota_units = daily_quota_units
+        self._runner = None
+        self._quota_day = None
+        self._quota_units_spent = 0
+        self._last_run = {}
+        self._counters = {"runs": 0, "previews_warmed": 0, "preview_failures": 0, "transcripts_warmed": 0,
+                          "transcript_failures": 0, "summaries_warmed": 0, "summaries_already_cached": 0,
+                          "summary_failures": 0, "summaries_deferred": 0, "topics_skipped_quota": 0}
+
+    async def start(self):
+        """
+        Starts the scheduled runs when prewarming is enabled.
+        """
+        if self.enabled and self._runner is None:
+            self._runner = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """
+        Stops the scheduled runs, interrupting the current one.
+        """
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    async def run(self) -> dict:
+        """
+        Warms the previews, transcripts and summaries of the current trending topics once.
+
+        Returns:
+        - dict: What the run warmed and skipped.
+        """
+        run_start_time = time.time()
+        run = {"topics": 0, "previews": 0, "transcripts": 0, "summaries": 0, "skipped_quota": 0, "deferred": 0}
+        self._counters["runs"] += 1
+
+        topics = []
+        for pn in TRENDING_REGIONS:
+            snapshot = trending_service.peek(pn)
+            if snapshot is not None:
+                topics.extend(snapshot["topics"])
+        topics = list(dict.fromkeys(topics))
+        run["topics"] = len(topics)
+
+        video_ids = []
+        for topic in topics:
+            videos = await self._warm_preview(topic)
+            if videos is None:
+                run["skipped_quota"] += 1
+                continue
+            if videos:
+                run["previews"] += 1
+            video_ids.extend(video["video_id"] for video in videos[:self.videos_per_topic])
+        video_ids = list(dict.fromkeys(video_ids))
+
+        cached_summaries = await summary_cache.get_many(video_ids, transcript_processor.prompt_hash,
+                                                        transcript_processor.model_names)
+        self._counters["summaries_already_cached"] += len(cached_summaries)
+        summaries_left = self.max_summaries
+        for video_id in video_ids:
+            if video_id in cached_summaries:
+                continue
+            if await self._warm_transcript(video_id):
+                run["transcripts"] += 1
+            else:
+                continue
+            if summaries_left <= 0 or self.job_queue.pending_jobs():
+                run["deferred"] += 1
+                self._counters["summaries_deferred"] += 1
+                continue
+            summaries_left -= 1
+            if await self._warm_summary(video_id):
+                run["summaries"] += 1
+
+        run["duration"] = round(time.time() - run_start_time, 3)
+        run["finished_at"] = time.time()
+        self._last_run = run
+        print(f"Prewarmed the trending topics: {run}")
+        return run
+
+    def stats(self) -> dict:
+        """
+        Returns the prewarm counters, today's quota spending and the summary of the last run.
+        """
+        return {
+            "enabled": self.enabled,
+            **self._counters,
+            "quota_units_spent_today": self._quota_units_spent if self._quota_day == quota_ledger.today() else 0,
+            "daily_quota_units": self.daily_quota_units,
+            "last_run": self._last_run,
+        }
+
+    async def _warm_preview(self, topic: str):
+        """Builds the preview of a topic within the quota budget, returning its videos or None if it was skipped."""
+        if self._quota_day != quota_ledger.today():
+            self._quota_day, self._quota_units_spent = quota_ledger.today(), 0
+        # Only as many pages as the remaining budget covers in the worst case, cached pages cost less
+        max_pages = min(YOUTUBE_PREVIEW_MAX_PAGES,
+                        (self.daily_quota_units - self._quota_units_spent) // PREVIEW_PAGE_MAX_UNITS)
+        if quota_ledger.mode() != "normal" or max_pages < 1:
+            self._counters["topics_skipped_quota"] += 1
+            return None
+
+        with quota_ledger.track() as usage:
+            try:
+                videos = (await fill_previews([topic], self.max_results, max_pages=max_pages))[topic]
+            finally:
+                self._quota_units_spent += usage["units"]
+        if isinstance(videos, Exception):
+            self._counters["preview_failures"] += 1
+            detail = videos.detail if isinstance(videos, HTTPException) else str(videos)
+            print(f"Prewarming the preview of {topic} failed: {detail}")
+            return []
+        self._counters["previews_warmed"] += 1
+        return videos
+
+    async def _warm_transcript(self, video_id: str) -> bool:
+        try:
+            await transcript_processor.fetch_by_id(video_id)
+        except Exception as e:
+            self._counters["transcript_failures"] += 1
+            print(f"Prewarming the transcript of {video_id} failed: {e}")
+            return False
+        self._counters["transcripts_warmed"] += 1
+        return True
+
+    async def _warm_summary(self, video_id: str) -> bool:
+        try:
+            # The same path as a generation, so the summary is cached under the key generations look up,
+            # and a generation needing the video meanwhile joins the summary instead of starting another
+            await summarize_video(f"https://www.youtube.com/watch?v={video_id}", 0, ProgressTracker())
+        except Exception as e:
+            self._counters["summary_failures"] += 1
+            print(f"Prewarming the summary of {video_id} failed: {e}")
+            return False
+        self._counters["summaries_warmed"] += 1
+        return True
+
+    async def _run_loop(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Prewarming the trending topics failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+prewarm_service = PrewarmService(job_queue, TRENDING_PREWARM_ENABLED, TRENDING_PREWARM_INTERVAL,
+                                 TRENDING_PREWARM_INITIAL_DELAY, TRENDING_PREWARM_MAX_RESULTS,
+                                 TRENDING_PREWARM_VIDEOS_PER_TOPIC, TRENDING_PREWARM_MAX_SUMMARIES,
+                                 TRENDING_PREWARM_DAILY_QUOTA_UNITS)
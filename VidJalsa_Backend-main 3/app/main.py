@@ -1,10 +1,22 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routes import router 
+from app.job_services.job_queue import job_queue
+from app.youtube_services import get_youtube_service
+from app.youtube_services.async_youtube_client import youtube_client, YOUTUBE_ASYNC_CLIENT
+from app.youtube_services.quota_ledger import quota_ledger
+from app.google_trends_services.trending_service import trending_service
+from app.main_processing_services.llm_chains_interactions import transcript_prefetcher
+from app.job_services.prewarm_service import prewarm_service
+from app.cache_services.deployment_filter import deployment_filter
+from app.cache_services.transcript_cache import transcript_cache
+from app.database_services.custom_query import backfill_deployment_video_hashes
 
 
 app = FastAPI()
@@ -19,6 +31,49 @@ app.add_middleware(
 
 app.include_router(router)
 
+@app.on_event("startup")
+async def start_background_workers():
+    """
+    Starts the job queue workers, resuming the jobs left unfinished by the previous run,
+    the trending topics refresher, the transcript prefetcher, the trending topics prewarm and the
+    transcript cache sweep.
+    """
+    await job_queue.start()
+    await trending_service.start()
+    await transcript_prefetcher.start()
+    await prewarm_service.start()
+    await transcript_cache.start()
+
+@app.on_event("startup")
+async def warm_up_clients():
+    """
+    Builds the threaded YouTube client once per worker when it is used, so the first preview request does not pay for it,
+    loads today's YouTube quota usage, and loads the deployment filter once the deployments stored before
+    the video set hash existed have one.
+    """
+    if not YOUTUBE_ASYNC_CLIENT:
+        await asyncio.to_thread(get_youtube_service)
+    await quota_ledger.load()
+    backfilled = await asyncio.to_thread(backfill_deployment_video_hashes)
+    if backfilled:
+        print(f"Backfilled the video set hash of {backfilled} deployments")
+    await deployment_filter.load()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """
+    Stops the job queue workers, the trending topics refresher, the transcript prefetcher, the
+    trending topics prewarm and the transcript cache sweep, closes the YouTube connections and
+    persists the pending quota usage.
+    """
+    await job_queue.stop()
+    await trending_service.stop()
+    await transcript_prefetcher.stop()
+    await prewarm_service.stop()
+    await transcript_cache.stop()
+    await youtube_client.aclose()
+    await quota_ledger.flush()
+
 app.mount("/" + 'app/user', StaticFiles(directory="app/user"), name="app/user")
 
 def main():
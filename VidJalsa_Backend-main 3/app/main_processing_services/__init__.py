@@ -2,7 +2,9 @@ import os
 import google.generativeai as genai
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import AzureChatOpenAI
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
+from .rate_limiter import ProviderRateLimiter
+from .llm_router import LLMProvider, LLMRouter
 
 azure_image_api = os.getenv('IMAGE_API_KEY')
 if not azure_image_api:
@@ -32,25 +34,61 @@ try:
 except Exception as e:
     raise RuntimeError(f"Failed to configure Google Generative AI: {e}")
 
+# Per-provider quotas, in requests and tokens per minute (0 disables a limit).
+# Retries are handled by the rate limiters below, so the clients' own retries are turned off.
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '0'))
+AZURE_CHAT_REQUESTS_PER_MINUTE = int(os.getenv('AZURE_CHAT_REQUESTS_PER_MINUTE', '60'))
+AZURE_CHAT_TOKENS_PER_MINUTE = int(os.getenv('AZURE_CHAT_TOKENS_PER_MINUTE', '40000'))
+AZURE_IMAGE_REQUESTS_PER_MINUTE = int(os.getenv('AZURE_IMAGE_REQUESTS_PER_MINUTE', '6'))
+PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', '5'))
+
+google_rate_limiter = ProviderRateLimiter("gemini", GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE,
+                                          max_retries=PROVIDER_MAX_RETRIES)
+azure_rate_limiter = ProviderRateLimiter("azure_chat", AZURE_CHAT_REQUESTS_PER_MINUTE, AZURE_CHAT_TOKENS_PER_MINUTE,
+                                         max_retries=PROVIDER_MAX_RETRIES)
+image_rate_limiter = ProviderRateLimiter("azure_image", AZURE_IMAGE_REQUESTS_PER_MINUTE,
+                                         max_retries=PROVIDER_MAX_RETRIES)
+
 # Initialize instances for interacting with AI models.
 # These instances allow for the use of generative AI in processing tasks, such as text summarization and generation.
 try:
-    client = AzureOpenAI(
+    client = AsyncAzureOpenAI(
         api_version="2023-12-01-preview",
         azure_endpoint=azure_image_endpoint,
         api_key= azure_image_api,
+        max_retries=0,
     )
 except Exception as e:
     raise RuntimeError(f"Failed to initialize Azure Image OpenAI instance: {e}")
 
 try:
-    google_llm = ChatGoogleGenerativeAI(google_api_key=GOOGLE_API_KEY, model="gemini-pro")
+    # max_retries counts attempts here, 1 means a single attempt
+    google_llm = ChatGoogleGenerativeAI(google_api_key=GOOGLE_API_KEY, model="gemini-pro", max_retries=1)
 except Exception as e:
     raise RuntimeError(f"Failed to initialize Google Generative AI instance: {e}")
 
 try:
     azure_llm = AzureChatOpenAI(api_key=AZURE_API_KEY, model="gpt-4",
                                 openai_api_version="2023-07-01-preview",
-                                azure_endpoint=AZURE_ENDPOINT, temperature=0.55)
+                                azure_endpoint=AZURE_ENDPOINT, temperature=0.55, max_retries=0)
 except Exception as e:
     raise RuntimeError(f"Failed to initialize Azure Chat OpenAI instance: {e}")
+
+# Route summaries to Gemini and articles to GPT-4, hedging slow calls to the other provider.
+# The hedge fires once a call outlasts LLM_HEDGE_PERCENTILE of the provider's recent latencies.
+GEMINI_CONTEXT_TOKENS = int(os.getenv('GEMINI_CONTEXT_TOKENS', '30720'))
+AZURE_CHAT_CONTEXT_TOKENS = int(os.getenv('AZURE_CHAT_CONTEXT_TOKENS', '8192'))
+LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING_ENABLED', 'true').lower() == 'true'
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '60'))
+# Streamed calls hedge on the time to the first chunk instead of the whole answer
+LLM_HEDGE_DEFAULT_FIRST_CHUNK_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_FIRST_CHUNK_DELAY', '15'))
+
+gemini_provider = LLMProvider("gemini", google_llm, google_rate_limiter, GEMINI_CONTEXT_TOKENS)
+azure_provider = LLMProvider("azure_chat", azure_llm, azure_rate_limiter, AZURE_CHAT_CONTEXT_TOKENS)
+summary_router = LLMRouter("summary", gemini_provider, azure_provider, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES,
+                           LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGING_ENABLED, LLM_HEDGE_DEFAULT_FIRST_CHUNK_DELAY)
+article_router = LLMRouter("article", azure_provider, gemini_provider, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES,
+                           LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGING_ENABLED, LLM_HEDGE_DEFAULT_FIRST_CHUNK_DELAY)
@@ -0,0 +1,116 @@
+import json
+
+
+class IncrementalArticleParser:
+    """
+    Parses the JSON article returned by the LLM while it is being streamed.
+
+    Text is fed in arbitrary pieces. The parser follows the JSON structure character by character,
+    so brackets, braces, commas and escaped quotes inside strings are handled correctly, and every
+    top-level string field (Title, Question, Author) or element of the Paragraphs array is reported
+    as soon as its closing quote arrives. Anything before the first '{', such as a ```json fence,
+    is ignored.
+    """
+
+    def __init__(self):
+        self.article = {"Paragraphs": []}
+        self.completed = False
+        self._started = False
+        self._containers = []
+        self._expecting_key = False
+        self._current_key = None
+        self._top_level_key = None
+        self._in_string = False
+        self._escaped = False
+        self._string_buffer = []
+
+    def feed(self, text: str) -> list:
+        """
+        Feeds the next piece of the streamed answer.
+
+        Parameters:
+        - text (str): The next piece of text.
+
+        Returns:
+        - list: The (field, value) pairs completed by this piece, where field is the article key, or
+          "Paragraph" for an element of the Paragraphs array.
+        """
+        completed_fields = []
+        for character in text:
+            if self.completed:
+                break
+            if not self._started:
+                if character == "{":
+                    self._started = True
+                    self._open("object")
+                continue
+
+            if self._in_string:
+                self._string_buffer.append(character)
+                if self._escaped:
+                    self._escaped = False
+                elif character == "\\":
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+                    field = self._close_string()
+                    if field is not None:
+                        completed_fields.append(field)
+                continue
+
+            if character == '"':
+                self._in_string = True
+                self._string_buffer = ['"']
+            elif character == "{":
+                self._open("object")
+            elif character == "[":
+                self._open("array")
+            elif character in "}]" and self._containers:
+                self._containers.pop()
+                if not self._containers:
+                    self.completed = True
+            elif character == ":":
+                self._expecting_key = False
+            elif character == ",":
+                self._expecting_key = self._containers[-1] == "object"
+        return completed_fields
+
+    def _open(self, container: str):
+        self._containers.append(container)
+        self._expecting_key = container == "object"
+
+    def _close_string(self):
+        try:
+            value = json.loads("".join(self._string_buffer))
+        except ValueError:
+            value = "".join(self._string_buffer)[1:-1]
+
+        depth = len(self._containers)
+        if self._containers[-1] == "object" and self._expecting_key:
+            self._current_key = value
+            if depth == 1:
+                self._top_level_key = value
+            return None
+
+        if depth == 1:
+            self.article[self._top_level_key] = value
+            return self._top_level_key, value
+        if depth == 2 and self._containers[-1] == "array" and self._top_level_key == "Paragraphs":
+            self.article["Paragraphs"].append(value)
+            return "Paragraph", value
+        return None
+
+
+def parse_article_json(text: str) -> dict:
+    """
+    Parses a complete JSON article answer with the incremental parser.
+
+    Parameters:
+    - text (str): The LLM answer.
+
+    Returns:
+    - dict: The article fields found in the answer.
+    """
+    parser = IncrementalArticleParser()
+    parser.feed(text)
+    return parser.article
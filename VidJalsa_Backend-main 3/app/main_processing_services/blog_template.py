@@ -562,4 +562,7 @@ content_template = """
         <script src="https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0-alpha.6/js/bootstrap.min.js" integrity="sha384-vBWWzlZJ8ea9aCX4pEW3rVHjgjt7zpkNpZk+02D9phzyeVkE+jo0ieGizqPLForn" crossorigin="anonymous"></script>
         </body>
         </html>
-    """ 
\ No newline at end of file
+    """ 
+# Shown until the generated blog image is ready; inline so published pages never reference a missing file
+image_placeholder_url = ("data:image/svg+xml;utf8,<svg xmlns='http://www.w3.org/2000/svg' width='1200' height='650'>"
+                         "<rect width='100%25' height='100%25' fill='%23e9ecef'/></svg>")
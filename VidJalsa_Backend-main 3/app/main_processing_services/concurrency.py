@@ -0,0 +1,44 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many calls of one kind run at the same time across the whole process.
+
+    Calls beyond the limit wait for a free slot. The limiter keeps counters of the calls that
+    are running and waiting, the peak concurrency, and the time spent waiting for a slot.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self._counters = {"in_flight": 0, "waiting": 0, "peak_in_flight": 0, "calls": 0, "wait_seconds": 0.0}
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds one slot of the limiter for the duration of the wrapped block.
+        """
+        wait_start_time = time.time()
+        self._counters["waiting"] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._counters["waiting"] -= 1
+        self._counters["wait_seconds"] += time.time() - wait_start_time
+        self._counters["calls"] += 1
+        self._counters["in_flight"] += 1
+        self._counters["peak_in_flight"] = max(self._counters["peak_in_flight"], self._counters["in_flight"])
+        try:
+            yield
+        finally:
+            self._counters["in_flight"] -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        """
+        Returns the limit and the counters of the limiter.
+        """
+        return {"limit": self.limit, **self._counters, "wait_seconds": round(self._counters["wait_seconds"], 3)}
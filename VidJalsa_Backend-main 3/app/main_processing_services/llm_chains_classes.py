@@ -1,27 +1,79 @@
-import time
+import os
+import math
+import asyncio
+import hashlib
 
 from fastapi import HTTPException
 from youtube_transcript_api import YouTubeTranscriptApi
 from langchain.prompts import PromptTemplate
-from langchain.chains.summarize import load_summarize_chain
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
-from langchain_core.output_parsers import StrOutputParser
-from .utils import extract_video_id
+from .utils import extract_video_id, normalize_transcript, count_tokens, parse_json_like_string, TOKEN_ENCODING
+from .article_parser import IncrementalArticleParser, parse_article_json
+from app.cache_services.transcript_cache import transcript_cache
+from app.cache_services.single_flight import SingleFlight
+from .concurrency import ConcurrencyLimiter
 from .prompts_templates import summarize_prompt_text, blog_gen_prompt_text , image_generation_prompt
-from . import google_llm, azure_llm , client
+from . import google_llm, client, image_rate_limiter, summary_router, article_router
 import json
 from .prompts_templates import summarize_prompt_text, blog_gen_prompt_text, blog_quality_template
+from .prompts_templates import stuff_summarize_prompt_text
 from . import google_llm, azure_llm
 
+# Seconds between the coarse timestamps kept in normalized transcripts, 0 leaves them out
+TRANSCRIPT_TIMESTAMP_INTERVAL = int(os.getenv('TRANSCRIPT_TIMESTAMP_INTERVAL', '0'))
+
+# Token budget of one summarization call: the model context window minus room for the answer.
+# Gemini has no local tokenizer, so counts use TOKEN_ENCODING and the reserve doubles as a safety margin.
+SUMMARY_CONTEXT_TOKENS = int(os.getenv('SUMMARY_CONTEXT_TOKENS', '30720'))
+SUMMARY_OUTPUT_RESERVE_TOKENS = int(os.getenv('SUMMARY_OUTPUT_RESERVE_TOKENS', '4096'))
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv('SUMMARY_CHUNK_OVERLAP_TOKENS', '200'))
+
+# Maximum number of chunk summarization calls in flight at once, shared by every job in the process
+SUMMARY_MAP_CONCURRENCY = int(os.getenv('SUMMARY_MAP_CONCURRENCY', '8'))
+map_step_limiter = ConcurrencyLimiter(SUMMARY_MAP_CONCURRENCY)
+
+# Expected answer length of one LLM call, used to charge the tokens-per-minute rate limits
+ESTIMATED_OUTPUT_TOKENS = int(os.getenv('ESTIMATED_OUTPUT_TOKENS', '1024'))
+
+# Identifies how summaries are produced, part of the summary cache key next to the prompt texts:
+# token aware chunks, one call merging the map and combine prompts for a transcript that fits one chunk,
+# otherwise a map call per chunk and the combine call
+SUMMARY_STRATEGY_VERSION = "token-chunks-stuff-or-map-combine-v3"
+
+# The character based splitting used before token aware chunking, kept to report the savings
+LEGACY_CHUNK_SIZE = 32000
+LEGACY_CHUNK_OVERLAP = 3200
+
 class TranscriptProcessor:
     """
     Handles the fetching, chunking, and summarizing of YouTube video transcripts.
     """
-    
-    def fetch(self, url: str) -> list:
+    def __init__(self):
+        # Identify the summaries this processor produces, used as the summary cache key. A summary is stored
+        # under the models that produced it, and any model the summary router may use is accepted on lookups
+        router_models = sorted({summary_router.primary.model_name, summary_router.secondary.model_name})
+        self.model_names = list(dict.fromkeys([summary_router.primary.model_name, *router_models,
+                                               "+".join(router_models)]))
+        self.prompt_hash = hashlib.sha256((SUMMARY_STRATEGY_VERSION + summarize_prompt_text
+                                           + blog_quality_template).encode("utf-8")).hexdigest()
+        self.stats = {"transcripts_normalized": 0, "original_chars": 0, "normalized_chars": 0,
+                      "stuff_summaries": 0, "map_reduce_summaries": 0, "llm_calls": 0, "llm_calls_saved": 0,
+                      "tokens_sent": 0, "tokens_saved": 0}
+        # Every chunk has to fit next to the map prompt in one context window
+        self.prompt_tokens = count_tokens(summarize_prompt_text)
+        self.combine_prompt_tokens = count_tokens(blog_quality_template)
+        self.stuff_prompt_tokens = count_tokens(stuff_summarize_prompt_text)
+        self.chunk_token_budget = SUMMARY_CONTEXT_TOKENS - SUMMARY_OUTPUT_RESERVE_TOKENS - self.prompt_tokens
+        # Concurrent fetches of the same video, e.g. a generation and a prefetch, share one download
+        self.transcript_fetches = SingleFlight()
+
+    async def fetch(self, url: str) -> list:
         """
         Retrieves the transcript for a given YouTube video URL.
+
+        Transcripts are served from the transcript cache when possible. On a miss the transcript API,
+        which is synchronous, runs in a worker thread to keep the event loop free and its result is cached.
         
         Parameters:
         - url (str): The YouTube video URL.
@@ -33,18 +85,55 @@ class TranscriptProcessor:
         - HTTPException: If fetching the transcript fails.
         """
         try:
-            video_id = extract_video_id(url)
-            transcript = YouTubeTranscriptApi.get_transcript(video_id)
+            transcript, _ = await self.fetch_by_id(extract_video_id(url))
             return transcript
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred during fetching: {str(e)}")
 
-    def chunk(self, transcript: list) -> list:
+    async def fetch_by_id(self, video_id: str) -> tuple:
+        """
+        Retrieves the transcript of a video from the transcript cache, or downloads and caches it.
+        Concurrent calls for the same video share one lookup.
+
+        Parameters:
+        - video_id (str): The YouTube video ID.
+
+        Returns:
+        - tuple: The transcript as a list of dictionaries, and whether it came from the cache.
+        """
+        async def lookup():
+            transcript = await transcript_cache.get(video_id)
+            if transcript is not None:
+                return transcript, True
+            transcript = await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id)
+            await transcript_cache.set(video_id, transcript)
+            return transcript, False
+
+        return await self.transcript_fetches.do(video_id, lookup)
+
+    def normalize(self, transcript: list) -> tuple:
         """
-        Chunks a transcript into smaller parts if necessary.
+        Converts fetched transcript segments into compact plain text before chunking.
         
         Parameters:
-        - transcript (list): The transcript to be chunked.
+        - transcript (list): The fetched transcript as a list of dictionaries.
+        
+        Returns:
+        - tuple: The normalized transcript text and a dictionary describing the size reduction.
+        """
+        normalized_transcript, normalization_stats = normalize_transcript(transcript, TRANSCRIPT_TIMESTAMP_INTERVAL)
+        self.stats["transcripts_normalized"] += 1
+        self.stats["original_chars"] += normalization_stats["original_chars"]
+        self.stats["normalized_chars"] += normalization_stats["normalized_chars"]
+        return normalized_transcript, normalization_stats
+
+    def chunk(self, transcript: str) -> list:
+        """
+        Chunks a normalized transcript into smaller parts if necessary. Chunk sizes are measured in tokens,
+        so a transcript that fits in one context window stays a single chunk.
+        
+        Parameters:
+        - transcript (str): The normalized transcript text to be chunked.
         
         Returns:
         - list: A list of chunked transcripts.
@@ -53,21 +142,66 @@ class TranscriptProcessor:
         - HTTPException: If chunking the transcript fails.
         """
         try:
-            transcript_splitter = RecursiveCharacterTextSplitter(chunk_size=32000, chunk_overlap=3200)
-            doc = [Document(page_content=str(transcript), metadata={"source": "local"})]
+            transcript_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                encoding_name=TOKEN_ENCODING, chunk_size=self.chunk_token_budget,
+                chunk_overlap=SUMMARY_CHUNK_OVERLAP_TOKENS)
+            doc = [Document(page_content=transcript, metadata={"source": "local"})]
             return transcript_splitter.split_documents(doc)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred during chunking: {str(e)}")
 
-    def summarize(self, chunked_transcripts: list) -> str:
+    def plan_stats(self, transcript: list, chunked_transcripts: list) -> dict:
+        """
+        Describes the summarization plan of a transcript and what it saves over the former character based
+        plan, which sent the raw transcript in 32000 character chunks through a map call per chunk plus a
+        combine call.
+        
+        Parameters:
+        - transcript (list): The fetched transcript as a list of dictionaries.
+        - chunked_transcripts (list): The chunks produced by `chunk`.
+        
+        Returns:
+        - dict: The chain type, token counts and LLM call counts of both plans.
+        """
+        legacy_transcript = str(transcript)
+        legacy_chunks = max(1, math.ceil((len(legacy_transcript) - LEGACY_CHUNK_OVERLAP)
+                                         / (LEGACY_CHUNK_SIZE - LEGACY_CHUNK_OVERLAP)))
+        # The overlap repeats part of every chunk after the first one
+        legacy_chars_sent = len(legacy_transcript) + (legacy_chunks - 1) * LEGACY_CHUNK_OVERLAP
+        legacy_tokens = count_tokens(legacy_transcript) * legacy_chars_sent // max(1, len(legacy_transcript))
+        chunk_tokens = sum(count_tokens(chunk.page_content) for chunk in chunked_transcripts)
+        single_call = self._fits_single_call(chunked_transcripts)
+        # Longer transcripts get a map call per chunk, then the combine call shapes the summary for the blog
+        llm_calls = 1 if single_call else len(chunked_transcripts) + 1
+        plan = {
+            "chain_type": "stuff" if single_call else "map_reduce",
+            "chunks": len(chunked_transcripts),
+            "tokens_sent": chunk_tokens,
+            "llm_calls": llm_calls,
+            "tokens_saved": max(0, legacy_tokens - chunk_tokens),
+            "llm_calls_saved": max(0, legacy_chunks + 1 - llm_calls),
+        }
+        self.stats[f"{plan['chain_type']}_summaries"] += 1
+        for counter in ("llm_calls", "llm_calls_saved", "tokens_sent", "tokens_saved"):
+            self.stats[counter] += plan[counter]
+        return plan
+
+    async def summarize(self, chunked_transcripts: list, on_chunk_summarized=None) -> tuple:
         """
-        Summarizes chunked transcripts.
+        Summarizes chunked transcripts. A transcript that fits one chunk is summarized with one "stuff" call,
+        whose prompt merges the map and combine instructions. Longer transcripts use a map-reduce over the
+        chunks: every chunk is summarized concurrently, then the chunk summaries are combined into a single
+        blog-ready summary. Chunk calls of all jobs share the process-wide `map_step_limiter`, so chunks fan
+        out as far as the limit allows without flooding the provider.
         
         Parameters:
         - chunked_transcripts (list): The transcripts to be summarized.
+        - on_chunk_summarized (callable): Optional callback called with (chunk_index, chunk_count)
+          every time a chunk summary is ready.
         
         Returns:
-        - str: The summarized transcript.
+        - tuple: The summarized transcript, and the name of the model that produced it, joined with "+"
+          when hedged calls spread it over several models.
         
         Raises:
         - HTTPException: If summarization fails.
@@ -75,22 +209,72 @@ class TranscriptProcessor:
         try:
             summarize_prompt = PromptTemplate(template=summarize_prompt_text, input_variables=["text"])
             blog_quality_prompt = PromptTemplate(template=blog_quality_template, input_variables=["text"])
-            summarize_chain = load_summarize_chain(llm=google_llm, chain_type="map_reduce", map_prompt=summarize_prompt, combine_prompt = blog_quality_prompt)
-            summarized_transcript = summarize_chain.run({'input_documents': chunked_transcripts})
-            return summarized_transcript
+            if self._fits_single_call(chunked_transcripts):
+                stuff_prompt = PromptTemplate(template=stuff_summarize_prompt_text, input_variables=["text"])
+                async with map_step_limiter.slot():
+                    summarized_transcript, model_name = await self._summarize_text(
+                        stuff_prompt, chunked_transcripts[0].page_content, self.stuff_prompt_tokens)
+                if on_chunk_summarized is not None:
+                    on_chunk_summarized(0, 1)
+                return summarized_transcript, model_name
+
+            async def summarize_chunk(chunk_index, chunk):
+                async with map_step_limiter.slot():
+                    chunk_summary = await self._summarize_text(summarize_prompt, chunk.page_content, self.prompt_tokens)
+                if on_chunk_summarized is not None:
+                    on_chunk_summarized(chunk_index, len(chunked_transcripts))
+                return chunk_summary
+
+            chunk_summaries = await asyncio.gather(*(summarize_chunk(chunk_index, chunk)
+                                                     for chunk_index, chunk in enumerate(chunked_transcripts)))
+            summarized_transcript, combine_model = await self._summarize_text(
+                blog_quality_prompt, "\n\n".join(chunk_summary for chunk_summary, _ in chunk_summaries),
+                self.combine_prompt_tokens)
+            models = [chunk_model for _, chunk_model in chunk_summaries] + [combine_model]
+            return summarized_transcript, "+".join(sorted(set(models)))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred during summarization: {str(e)}")
 
+    def _fits_single_call(self, chunked_transcripts: list) -> bool:
+        """Returns whether the transcript is one chunk that fits in a context window next to the stuff prompt."""
+        return (len(chunked_transcripts) == 1
+                and count_tokens(chunked_transcripts[0].page_content) + self.stuff_prompt_tokens
+                <= SUMMARY_CONTEXT_TOKENS - SUMMARY_OUTPUT_RESERVE_TOKENS)
+
+    async def _summarize_text(self, prompt: PromptTemplate, text: str, prompt_tokens: int) -> tuple:
+        """Runs a summarization prompt on a text through the summary router, returning the text and its model."""
+        estimated_tokens = prompt_tokens + count_tokens(text) + ESTIMATED_OUTPUT_TOKENS
+        summary, provider = await summary_router.ainvoke(prompt, {'text': text}, estimated_tokens,
+                                                         return_provider=True)
+        return summary, provider.model_name
+
 
 
 class ArticleGenerator:
     """
     Generates an article based on a combined summarized transcript.
     """
+    ARTICLE_FIELDS = ("Title", "Question", "Author", "Paragraphs")
+
     def __init__(self):
-        self.output_parser = StrOutputParser()
+        self.prompt_tokens = count_tokens(blog_gen_prompt_text)
 
-    def generate(self, combined_summarized_transcript: str) -> dict:
+    def parse(self, response: str) -> dict:
+        """
+        Parses the JSON article answer, falling back to the line-based parser for answers that are not valid JSON.
+
+        Parameters:
+        - response (str): The LLM answer.
+
+        Returns:
+        - dict: The article fields.
+        """
+        article = parse_article_json(response)
+        if all(article.get(field) for field in self.ARTICLE_FIELDS):
+            return article
+        return parse_json_like_string(response)
+
+    async def generate(self, combined_summarized_transcript: str) -> dict:
         """
         Generates the final article from the combined summarized transcript.
         
@@ -104,25 +288,59 @@ class ArticleGenerator:
         - HTTPException: If article generation fails.
         """
         try:
-            second_prompt_start_time = time.time()
             blog_gen_prompt = PromptTemplate(template=blog_gen_prompt_text, input_variables=["combined_summarized_transcript"])
-            blog_gen_chain = blog_gen_prompt | azure_llm | self.output_parser
-            response = blog_gen_chain.invoke({'combined_summarized_transcript': combined_summarized_transcript})
-            second_prompt_end_time = time.time()
-            print(f" second_prompt_time  {second_prompt_end_time - second_prompt_start_time}")
+            estimated_tokens = self.prompt_tokens + count_tokens(combined_summarized_transcript) + ESTIMATED_OUTPUT_TOKENS
+            response = await article_router.ainvoke(
+                blog_gen_prompt, {'combined_summarized_transcript': combined_summarized_transcript}, estimated_tokens)
             return response
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred in article generation: {str(e)}")
+
+    async def generate_stream(self, combined_summarized_transcript: str, on_article_part=None) -> dict:
+        """
+        Generates the final article while streaming it, reporting every field as soon as it is complete.
+
+        Parameters:
+        - combined_summarized_transcript (str): The summarized transcript to generate the article from.
+        - on_article_part (callable): Optional callback called with (field, value) for the title, question,
+          author and each paragraph, as they arrive.
+
+        Returns:
+        - dict: The parsed article.
+
+        Raises:
+        - HTTPException: If article generation fails.
+        """
+        try:
+            blog_gen_prompt = PromptTemplate(template=blog_gen_prompt_text, input_variables=["combined_summarized_transcript"])
+            estimated_tokens = self.prompt_tokens + count_tokens(combined_summarized_transcript) + ESTIMATED_OUTPUT_TOKENS
+            parser = IncrementalArticleParser()
+            response_chunks = []
+            async for chunk in article_router.astream(
+                    blog_gen_prompt, {'combined_summarized_transcript': combined_summarized_transcript}, estimated_tokens):
+                response_chunks.append(chunk)
+                for field, value in parser.feed(chunk):
+                    if on_article_part is not None:
+                        on_article_part(field, value)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An error occurred in article generation: {str(e)}")
+
+        if all(parser.article.get(field) for field in self.ARTICLE_FIELDS):
+            return parser.article
+        return parse_json_like_string("".join(response_chunks))
         
 class image_generator:
     """Generate an image based on the video title"""
-    def Generate_image(video_title: str):
+    # Cached images are keyed by this hash, so editing the prompt stops reusing the old images
+    prompt_hash = hashlib.sha256(image_generation_prompt.encode("utf-8")).hexdigest()
+
+    async def Generate_image(video_title: str):
         try:
-            generated_image = client.images.generate(
+            generated_image = await image_rate_limiter.call(lambda: client.images.generate(
                 model="dalle_images_lookup",
                 prompt=image_generation_prompt.format(video_title=video_title),
                 n=1,
-            )
+            ))
 
             image_url = json.loads(generated_image.json())['data'][0]['url']
             return image_url
@@ -1,48 +1,140 @@
+import os
 import time
-import threading
+import uuid
+import asyncio
 from fastapi import HTTPException
-from .utils import (directory_generator, render_blog, parse_json_like_string, 
-                    generate_deployment_url, extract_video_ids)
+from .utils import (directory_generator, render_blog, image_placeholder_url,
+                    generate_deployment_url, extract_video_ids, extract_video_id, video_set_hash)
 from .llm_chains_classes import TranscriptProcessor, ArticleGenerator, image_generator
+from .progress import ProgressTracker
+from .transcript_prefetcher import (TranscriptPrefetcher, TRANSCRIPT_PREFETCH_ENABLED, TRANSCRIPT_PREFETCH_NORMALIZE,
+                                    TRANSCRIPT_PREFETCH_WORKERS, TRANSCRIPT_PREFETCH_QUEUE_SIZE,
+                                    TRANSCRIPT_PREFETCH_PER_PREVIEW, TRANSCRIPT_PREFETCH_PER_MINUTE,
+                                    TRANSCRIPT_PREFETCH_WINDOW, TRANSCRIPT_PREFETCH_MAX_TRACKED,
+                                    TRANSCRIPT_PREFETCH_MAX_NORMALIZED)
 from app.database import database_connection
 from app.database.database import AbstractDatabase
 from app.database.cruds.blog_crud import BlogCRUD
 from app.database.cruds.deployment_crud import DeploymentCRUD
 from app.database_services.custom_query import check_deployment_video_exists
+from app.cache_services.summary_cache import summary_cache
+from app.cache_services.image_cache import image_cache
+from app.cache_services.single_flight import RefCountedSingleFlight
+from app.cache_services.deployment_filter import deployment_filter
 import datetime
-import time
 from typing import List
 
+# Stream the article and report its fields as they arrive instead of waiting for the whole answer
+ARTICLE_STREAMING = os.getenv('ARTICLE_STREAMING', 'true').lower() == 'true'
+
 transcript_processor = TranscriptProcessor()
 article_generator = ArticleGenerator()
+transcript_prefetcher = TranscriptPrefetcher(transcript_processor, TRANSCRIPT_PREFETCH_ENABLED,
+                                             TRANSCRIPT_PREFETCH_NORMALIZE, TRANSCRIPT_PREFETCH_WORKERS,
+                                             TRANSCRIPT_PREFETCH_QUEUE_SIZE, TRANSCRIPT_PREFETCH_PER_PREVIEW,
+                                             TRANSCRIPT_PREFETCH_PER_MINUTE, TRANSCRIPT_PREFETCH_WINDOW,
+                                             TRANSCRIPT_PREFETCH_MAX_TRACKED, TRANSCRIPT_PREFETCH_MAX_NORMALIZED)
+
+# Strong references to the running image patch tasks, the event loop only keeps weak ones
+image_patch_tasks = set()
+# Fetch and summary of each video in flight, shared by the jobs that need the video at the same time
+video_summaries_in_flight = RefCountedSingleFlight()
+# The (progress tracker, video index) of every job waiting for a video in flight, by video ID
+video_summary_listeners = {}
+
+
+class VideoProgress:
+    """
+    Forwards the progress of a shared video summary to every job waiting for it, under each job's video index.
+    """
 
+    def __init__(self, listeners: list):
+        self.listeners = listeners
 
-def fetch_summarize_process(url, idx):
+    def emit(self, event: str, **data):
+        for progress, idx in list(self.listeners):
+            progress.emit(event, **{**data, "video": idx})
+
+    def add_stats(self, **counters):
+        # Only the job that started the shared work is charged for it
+        if self.listeners:
+            self.listeners[0][0].add_stats(**counters)
+
+
+async def fetch_summarize_process(url, idx, progress: ProgressTracker):
     """
-    Fetches, chunks, summarizes a transcript, prints the time taken, and returns a summarized string.
+    Fetches, chunks, summarizes a transcript, reports each step to the progress tracker, and returns a summarized string.
+    The summary is stored in the summary cache so later combinations containing this video can reuse it.
+    A transcript prefetched when the video was previewed is picked up from the cache, already normalized if
+    the prefetcher normalizes.
     """
-    start_thread_time = time.time()
+    start_task_time = time.time()
     try:
-        fetched_transcript = transcript_processor.fetch(url)
+        video_id = extract_video_id(url)
+        fetched_transcript = await transcript_processor.fetch(url)
         if fetched_transcript is None:
             return ""
-        chunked_transcripts = transcript_processor.chunk(fetched_transcript)
-        summarized_transcript = transcript_processor.summarize(chunked_transcripts)
-        end_thread_time = time.time()
-        print(f"Thread {idx} processing time: {end_thread_time - start_thread_time} seconds")
+        progress.emit("transcript_fetched", video=idx, url=url, segments=len(fetched_transcript))
+        normalized_transcript, normalization_stats = (transcript_prefetcher.take_normalized(video_id)
+                                                      or transcript_processor.normalize(fetched_transcript))
+        progress.emit("transcript_normalized", video=idx, **normalization_stats)
+        chunked_transcripts = transcript_processor.chunk(normalized_transcript)
+        plan_stats = transcript_processor.plan_stats(fetched_transcript, chunked_transcripts)
+        progress.emit("summary_planned", video=idx, **plan_stats)
+        progress.add_stats(**{counter: value for counter, value in plan_stats.items() if counter != "chain_type"})
+
+        def report_chunk(chunk_index, chunk_count):
+            progress.emit("chunk_summarized", video=idx, chunk=chunk_index + 1, chunks=chunk_count)
+
+        summarized_transcript, model_name = await transcript_processor.summarize(chunked_transcripts, report_chunk)
+        await summary_cache.set(video_id, transcript_processor.prompt_hash, model_name, summarized_transcript)
+        progress.emit("video_summarized", video=idx, duration=round(time.time() - start_task_time, 3))
         return summarized_transcript
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing video URL {url}: {str(e)}")
 
 
+async def summarize_video(url, idx, progress: ProgressTracker):
+    """
+    Fetches and summarizes one video of a job, see `fetch_summarize_process`.
+
+    Jobs that need the same video at the same time share one fetch and one summary and all receive its
+    progress events. A job that stops waiting leaves the work running for the others, it is cancelled
+    only once no job waits for it.
+    """
+    video_id = extract_video_id(url)
+    if video_summaries_in_flight.in_flight(video_id):
+        progress.emit("video_shared", video=idx, url=url)
+        progress.add_stats(videos_shared=1)
+    listeners = video_summary_listeners.setdefault(video_id, [])
+    listener = (progress, idx)
+    listeners.append(listener)
+    try:
+        return await video_summaries_in_flight.do(
+            video_id, lambda: fetch_summarize_process(url, idx, VideoProgress(listeners)))
+    finally:
+        listeners.remove(listener)
+        if not listeners and video_summary_listeners.get(video_id) is listeners:
+            del video_summary_listeners[video_id]
+
+
+async def run_stage(progress: ProgressTracker, name: str, coroutine):
+    """Awaits a coroutine while recording its duration as a stage of the given progress tracker."""
+    async with progress.stage(name):
+        return await coroutine
+
+
 def generate_deployment_name(base_username="hamza"):
-    """Generates a unique deployment name based on the username and current timestamp."""
+    """
+    Generates a unique deployment name based on the username and current timestamp. Concurrent generations
+    can publish within the same second, so a random suffix keeps their directories apart.
+    """
     now = datetime.datetime.now()
     formatted_time = now.strftime("%Y-%m-%d_%H-%M-%S")
-    return f"{base_username}_{formatted_time}"
+    return f"{base_username}_{formatted_time}_{uuid.uuid4().hex[:8]}"
 
 
-def handle_existing_blog(blog, blogCrud):
+async def handle_existing_blog(blog, blogCrud):
     """
     Handles the processing for an existing blog by generating its deployment URL.
 
@@ -53,99 +145,210 @@ def handle_existing_blog(blog, blogCrud):
     Returns:
     - dict: A dictionary containing a message and the deployment URL.
     """
-    exited_blog = blogCrud.get(blog.blog_id)
+    deployment_name = generate_deployment_name()
+    exited_blog = await asyncio.to_thread(blogCrud.get, blog.blog_id)
     html_content = render_blog(title=exited_blog.title, question=exited_blog.question, author=exited_blog.user_id,
                                paragraphs=exited_blog.paragraphs,image_url=exited_blog.image_url)
-    directory_name = directory_generator(html_content, "app/user", generate_deployment_name())
+    directory_name = await asyncio.to_thread(directory_generator, html_content, "app/user", deployment_name)
+    if exited_blog.image_url == image_placeholder_url:
+        # The image of this blog is still generating, in this worker or another one, so this copy is recorded
+        # on the blog and patched along with the original
+        if not await asyncio.to_thread(blogCrud.add_pending_image_deployment, blog.blog_id, deployment_name,
+                                       image_placeholder_url):
+            # The image landed while this copy was rendered
+            exited_blog = await asyncio.to_thread(blogCrud.get, blog.blog_id)
+            html_content = render_blog(title=exited_blog.title, question=exited_blog.question,
+                                       author=exited_blog.user_id, paragraphs=exited_blog.paragraphs,
+                                       image_url=exited_blog.image_url)
+            await asyncio.to_thread(directory_generator, html_content, "app/user", deployment_name)
     deployment_url = generate_deployment_url(directory_name)
-    time.sleep(0.5)  # Pause for 1 second
+    await asyncio.sleep(0.5)  # Pause for half a second
     return {"message": "The Processing Is Finished!", "deployment_url": deployment_url}
 
 
-def generate_video_image_task(results, topic):
-    results['generate_video_image'] = generate_video_image(topic)
-
-
-def fetch_summarize_process_task(url, idx, results):
-    results[idx] = fetch_summarize_process(url, idx)
-
-
-def process_new_blog(video_urls, sorted_ids_string, blogCrud, deploymentCrud, topic):
+async def process_new_blog(video_urls, sorted_ids_string, blogCrud, deploymentCrud, topic, progress: ProgressTracker):
     """
     Processes new blogs from video URLs, saves them, and generates a deployment URL. Also records the deployment
     in the database using DeploymentCRUD.
 
+    Videos that already have a cached summary skip the fetch/summarize step entirely.
+    The per-video fetch/summarize steps run concurrently on the event loop, and the blocking database and
+    file-system calls are pushed to worker threads, so other requests keep being served while a blog is
+    generated. The image is generated in the background: the blog is saved and published with a placeholder,
+    and `patch_blog_image` swaps the image in once it is ready.
+
     Parameters:
     - video_urls (list): A list of video URLs to process.
     - sorted_ids_string (str): A string of sorted video IDs used for deployment tracking.
     - blogCrud: The CRUD object for blog operations.
     - deploymentCrud: The CRUD object for deployment operations.
+    - topic (str): The topic used to generate the blog image.
+    - progress (ProgressTracker): Collects the per-stage timings of this run.
 
     Returns:
     - dict: A dictionary containing a message and the deployment URL.
     """
 
-    results = {}
-    threads = []
-
-    all_threads_time = time.time()
-
-    thread = threading.Thread(target=generate_video_image_task, args=(results, topic))
-    threads.append(thread)
-    thread.start()
-
-    for i, url in enumerate(video_urls):
-        thread = threading.Thread(target=fetch_summarize_process_task, args=(url, i, results))
-        threads.append(thread)
-        thread.start()
-
-    for thread in threads:
-        thread.join()
-
-
-    print(f"all_threads_time {time.time() - all_threads_time}")
-
-    image_result = results.get('generate_video_image')
-
-    summarized_transcripts = [results[i] for i in range(len(video_urls)) if i in results]
-    combined_summarized_transcript = "\n\n\n\n".join(summarized_transcripts)
-
-    json_output = article_generator.generate(combined_summarized_transcript)
-    json_output = parse_json_like_string(json_output)
+    all_tasks_time = time.time()
+
+    video_ids = [extract_video_id(url) for url in video_urls]
+    async with progress.stage("summary_cache_lookup"):
+        cached_summaries = await summary_cache.get_many(video_ids, transcript_processor.prompt_hash,
+                                                        transcript_processor.model_names)
+    pending_videos = []
+    for i, (url, video_id) in enumerate(zip(video_urls, video_ids)):
+        if video_id in cached_summaries:
+            progress.emit("summary_cache_hit", video=i, url=url)
+        else:
+            transcript_prefetcher.record_use(video_id)
+            pending_videos.append((i, url))
+
+    image_task = asyncio.create_task(run_stage(progress, "image_generation", generate_video_image(topic, progress)))
+    # The image is cancelled if the blog fails before it could be handed over to patch_blog_image
+    image_handed_off = False
+    try:
+        video_results = await asyncio.gather(
+            *(run_stage(progress, f"video_{i}", summarize_video(url, i, progress))
+              for i, url in pending_videos),
+            return_exceptions=True,
+        )
+        results_by_index = {i: result for (i, _), result in zip(pending_videos, video_results)}
+
+        progress.emit("videos_processed", duration=round(time.time() - all_tasks_time, 3))
+
+        # A video that fails to process is skipped instead of failing the whole blog
+        summarized_transcripts = []
+        for i, (url, video_id) in enumerate(zip(video_urls, video_ids)):
+            if video_id in cached_summaries:
+                summarized_transcripts.append(cached_summaries[video_id])
+                continue
+            result = results_by_index[i]
+            if isinstance(result, Exception):
+                progress.emit("video_skipped", url=url, error=str(result))
+                continue
+            summarized_transcripts.append(result)
+
+        combined_summarized_transcript = "\n\n\n\n".join(summarized_transcripts)
+
+        async with progress.stage("article_generation"):
+            if ARTICLE_STREAMING:
+                json_output = await article_generator.generate_stream(
+                    combined_summarized_transcript,
+                    on_article_part=lambda field, value: progress.emit("article_part", field=field, value=value))
+            else:
+                json_output = article_generator.parse(await article_generator.generate(combined_summarized_transcript))
+        progress.emit("article_generated", title=json_output.get("Title"),
+                      duration=progress.stage_timings["article_generation"])
+
+        after_second_propmt_time = time.time()
+
+        # The image is usually still generating here; if it already landed it is used directly
+        image_url = image_placeholder_url
+        if image_task.done() and not image_task.cancelled() and image_task.exception() is None:
+            image_url = image_task.result()
+
+        async with progress.stage("database_save"):
+            deployment_name = generate_deployment_name()
+            # Add new blog entry to the database, recording the deployment to patch once the image is ready
+            current_blog = await asyncio.to_thread(blogCrud.add, 1, json_output["Title"], json_output["Question"],
+                                                   json_output["Paragraphs"], image_url,
+                                                   [deployment_name] if image_url == image_placeholder_url else None)
+
+            # Deployment record creation
+            video_set = video_set_hash(video_ids)
+            try:
+                deployment = await asyncio.to_thread(deploymentCrud.add, deployment_name=deployment_name,
+                                                     deployment_video=sorted_ids_string, user_id=1,
+                                                     blog_id=int(current_blog.id), deployment_video_hash=video_set)
+            except Exception:
+                # No deployment points at the new blog, so it is not kept
+                await asyncio.to_thread(blogCrud.delete, int(current_blog.id))
+                raise
+            deployment_filter.add(video_set)
+            if deployment.blog_id != int(current_blog.id):
+                # Another worker published the same videos first; its blog is served and this one is dropped
+                await asyncio.to_thread(blogCrud.delete, int(current_blog.id))
+        if deployment.blog_id != int(current_blog.id):
+            progress.emit("existing_blog_found", blog_id=deployment.blog_id)
+            response = await handle_existing_blog(deployment, blogCrud)
+            progress.emit("html_written", deployment_url=response["deployment_url"])
+            return response
+        progress.emit("blog_saved", blog_id=int(current_blog.id))
+
+        async with progress.stage("render"):
+            # Generate HTML content and deployment URL
+            html_content = render_blog(title=json_output["Title"], question=json_output["Question"],
+                                       author=json_output["Author"], paragraphs=json_output["Paragraphs"],
+                                       image_url=image_url)
+            directory_name = await asyncio.to_thread(directory_generator, html_content, "app/user", deployment_name)
+        deployment_url = generate_deployment_url(directory_name)
+        progress.emit("html_written", deployment_url=deployment_url, image_pending=image_url == image_placeholder_url,
+                      duration=round(time.time() - after_second_propmt_time, 3))
+
+        if image_url == image_placeholder_url:
+            patch_task = asyncio.create_task(patch_blog_image(image_task, int(current_blog.id), json_output, blogCrud,
+                                                              progress))
+            image_patch_tasks.add(patch_task)
+            patch_task.add_done_callback(image_patch_tasks.discard)
+            progress.add_background_task(patch_task)
+        image_handed_off = True
+    finally:
+        if not image_handed_off:
+            image_task.cancel()
 
-    after_second_propmt_time = time.time()
+    return {"message": "The Processing Is Finished!", "deployment_url": deployment_url}
 
-    # Add new blog entry to the database
-    current_blog = blogCrud.add(1, json_output["Title"], json_output["Question"], json_output["Paragraphs"], image_result)
 
-    # Deployment name generation and deployment record creation
-    deployment_name = generate_deployment_name()
-    deploymentCrud.add(deployment_name=deployment_name, deployment_video=sorted_ids_string, user_id=1,
-                       blog_id=int(current_blog.id))
-
-    # Generate HTML content and deployment URL
-    html_content = render_blog(title=json_output["Title"], question=json_output["Question"],
-                               author=json_output["Author"], paragraphs=json_output["Paragraphs"],
-                               image_url=image_result)
-    directory_name = directory_generator(html_content, "app/user", deployment_name)
-    deployment_url = generate_deployment_url(directory_name)
+async def generate_video_image(video_title: str, progress: ProgressTracker) -> str:
+    """Returns the stored image of the topic, generating and storing one if the topic has none yet."""
+    image_url, cache_hit = await image_cache.get_or_generate(video_title, image_generator.prompt_hash,
+                                                             lambda: image_generator.Generate_image(video_title))
+    progress.emit("image_ready", image_url=image_url, cache_hit=cache_hit)
+    return image_url
 
-    print(f"after second propmt time {time.time() - after_second_propmt_time}")
-
-    return {"message": "The Processing Is Finished!", "deployment_url": deployment_url}
 
+async def patch_blog_image(image_task: asyncio.Task, blog_id: int, article: dict, blogCrud, progress: ProgressTracker):
+    """
+    Waits for the blog image, stores it on the blog and re-renders every deployment published with the placeholder.
+    The deployments are read from the blog row, so copies published by other workers meanwhile are patched too.
+    A failed image generation leaves the placeholder in place.
 
-def generate_video_image(video_title: str) -> str:
-    image_url = image_generator.Generate_image(video_title)
-    return image_url
+    Parameters:
+    - image_task (asyncio.Task): The running image generation.
+    - blog_id (int): The ID of the blog the image belongs to.
+    - article (dict): The article fields the blog was rendered from.
+    - blogCrud: The CRUD object for blog operations.
+    - progress (ProgressTracker): The tracker of the run that created the blog.
+    """
+    try:
+        image_url = await image_task
+    except Exception as e:
+        progress.emit("image_failed", blog_id=blog_id, error=getattr(e, "detail", str(e)))
+        try:
+            # Nothing will patch the deployments waiting for the image anymore
+            await asyncio.to_thread(blogCrud.take_pending_image_deployments, blog_id)
+        except Exception as clear_error:
+            print(f"Clearing the deployments waiting for the image of blog {blog_id} failed: {clear_error}")
+        return
+    try:
+        deployment_names = await asyncio.to_thread(blogCrud.take_pending_image_deployments, blog_id, image_url)
+        html_content = render_blog(title=article["Title"], question=article["Question"], author=article["Author"],
+                                   paragraphs=article["Paragraphs"], image_url=image_url)
+        for deployment_name in deployment_names:
+            await asyncio.to_thread(directory_generator, html_content, "app/user", deployment_name)
+        progress.emit("image_patched", blog_id=blog_id, deployments=len(deployment_names))
+    except Exception as e:
+        progress.emit("image_failed", blog_id=blog_id, error=getattr(e, "detail", str(e)))
 
 
-async def process_videos(video_urls: List[str], topic: str):
+async def process_videos(video_urls: List[str], topic: str, progress: ProgressTracker = None):
     """
     Asynchronously processes a list of video URLs to generate and deploy an article.
 
     Parameters:
     - video_urls (VideoUrls): A data model containing a list of video URLs.
+    - topic (str): The topic of the videos.
+    - progress (ProgressTracker): Optional tracker receiving the per-stage timings.
 
     Returns:
     - dict: A dictionary containing a message and a deployment URL of the generated article.
@@ -154,26 +357,29 @@ async def process_videos(video_urls: List[str], topic: str):
     - HTTPException: If video processing fails.
     """
 
+    if progress is None:
+        progress = ProgressTracker()
+
     full_time_start = time.time()
-    print(video_urls, topic)
-    # try:
-    start_time = time.time()
-    print("Checking for existing blog")
+    progress.emit("processing_started", urls=video_urls, topic=topic)
     video_ids = extract_video_ids(video_urls)
     sorted_ids_string = ' '.join(sorted(video_ids))
-    blog = check_deployment_video_exists(sorted_ids_string)
+    video_set = video_set_hash(video_ids)
+    async with progress.stage("check_existing"):
+        # New video sets are answered by the deployment filter, known ones with an index seek
+        blog = None
+        if await deployment_filter.might_exist(video_set):
+            blog = await asyncio.to_thread(check_deployment_video_exists, video_set)
+            if blog is None:
+                deployment_filter.record_false_positive()
     blogCrud = BlogCRUD(database_connection)
     deploymentCrud = DeploymentCRUD(database_connection)
     if blog:
-
-        return handle_existing_blog(blog, blogCrud)
+        progress.emit("existing_blog_found", blog_id=blog.blog_id)
+        response = await handle_existing_blog(blog, blogCrud)
+        progress.emit("html_written", deployment_url=response["deployment_url"])
+        return response
     else:
-        print("Processing Started")
-        response = process_new_blog(video_urls, sorted_ids_string, blogCrud, deploymentCrud, topic)
-        full_time_end = time.time()
-        print(f"  full_time:  {full_time_end - full_time_start}")
+        response = await process_new_blog(video_urls, sorted_ids_string, blogCrud, deploymentCrud, topic, progress)
+        progress.emit("processing_finished", duration=round(time.time() - full_time_start, 3))
         return response
-    # except Exception as e:
-    #     raise HTTPException(status_code=500, detail=f"An error occurred during video processing: {str(e)}")
-    # finally:
-    # print(f"Processing Finished in {time.time() - start_time} seconds")
\ No newline at end of file
@@ -0,0 +1,306 @@
+import time
+import asyncio
+from collections import deque
+
+from langchain_core.output_parsers import StrOutputParser
+
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+class LatencyHistogram:
+    """
+    Latencies of the recent calls to one provider.
+
+    Percentiles are computed over a rolling window of samples, so the hedging threshold follows
+    the provider's current behaviour. Cumulative bucket counts are kept for reporting.
+    """
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float):
+        """Adds the latency of a successful call."""
+        self.samples.append(seconds)
+        for index, upper_bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= upper_bound:
+                self.bucket_counts[index] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def percentile(self, percentile: float):
+        """Returns the given percentile of the recent latencies, or None without samples."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def stats(self) -> dict:
+        """Returns the window percentiles and the bucket counts of the histogram."""
+        bucket_labels = [f"le_{upper_bound}s" for upper_bound in LATENCY_BUCKETS] + ["gt_300s"]
+        return {
+            "samples": len(self.samples),
+            **{f"p{percentile}": round(self.percentile(percentile), 3) if self.samples else None
+               for percentile in (50, 90, 99)},
+            "buckets": dict(zip(bucket_labels, self.bucket_counts)),
+        }
+
+
+class LLMProvider:
+    """
+    A chat model together with its rate limiter and the largest request it can take.
+    """
+
+    def __init__(self, name: str, llm, rate_limiter, max_tokens: int):
+        self.name = name
+        self.llm = llm
+        # The configured model, e.g. "gemini-pro" or "gpt-4", for keying what the provider produced
+        self.model_name = getattr(llm, "model", None) or getattr(llm, "model_name", None) or name
+        self.rate_limiter = rate_limiter
+        self.max_tokens = max_tokens
+
+    def can_take(self, estimated_tokens: int) -> bool:
+        """Returns whether a request of `estimated_tokens` fits in the provider's context window."""
+        return estimated_tokens <= self.max_tokens
+
+
+class LLMRouter:
+    """
+    Sends prompts to a primary provider and hedges slow calls to a secondary one.
+
+    When the primary call is still running after the configured latency percentile of its recent
+    calls, the same prompt is sent to the secondary provider, the first answer wins and the other
+    call is cancelled. A primary call that fails is failed over to the secondary provider. Requests
+    too large for the secondary provider's context window are never hedged. Streamed calls are
+    hedged the same way on the time to their first chunk.
+    """
+
+    def __init__(self, name: str, primary: LLMProvider, secondary: LLMProvider, hedge_percentile: float = 95,
+                 min_samples: int = 20, default_hedge_delay: float = 60.0, hedging_enabled: bool = True,
+                 default_first_chunk_delay: float = 15.0):
+        self.name = name
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.default_first_chunk_delay = default_first_chunk_delay
+        self.hedging_enabled = hedging_enabled
+        self.output_parser = StrOutputParser()
+        self.histograms = {primary.name: LatencyHistogram(), secondary.name: LatencyHistogram()}
+        self.first_chunk_histograms = {primary.name: LatencyHistogram(), secondary.name: LatencyHistogram()}
+        self._counters = {"calls": 0, "streams": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0}
+
+    def hedge_delay(self, streaming: bool = False) -> float:
+        """
+        Returns how long to wait for the primary provider before hedging, derived from its latency histogram,
+        or from its time-to-first-chunk histogram for streamed calls.
+        """
+        if streaming:
+            histogram, default_delay = self.first_chunk_histograms[self.primary.name], self.default_first_chunk_delay
+        else:
+            histogram, default_delay = self.histograms[self.primary.name], self.default_hedge_delay
+        if len(histogram.samples) < self.min_samples:
+            return default_delay
+        return histogram.percentile(self.hedge_percentile)
+
+    async def _timed(self, histogram: LatencyHistogram, call):
+        """
+        Awaits one provider attempt and records its latency. The rate limiter runs it once the request is
+        granted, so the waits for the limits and the retry backoffs are left out of the histogram.
+        """
+        call_start_time = time.monotonic()
+        try:
+            response = await call
+        except asyncio.CancelledError:
+            # The call lost a hedge; its elapsed time is a lower bound of its latency and keeps the
+            # slow tail in the histogram, otherwise only fast calls would ever be recorded
+            histogram.record(time.monotonic() - call_start_time)
+            raise
+        histogram.record(time.monotonic() - call_start_time)
+        return response
+
+    async def _call(self, provider: LLMProvider, prompt, inputs: dict, estimated_tokens: int) -> str:
+        chain = prompt | provider.llm | self.output_parser
+        return await provider.rate_limiter.call(
+            lambda: self._timed(self.histograms[provider.name], chain.ainvoke(inputs)), estimated_tokens)
+
+    async def ainvoke(self, prompt, inputs: dict, estimated_tokens: int, return_provider: bool = False):
+        """
+        Runs a prompt on the routed providers and returns the first successful answer.
+
+        Parameters:
+        - prompt (PromptTemplate): The prompt template.
+        - inputs (dict): The values of the prompt variables.
+        - estimated_tokens (int): The tokens the call is expected to use, prompt and answer included.
+        - return_provider (bool): Also return the provider whose answer won.
+
+        Returns:
+        - str: The model answer, or a tuple of the answer and its LLMProvider if `return_provider` is set.
+
+        Raises:
+        - Exception: The last provider error if no provider answered.
+        """
+        self._counters["calls"] += 1
+        secondary_allowed = self.hedging_enabled and self.secondary.can_take(estimated_tokens)
+        primary_task = asyncio.create_task(self._call(self.primary, prompt, inputs, estimated_tokens))
+        tasks = {primary_task}
+        providers = {primary_task: self.primary}
+
+        def answer(task: asyncio.Task):
+            return (task.result(), providers[task]) if return_provider else task.result()
+
+        try:
+            if secondary_allowed:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+                if not done:
+                    self._counters["hedges"] += 1
+                elif primary_task.exception() is not None:
+                    self._counters["failovers"] += 1
+                else:
+                    return answer(primary_task)
+                secondary_task = asyncio.create_task(self._call(self.secondary, prompt, inputs, estimated_tokens))
+                providers[secondary_task] = self.secondary
+                tasks.add(secondary_task)
+
+            last_error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary_task:
+                            self._counters["hedge_wins"] += 1
+                        return answer(task)
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _pump(self, provider: LLMProvider, prompt, inputs: dict, estimated_tokens: int, events: asyncio.Queue):
+        """
+        Streams a provider answer into `events` as (provider, kind, payload) items.
+
+        Until its first chunk arrives, the stream is opened through the provider's rate limiter, which retries
+        rate limit and transient errors like it does for other calls. Once chunks went out it is not retried.
+        """
+        chain = prompt | provider.llm | self.output_parser
+        call_start_time = None
+        first_chunk_received = False
+
+        async def open_stream():
+            nonlocal call_start_time, first_chunk_received
+            stream = chain.astream(inputs)
+            call_start_time = time.monotonic()
+            try:
+                first_chunks = [await stream.__anext__()]
+            except StopAsyncIteration:
+                # An empty answer
+                return stream, []
+            except Exception:
+                call_start_time = None
+                await stream.aclose()
+                raise
+            first_chunk_received = True
+            self.first_chunk_histograms[provider.name].record(time.monotonic() - call_start_time)
+            return stream, first_chunks
+
+        try:
+            stream, first_chunks = await provider.rate_limiter.call(open_stream, estimated_tokens)
+            for chunk in first_chunks:
+                events.put_nowait((provider.name, "chunk", chunk))
+            async for chunk in stream:
+                events.put_nowait((provider.name, "chunk", chunk))
+            self.histograms[provider.name].record(time.monotonic() - call_start_time)
+            events.put_nowait((provider.name, "end", None))
+        except asyncio.CancelledError:
+            if call_start_time is not None and not first_chunk_received:
+                self.first_chunk_histograms[provider.name].record(time.monotonic() - call_start_time)
+            raise
+        except Exception as e:
+            events.put_nowait((provider.name, "error", e))
+
+    async def astream(self, prompt, inputs: dict, estimated_tokens: int):
+        """
+        Streams the answer of the first provider to start answering.
+
+        The secondary provider is started when the primary has sent nothing after the hedge delay, or
+        failed before its first chunk. The first provider to send a chunk wins the stream and the other
+        one is cancelled.
+
+        Parameters:
+        - prompt (PromptTemplate): The prompt template.
+        - inputs (dict): The values of the prompt variables.
+        - estimated_tokens (int): The tokens the call is expected to use, prompt and answer included.
+
+        Yields:
+        - str: The chunks of the answer.
+
+        Raises:
+        - Exception: The provider error if every started provider failed, or if the winner failed mid-stream.
+        """
+        self._counters["streams"] += 1
+        secondary_allowed = self.hedging_enabled and self.secondary.can_take(estimated_tokens)
+        events = asyncio.Queue()
+        tasks = {}
+        failed_providers = set()
+        winner = None
+
+        def start(provider: LLMProvider):
+            tasks[provider.name] = asyncio.create_task(self._pump(provider, prompt, inputs, estimated_tokens, events))
+
+        start(self.primary)
+        try:
+            while True:
+                can_hedge = winner is None and secondary_allowed and self.secondary.name not in tasks
+                try:
+                    provider_name, kind, payload = await asyncio.wait_for(
+                        events.get(), timeout=self.hedge_delay(streaming=True) if can_hedge else None)
+                except asyncio.TimeoutError:
+                    self._counters["hedges"] += 1
+                    start(self.secondary)
+                    continue
+
+                if winner is None:
+                    if kind == "error":
+                        failed_providers.add(provider_name)
+                        if can_hedge:
+                            self._counters["failovers"] += 1
+                            start(self.secondary)
+                        elif failed_providers == set(tasks):
+                            raise payload
+                        continue
+                    winner = provider_name
+                    if winner != self.primary.name:
+                        self._counters["hedge_wins"] += 1
+                    for name, task in tasks.items():
+                        if name != winner:
+                            task.cancel()
+
+                if provider_name != winner:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "end":
+                    return
+                else:
+                    raise payload
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def stats(self) -> dict:
+        """
+        Returns the hedging counters, the current hedge delays and the latency histograms of both providers.
+        """
+        return {
+            "primary": self.primary.name,
+            "secondary": self.secondary.name,
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+            "first_chunk_hedge_delay_seconds": round(self.hedge_delay(streaming=True), 3),
+            **self._counters,
+            "latency": {name: histogram.stats() for name, histogram in self.histograms.items()},
+            "first_chunk_latency": {name: histogram.stats() for name, histogram in self.first_chunk_histograms.items()},
+        }
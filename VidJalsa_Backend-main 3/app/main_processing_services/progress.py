@@ -0,0 +1,103 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class ProgressTracker:
+    """
+    Records how long each stage of a blog generation run takes and the progress events it emits.
+
+    An optional async `on_change` callback is awaited with the tracker every time a stage finishes,
+    which is how the job queue persists the timings while the job is still running. Listeners
+    registered with `subscribe` receive every event emitted so far followed by the live ones.
+    Work that outlives the run, such as patching in the blog image, is registered with
+    `add_background_task` so the owner can keep the event stream open until it is done.
+    """
+
+    def __init__(self, on_change=None):
+        self.started_at = time.time()
+        self.stage_timings = {}
+        self.stats = {}
+        self.events = []
+        self.closed = False
+        self._on_change = on_change
+        self._subscribers = set()
+        self.background_tasks = set()
+
+    def elapsed(self) -> float:
+        """Returns the seconds elapsed since the tracker was created."""
+        return round(time.time() - self.started_at, 3)
+
+    def emit(self, event: str, **data):
+        """
+        Records a progress event and pushes it to every subscriber.
+
+        Parameters:
+        - event (str): The name of the event, e.g. "transcript_fetched".
+        - data: Extra JSON-serializable fields describing the event.
+        """
+        payload = {"event": event, "elapsed": self.elapsed(), **data}
+        self.events.append(payload)
+        for queue in self._subscribers:
+            queue.put_nowait(payload)
+
+    def add_stats(self, **counters):
+        """
+        Adds numeric counters to the run statistics, summing them with the values already recorded.
+
+        Parameters:
+        - counters: The counter values to add, e.g. llm_calls=3.
+        """
+        for name, value in counters.items():
+            self.stats[name] = self.stats.get(name, 0) + value
+
+    def add_background_task(self, task: asyncio.Task):
+        """Keeps a reference to a task that reports to this tracker after the run returned."""
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def wait_background_tasks(self):
+        """Waits until every registered background task is done."""
+        while self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Registers a listener queue, pre-filled with the events emitted so far.
+        A `None` item marks the end of the stream.
+        """
+        queue = asyncio.Queue()
+        for payload in self.events:
+            queue.put_nowait(payload)
+        if self.closed:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Removes a listener queue registered with `subscribe`."""
+        self._subscribers.discard(queue)
+
+    def close(self):
+        """Ends the event stream of every subscriber."""
+        self.closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._subscribers.clear()
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """
+        Times the wrapped block and stores the elapsed seconds under the given stage name.
+
+        Parameters:
+        - name (str): The name of the stage.
+        """
+        stage_start_time = time.time()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = round(time.time() - stage_start_time, 3)
+            if self._on_change is not None:
+                await self._on_change(self)
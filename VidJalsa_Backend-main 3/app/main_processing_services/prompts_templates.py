@@ -65,11 +65,8 @@ summarize_prompt_text = """
 
     By adhering to these refined guidelines, you'll create a narrative that captivates, informs, and meets the high standards required for web content. Your dedication to crafting resonant and enriching narratives is appreciated, elevating the online experience for all readers.
 """
-blog_quality_template ="""
-    **Role:** you are a helpful AI assistant tasked with summarizing and creating blog content for a web page
-    
-    **Task:** given the summarized transcripts delimted in the triple  back ticks ```{text}```, you are to generate a captivating article based on the summarized content provided as follows:
-    
+# The article guidelines, shared by the combine prompt and the single call of transcripts that fit one chunk
+blog_quality_guidelines = """
     **Guidlines:**
         1. Paragraphing:
             Divide the combined summarized transcripts into an array of paragraphs. Each paragraph should encapsulate a distinct idea or aspect of the summary, maintaining a logical flow and engaging the reader with a tone that is both conversational and accessible. For example, if the transcript discusses the benefits of a particular diet plan, one paragraph could focus on the importance of balanced nutrition, while another paragraph could delve into specific meal suggestions.
@@ -94,6 +91,16 @@ blog_quality_template ="""
     By incorporating these additional points into the article creation process, you can ensure that the final product is not only informative and engaging but also optimized for audience interaction and search engine visibility.
 
 """
+blog_quality_template ="""
+    **Role:** you are a helpful AI assistant tasked with summarizing and creating blog content for a web page
+    
+    **Task:** given the summarized transcripts delimted in the triple  back ticks ```{text}```, you are to generate a captivating article based on the summarized content provided as follows:
+    """ + blog_quality_guidelines
+
+# A transcript that fits one chunk is summarized and shaped for the blog in a single call
+stuff_summarize_prompt_text = summarize_prompt_text + """
+   **Blog Shaping:** in the same answer, shape this narrative into blog-ready content following these guidelines:
+""" + blog_quality_guidelines
 
 blog_gen_prompt_text = """
     **Task: Generate a Medium-Style Article as a JSON Object**
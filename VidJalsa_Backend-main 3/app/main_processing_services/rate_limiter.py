@@ -0,0 +1,173 @@
+import time
+import random
+import asyncio
+import email.utils
+
+import openai
+from google.api_core import exceptions as google_exceptions
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_EXCEPTIONS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most one minute of tokens.
+    A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = rate_per_minute
+        self.tokens = float(rate_per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / 60)
+        self.updated_at = now
+
+    def time_until_available(self, amount: float) -> float:
+        """Returns how many seconds to wait until `amount` tokens are available."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) * 60 / self.capacity)
+
+    def consume(self, amount: float):
+        """Takes `amount` tokens from the bucket."""
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Returns whether an error from a provider is a rate limit or a transient failure worth retrying."""
+    if isinstance(error, RETRYABLE_EXCEPTIONS):
+        return True
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status_code, int) and status_code in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after(error: Exception):
+    """
+    Reads the delay requested by the provider from the Retry-After headers of an error response.
+
+    Returns:
+    - float: The delay in seconds, or None if the provider did not request one.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        if retry_after.replace(".", "", 1).isdigit():
+            return float(retry_after)
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderRateLimiter:
+    """
+    Rate limiter and retry policy for the calls made to one AI provider.
+
+    Calls take one request from a requests-per-minute bucket and their estimated token count from a
+    tokens-per-minute bucket, waiting in FIFO order until both have room. Rate limit and transient
+    errors are retried with jittered exponential backoff, using the provider's Retry-After delay when
+    it sends one. The limiter records how much time calls spend waiting versus running.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int = 0, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = asyncio.Lock()
+        self._counters = {"calls": 0, "retries": 0, "failures": 0, "throttle_wait_seconds": 0.0,
+                          "backoff_seconds": 0.0, "call_seconds": 0.0}
+
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        Waits until the buckets have room for one request of `estimated_tokens` tokens and takes it.
+        """
+        wait_start_time = time.monotonic()
+        async with self._lock:
+            while True:
+                delay = max(self.request_bucket.time_until_available(1),
+                            self.token_bucket.time_until_available(estimated_tokens))
+                if delay <= 0:
+                    self.request_bucket.consume(1)
+                    self.token_bucket.consume(estimated_tokens)
+                    break
+                await asyncio.sleep(delay)
+        self._counters["throttle_wait_seconds"] += time.monotonic() - wait_start_time
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Returns the jittered exponential backoff delay of a retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, operation, estimated_tokens: int = 0):
+        """
+        Runs a provider call under the rate limits, retrying rate limit and transient errors.
+
+        Parameters:
+        - operation (callable): A function without arguments returning the awaitable provider call.
+          It is called again for every attempt.
+        - estimated_tokens (int): The tokens the call is expected to use, prompt and answer included.
+
+        Returns:
+        - The result of the call.
+
+        Raises:
+        - Exception: The last error, once it is not retryable or the retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            call_start_time = time.monotonic()
+            try:
+                self._counters["calls"] += 1
+                return await operation()
+            except Exception as e:
+                error = e
+            finally:
+                self._counters["call_seconds"] += time.monotonic() - call_start_time
+
+            if not is_retryable(error) or attempt == self.max_retries:
+                self._counters["failures"] += 1
+                raise error
+            retry_after = get_retry_after(error)
+            delay = min(self.max_delay, retry_after) if retry_after is not None else self.backoff_delay(attempt)
+            print(f"{self.name} call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+            self._counters["retries"] += 1
+            self._counters["backoff_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """
+        Returns the configured limits and the counters of the limiter.
+        """
+        return {
+            "requests_per_minute": self.request_bucket.capacity,
+            "tokens_per_minute": self.token_bucket.capacity,
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in self._counters.items()},
+        }
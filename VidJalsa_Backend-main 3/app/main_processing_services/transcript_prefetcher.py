@@ -0,0 +1,185 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+from .rate_limiter import TokenBucket
+
+# Speculative fetching of the transcripts of previewed videos, off unless enabled
+TRANSCRIPT_PREFETCH_ENABLED = os.getenv('TRANSCRIPT_PREFETCH_ENABLED', 'false').lower() == 'true'
+# Also normalize the prefetched transcripts, so a generation can skip that step too
+TRANSCRIPT_PREFETCH_NORMALIZE = os.getenv('TRANSCRIPT_PREFETCH_NORMALIZE', 'false').lower() == 'true'
+# Limits of the speculative work: workers, queued videos, videos per preview and videos per minute
+TRANSCRIPT_PREFETCH_WORKERS = int(os.getenv('TRANSCRIPT_PREFETCH_WORKERS', '2'))
+TRANSCRIPT_PREFETCH_QUEUE_SIZE = int(os.getenv('TRANSCRIPT_PREFETCH_QUEUE_SIZE', '200'))
+TRANSCRIPT_PREFETCH_PER_PREVIEW = int(os.getenv('TRANSCRIPT_PREFETCH_PER_PREVIEW', '5'))
+TRANSCRIPT_PREFETCH_PER_MINUTE = int(os.getenv('TRANSCRIPT_PREFETCH_PER_MINUTE', '60'))
+# How long a prefetched video counts as a possible hit before it is reported as wasted
+TRANSCRIPT_PREFETCH_WINDOW = int(os.getenv('TRANSCRIPT_PREFETCH_WINDOW', '1800'))
+# Prefetched videos remembered for the hit and waste metrics, and normalized transcripts kept in memory
+TRANSCRIPT_PREFETCH_MAX_TRACKED = int(os.getenv('TRANSCRIPT_PREFETCH_MAX_TRACKED', '2000'))
+TRANSCRIPT_PREFETCH_MAX_NORMALIZED = int(os.getenv('TRANSCRIPT_PREFETCH_MAX_NORMALIZED', '100'))
+
+
+class TranscriptPrefetcher:
+    """
+    Fetches the transcripts of previewed videos speculatively, before the user submits them.
+
+    Users usually pick some of the videos a preview returned and submit them seconds later, so the
+    preview queues the transcripts of its top videos. A few low-priority workers fetch them into the
+    transcript cache, where the generation finds them. Fetches share the in-flight downloads of the
+    transcript processor, so a user submitting a video that is being prefetched waits for the same
+    download. The speculative work is bounded by a queue size, a per-preview cap and a per-minute
+    rate, videos that do not fit are dropped.
+
+    A prefetched video that a generation then uses counts as a hit. One that was downloaded but not
+    used within the window counts as wasted.
+    """
+
+    def __init__(self, processor, enabled: bool, normalize: bool, workers: int, queue_size: int, per_preview: int,
+                 per_minute: int, window: int, max_tracked: int, max_normalized: int):
+        self.processor = processor
+        self.enabled = enabled
+        self.normalize = normalize
+        self.workers = workers
+        self.per_preview = per_preview
+        self.window = window
+        self.max_tracked = max_tracked
+        self.max_normalized = max_normalized
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._rate = TokenBucket(per_minute)
+        self._worker_tasks = []
+        self._queued = set()
+        self._running = set()
+        self._used_while_running = set()
+        self._prefetched = OrderedDict()
+        self._normalized = OrderedDict()
+        self._counters = {"scheduled": 0, "dropped": 0, "downloaded": 0, "already_cached": 0, "failed": 0,
+                          "hits": 0, "in_flight_hits": 0, "misses": 0, "wasted": 0, "normalized_hits": 0}
+
+    async def start(self):
+        """
+        Starts the prefetch workers when prefetching is enabled.
+        """
+        if self.enabled and not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Stops the prefetch workers, dropping the queued videos.
+        """
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def schedule(self, video_ids: list):
+        """
+        Queues the transcripts of the first videos of a preview, as far as the limits allow.
+
+        Parameters:
+        - video_ids (list): The IDs of the previewed videos, best ranked first.
+        """
+        if not self._worker_tasks:
+            return
+        for video_id in video_ids[:self.per_preview]:
+            if video_id in self._queued or video_id in self._running or video_id in self._prefetched:
+                continue
+            if self._queue.full() or self._rate.time_until_available(1) > 0:
+                self._counters["dropped"] += 1
+                continue
+            self._rate.consume(1)
+            self._queued.add(video_id)
+            self._queue.put_nowait(video_id)
+            self._counters["scheduled"] += 1
+
+    def record_use(self, video_id: str):
+        """
+        Records that a generation needs the transcript of a video, for the hit rate.
+
+        A video still waiting in the queue is taken out of it, the generation fetches it itself.
+
+        Parameters:
+        - video_id (str): The YouTube video ID.
+        """
+        if not self._worker_tasks:
+            return
+        self._expire()
+        if self._prefetched.pop(video_id, None) is not None:
+            self._counters["hits"] += 1
+        elif video_id in self._running:
+            self._used_while_running.add(video_id)
+            self._counters["in_flight_hits"] += 1
+        else:
+            self._queued.discard(video_id)
+            self._counters["misses"] += 1
+
+    def take_normalized(self, video_id: str):
+        """
+        Returns the normalized transcript prefetched for a video, removing it from memory.
+
+        Returns:
+        - tuple: The normalized text and its normalization stats, or None if it was not prefetched.
+        """
+        normalized = self._normalized.pop(video_id, None)
+        if normalized is not None:
+            self._counters["normalized_hits"] += 1
+        return normalized
+
+    def stats(self) -> dict:
+        """
+        Returns the prefetch counters, the hit rate of the generations and the current backlog.
+        """
+        self._expire()
+        uses = self._counters["hits"] + self._counters["in_flight_hits"] + self._counters["misses"]
+        return {
+            "enabled": self.enabled,
+            **self._counters,
+            "hit_rate": round((self._counters["hits"] + self._counters["in_flight_hits"]) / uses, 4) if uses else 0.0,
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "awaiting_use": len(self._prefetched),
+            "normalized_in_memory": len(self._normalized),
+        }
+
+    async def _work(self):
+        while True:
+            video_id = await self._queue.get()
+            if video_id not in self._queued:
+                # A generation asked for it meanwhile and fetched it itself
+                continue
+            self._queued.discard(video_id)
+            self._running.add(video_id)
+            try:
+                transcript, cached = await self.processor.fetch_by_id(video_id)
+                self._counters["already_cached" if cached else "downloaded"] += 1
+                if self.normalize:
+                    self._store_normalized(video_id, await asyncio.to_thread(self.processor.normalize, transcript))
+                if video_id not in self._used_while_running and not cached:
+                    self._track(video_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["failed"] += 1
+                print(f"Prefetching the transcript of {video_id} failed: {e}")
+            finally:
+                self._running.discard(video_id)
+                self._used_while_running.discard(video_id)
+
+    def _track(self, video_id: str):
+        self._prefetched[video_id] = time.time()
+        while len(self._prefetched) > self.max_tracked:
+            self._prefetched.popitem(last=False)
+            self._counters["wasted"] += 1
+
+    def _expire(self):
+        expired_before = time.time() - self.window
+        while self._prefetched and next(iter(self._prefetched.values())) < expired_before:
+            video_id, _ = self._prefetched.popitem(last=False)
+            self._normalized.pop(video_id, None)
+            self._counters["wasted"] += 1
+
+    def _store_normalized(self, video_id: str, normalized: tuple):
+        self._normalized[video_id] = normalized
+        while len(self._normalized) > self.max_normalized:
+            self._normalized.popitem(last=False)
@@ -1,7 +1,11 @@
 import re
 import os
+import html
+import hashlib
+from functools import lru_cache
+import tiktoken
 from fastapi import HTTPException
-from .blog_template import header_template, styling_template, content_template
+from .blog_template import header_template, styling_template, content_template, image_placeholder_url
 
 def generate_deployment_url(directory_name: str) -> str:
     """Generates a URL for the deployed blog based on the directory name."""
@@ -56,6 +60,107 @@ def parse_json_like_string(json_string: str) -> dict:
         raise HTTPException(status_code=500, detail=f"An error occurred during parsing: {str(e)}")
 
 
+TOKEN_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_token_encoding(encoding_name: str = TOKEN_ENCODING):
+    """Returns the tiktoken encoding used to count prompt tokens, loaded once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str, encoding_name: str = TOKEN_ENCODING) -> int:
+    """
+    Counts the tokens of a text.
+
+    Parameters:
+    - text (str): The text to count.
+    - encoding_name (str): The tiktoken encoding to count with.
+
+    Returns:
+    - int: The number of tokens.
+    """
+    return len(get_token_encoding(encoding_name).encode(text, disallowed_special=()))
+
+
+CAPTION_NOISE_PATTERN = re.compile(
+    r"\[\s*(?:music|applause|laughter|laughs|cheering|inaudible|silence|noise|foreign|background \w+)\s*\]|♪+|>>",
+    re.IGNORECASE)
+SENTENCE_END_PATTERN = re.compile(r"[.!?…][\"')\]]*$")
+
+
+def format_timestamp(seconds: float) -> str:
+    """Formats a number of seconds as a coarse [h:mm:ss] or [mm:ss] marker."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"[{hours}:{minutes:02d}:{seconds:02d}]" if hours else f"[{minutes:02d}:{seconds:02d}]"
+
+
+def normalize_transcript(transcript: list, timestamp_interval: int = 0, paragraph_chars: int = 600) -> tuple:
+    """
+    Turns transcript segments into compact plain text for the LLM.
+
+    Caption fragments are unescaped, stripped of noise markers such as [Music], and merged into
+    paragraphs. A paragraph ends at the end of a sentence once it holds `paragraph_chars` characters,
+    or at the next segment once it holds twice as many (auto-generated captions have no punctuation).
+    When `timestamp_interval` is set, paragraphs starting after each interval are prefixed with a
+    coarse timestamp.
+
+    Parameters:
+    - transcript (list): The transcript segments, each a dictionary with 'text', 'start' and 'duration'.
+    - timestamp_interval (int): Seconds between timestamp markers, or 0 to leave them out.
+    - paragraph_chars (int): The target paragraph length in characters.
+
+    Returns:
+    - tuple: The normalized text and a dictionary describing the size reduction.
+
+    Raises:
+    - HTTPException: If normalization fails.
+    """
+    try:
+        paragraphs = []
+        current_paragraph = []
+        current_length = 0
+        next_timestamp = 0
+        noise_segments = 0
+
+        for segment in transcript:
+            text = CAPTION_NOISE_PATTERN.sub(" ", html.unescape(segment.get('text', '')))
+            text = " ".join(text.split())
+            if not text:
+                noise_segments += 1
+                continue
+
+            if not current_paragraph and timestamp_interval and segment.get('start', 0) >= next_timestamp:
+                text = f"{format_timestamp(segment['start'])} {text}"
+                next_timestamp = segment['start'] + timestamp_interval
+
+            current_paragraph.append(text)
+            current_length += len(text) + 1
+            if ((current_length >= paragraph_chars and SENTENCE_END_PATTERN.search(text))
+                    or current_length >= 2 * paragraph_chars):
+                paragraphs.append(" ".join(current_paragraph))
+                current_paragraph = []
+                current_length = 0
+
+        if current_paragraph:
+            paragraphs.append(" ".join(current_paragraph))
+
+        normalized_text = "\n".join(paragraphs)
+        original_chars = len(str(transcript))
+        stats = {
+            "segments": len(transcript),
+            "noise_segments": noise_segments,
+            "paragraphs": len(paragraphs),
+            "original_chars": original_chars,
+            "normalized_chars": len(normalized_text),
+            "reduction": round(1 - len(normalized_text) / original_chars, 4) if original_chars else 0.0,
+        }
+        return normalized_text, stats
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred during transcript normalization: {str(e)}")
+
+
 def parse_article(content: str) -> dict:
     """
     Extracts key-value pairs from a string using regular expressions and returns them as a dictionary.
@@ -167,6 +272,19 @@ def render_blog(title: str, question: str, author: str, paragraphs: list,image_u
         raise HTTPException(status_code=500, detail=f"An error occurred during blog rendering: {str(e)}")
 
 
+def video_set_hash(video_ids: list) -> str:
+    """
+    Hashes a set of video IDs into a fixed-width key, the same for any order or repetition of the IDs.
+
+    Args:
+        video_ids (list): The YouTube video IDs.
+
+    Returns:
+        str: The hex SHA-256 of the sorted, de-duplicated IDs joined by spaces.
+    """
+    return hashlib.sha256(' '.join(sorted(set(video_ids))).encode("utf-8")).hexdigest()
+
+
 def extract_video_ids(youtube_links):
     """
     Extracts video IDs from a list of YouTube links.
@@ -1,27 +1,55 @@
-from typing import List
-from fastapi import APIRouter
-from app.youtube_services.youtube_api_interaction import return_filtered_and_formatted_videos
-from app.google_trends_services.trends_api_interaction import get_trending_topics
-from app.main_processing_services.llm_chains_interactions import process_videos
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Header, Response
+from fastapi.responses import StreamingResponse
+from app.youtube_services.youtube_api_interaction import (return_filtered_and_formatted_videos,
+                                                          return_batch_video_previews, preview_search_limiter)
+from app.google_trends_services.trending_service import trending_service
+from app.job_services.job_queue import job_queue
+from app.job_services.prewarm_service import prewarm_service
+from app.main_processing_services.llm_chains_interactions import (transcript_processor, transcript_prefetcher,
+                                                                  video_summaries_in_flight)
+from app.main_processing_services.llm_chains_classes import map_step_limiter
+from app.main_processing_services import (google_rate_limiter, azure_rate_limiter, image_rate_limiter,
+                                          summary_router, article_router)
+from app.cache_services.transcript_cache import transcript_cache
+from app.cache_services.summary_cache import summary_cache
+from app.cache_services.image_cache import image_cache
+from app.youtube_services.async_youtube_client import youtube_client
+from app.youtube_services.quota_ledger import quota_ledger
+from app.cache_services.search_cache import search_cache, video_details_cache
+from app.cache_services.deployment_filter import deployment_filter
 
-from app.schemas import VideoUrlsAndTopic, Video
+from app.schemas import VideoUrlsAndTopic, Video, VideoTopics, TopicVideos, JobSubmitted, JobStatus
 
 router = APIRouter()
 
 @router.get("/api/v1/trending", response_model=List[str])
-def trending_topics():
+async def trending_topics(response: Response, pn: str = "united_states",
+                          if_none_match: Optional[str] = Header(default=None)):
     """
-    Get the list of trending topics from the Google Trends API.
+    Get the list of trending topics of a region, refreshed from the Google Trends API in the background.
+
+    Args:
+        pn (str): The pytrends name of the region, e.g. "united_states" or "india".
+        if_none_match (str): The ETag of the list the client already has.
 
     Returns:
-        List[str]: The list of trending topics.
+        List[str]: The list of trending topics, or an empty 304 response if it did not change.
     """
-    return get_trending_topics()
+    snapshot = await trending_service.get(pn)
+    headers = {"ETag": snapshot["etag"], "Last-Modified": snapshot["last_modified"],
+               "Cache-Control": f"public, max-age={trending_service.refresh_interval}"}
+    if if_none_match is not None and snapshot["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return snapshot["topics"]
 
 @router.post("/api/v1/videos_preview")
-def videos_preview(video: Video):
+async def videos_preview(video: Video):
     """
     Return filtered and formatted videos based on the given video information.
+    The transcripts of the first videos are prefetched when transcript prefetching is enabled.
 
     Args:
         video (Video): The video information.
@@ -29,12 +57,37 @@ def videos_preview(video: Video):
     Returns:
         The filtered and formatted videos.
     """
-    return return_filtered_and_formatted_videos(video)
+    videos = await return_filtered_and_formatted_videos(video)
+    transcript_prefetcher.schedule([formatted_video['video_id'] for formatted_video in videos])
+    return videos
+
+@router.post("/api/v1/videos_preview/batch", response_model=List[TopicVideos])
+async def videos_preview_batch(request_data: VideoTopics):
+    """
+    Return the filtered and formatted videos of several topics at once.
+
+    The searches run concurrently and the video details of every topic are looked up together,
+    so a batch costs fewer round-trips and less quota than one request per topic. A topic that
+    fails does not fail the batch, its error is returned with its result instead.
+
+    Args:
+        request_data (VideoTopics): The topics and the number of videos wanted per topic.
+
+    Returns:
+        The videos of each topic, in the order of the request.
+    """
+    previews = await return_batch_video_previews(request_data.topics, request_data.max_results)
+    for preview in previews:
+        transcript_prefetcher.schedule([formatted_video['video_id'] for formatted_video in preview["videos"]])
+    return previews
 
 @router.post("/api/v1/process_videos")
 async def api_process_videos(request_data: VideoUrlsAndTopic):
     """
-    Process the videos based on the given video URLs.
+    Process the videos based on the given video URLs and wait for the result.
+
+    The work runs on the job queue like any other job; this endpoint only keeps the connection
+    open until it finishes.
 
     Args:
         video_urls (VideoUrls): The video URLs.
@@ -42,4 +95,116 @@ async def api_process_videos(request_data: VideoUrlsAndTopic):
     Returns:
         The processed videos.
     """
-    return await process_videos(request_data.urls, request_data.topic)
+    job_id = await job_queue.submit(request_data.urls, request_data.topic)
+    return await job_queue.wait(job_id)
+
+@router.post("/api/v1/jobs", response_model=JobSubmitted, status_code=202)
+async def submit_job(request_data: VideoUrlsAndTopic):
+    """
+    Queue a blog generation job for the given video URLs.
+
+    Args:
+        request_data (VideoUrlsAndTopic): The video URLs and their topic.
+
+    Returns:
+        JobSubmitted: The ID of the queued job.
+    """
+    job_id = await job_queue.submit(request_data.urls, request_data.topic)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/api/v1/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    """
+    Get the status, per-stage timings and deployment URL of a job.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        JobStatus: The current state of the job.
+    """
+    job = await job_queue.get(job_id)
+    return JobStatus.model_validate(job)
+
+@router.get("/api/v1/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Stream the progress events of a job as server-sent events.
+
+    Every event carries the seconds elapsed since the job was queued, and the stream ends once the
+    job has succeeded or failed.
+
+    Args:
+        job_id (str): The ID of the job.
+
+    Returns:
+        StreamingResponse: A text/event-stream response.
+    """
+    events = job_queue.events(job_id)
+    # Fetch the first event before responding so unknown jobs still get a 404
+    first_event = await events.__anext__()
+
+    async def event_stream():
+        payload = first_event
+        while True:
+            if payload is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {payload['event']}\ndata: {json.dumps(payload, default=str)}\n\n"
+            try:
+                payload = await events.__anext__()
+            except StopAsyncIteration:
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/api/v1/admin/metrics")
+def admin_metrics():
+    """
+    Get the runtime metrics of the caches and background services.
+
+    Returns:
+        dict: The metrics of each service, keyed by service name.
+    """
+    return {
+        "transcript_cache": transcript_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "image_cache": image_cache.stats(),
+        "youtube_client": youtube_client.stats(),
+        "search_cache": search_cache.stats(),
+        "youtube_search_concurrency": preview_search_limiter.stats(),
+        "video_details_cache": video_details_cache.stats(),
+        "youtube_quota": quota_ledger.stats(),
+        "trending": trending_service.stats(),
+        "transcript_processing": transcript_processor.stats,
+        "transcript_fetches": transcript_processor.transcript_fetches.stats(),
+        "video_summaries": video_summaries_in_flight.stats(),
+        "transcript_prefetch": transcript_prefetcher.stats(),
+        "trending_prewarm": prewarm_service.stats(),
+        "job_queue": job_queue.stats(),
+        "deployment_filter": deployment_filter.stats(),
+        "summary_map_concurrency": map_step_limiter.stats(),
+        "rate_limiters": {
+            "gemini": google_rate_limiter.stats(),
+            "azure_chat": azure_rate_limiter.stats(),
+            "azure_image": image_rate_limiter.stats(),
+        },
+        "llm_routers": {
+            "summary": summary_router.stats(),
+            "article": article_router.stats(),
+        },
+    }
+
+@router.get("/api/v1/admin/youtube_quota")
+async def admin_youtube_quota(days: int = 7):
+    """
+    Get the YouTube Data API quota usage.
+
+    Args:
+        days (int): The number of days of stored usage to include.
+
+    Returns:
+        dict: The daily budget, today's usage per endpoint, the current degradation mode and the usage history.
+    """
+    return await quota_ledger.report(days)
@@ -1,11 +1,43 @@
-from pydantic import BaseModel
-from typing import List
+import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 
 class Video(BaseModel):
     """Represents a video."""
     video: str  
 
+class VideoTopics(BaseModel):
+    """Represents a request for the video previews of several topics."""
+    topics: List[str] = Field(min_length=1, max_length=50)
+    max_results: int = Field(default=10, ge=1, le=50)
+
+class TopicVideos(BaseModel):
+    """Represents the video previews of one topic of a batch."""
+    topic: str
+    videos: List[dict]
+    error: Optional[str] = None
+
 class VideoUrlsAndTopic(BaseModel):
     """Represents a request with a list of video URLs and a topic."""
     urls: List[str]
     topic: str
+
+class JobSubmitted(BaseModel):
+    """Represents the response to a queued blog generation job."""
+    job_id: str
+    status: str
+
+class JobStatus(BaseModel):
+    """Represents the current state of a blog generation job."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    status: str
+    topic: str
+    video_urls: List[str]
+    stage_timings: Dict[str, float]
+    stats: Dict[str, float]
+    deployment_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
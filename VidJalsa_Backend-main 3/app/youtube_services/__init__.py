@@ -1,10 +1,35 @@
 import os
+import threading
+from functools import lru_cache
+
+import httplib2
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 if not YOUTUBE_API_KEY:
     raise EnvironmentError("YouTube API key not found in environment variables.")
 
+YOUTUBE_HTTP_TIMEOUT = float(os.getenv('YOUTUBE_HTTP_TIMEOUT', '15'))
+
+# httplib2.Http is not thread-safe, so every threadpool worker keeps its own keep-alive connection
+_thread_local = threading.local()
+
+
+def get_thread_http() -> httplib2.Http:
+    """Returns the HTTP transport of the calling thread, creating it on first use."""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT)
+        _thread_local.http = http
+    return http
+
+
+def build_request(http, *args, **kwargs) -> HttpRequest:
+    """Builds every request of the shared client on the calling thread's transport instead of a shared one."""
+    return HttpRequest(get_thread_http(), *args, **kwargs)
+
+
 def initialize_youtube_service() -> object:
     """
     Initializes the YouTube Data API client using the developer API key.
@@ -13,6 +38,10 @@ def initialize_youtube_service() -> object:
     the application starts. It's recommended to use a secure way to set environment
     variables, such as through a .env file or a cloud service's environment management.
 
+    The client is built from the discovery document bundled with google-api-python-client, so no
+    request is made to the discovery service, and its requests run on per-thread keep-alive
+    transports, so one client can be shared by every thread.
+
     Returns:
         object: An instance of the YouTube Data API client, which can be used to make
                 requests to the YouTube Data API.
@@ -20,4 +49,13 @@ def initialize_youtube_service() -> object:
     Raises:
         EnvironmentError: If the YOUTUBE_API_KEY environment variable is not found.
     """
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, static_discovery=True, cache_discovery=False,
+                 requestBuilder=build_request)
+
+
+@lru_cache(maxsize=None)
+def get_youtube_service() -> object:
+    """
+    Returns the YouTube Data API client of this worker, building it on first use.
+    """
+    return initialize_youtube_service()
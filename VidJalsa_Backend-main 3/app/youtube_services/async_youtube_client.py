@@ -0,0 +1,192 @@
+import os
+import time
+import random
+import asyncio
+
+import httpx
+from fastapi import HTTPException
+
+from app.youtube_services import YOUTUBE_API_KEY, get_youtube_service
+from app.youtube_services.quota_ledger import QuotaLedger, quota_ledger
+
+# Point this at scripts/mock_youtube_api.py to run the previews without the real API
+YOUTUBE_API_BASE_URL = os.getenv('YOUTUBE_API_BASE_URL', 'https://www.googleapis.com/youtube/v3')
+YOUTUBE_HTTP2 = os.getenv('YOUTUBE_HTTP2', 'true').lower() == 'true'
+YOUTUBE_HTTP_TIMEOUT = float(os.getenv('YOUTUBE_HTTP_TIMEOUT', '15'))
+YOUTUBE_CONNECT_TIMEOUT = float(os.getenv('YOUTUBE_CONNECT_TIMEOUT', '5'))
+YOUTUBE_MAX_CONNECTIONS = int(os.getenv('YOUTUBE_MAX_CONNECTIONS', '20'))
+YOUTUBE_MAX_RETRIES = int(os.getenv('YOUTUBE_MAX_RETRIES', '3'))
+# Set to false to fall back to the googleapiclient client run on the threadpool
+YOUTUBE_ASYNC_CLIENT = os.getenv('YOUTUBE_ASYNC_CLIENT', 'true').lower() == 'true'
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class AsyncYouTubeClient:
+    """
+    Native async client of the YouTube Data API endpoints used by the previews.
+
+    All requests share one pooled httpx client, which multiplexes them over HTTP/2 connections when
+    the server supports it, so concurrent previews wait on the network instead of on threadpool slots.
+    Timeouts, connection failures and rate limit or server errors are retried with jittered
+    exponential backoff. Every attempt is charged to the quota ledger before it is sent.
+    The httpx client is created lazily, inside the running event loop.
+    """
+
+    def __init__(self, api_key: str, base_url: str, http2: bool, timeout: float, connect_timeout: float,
+                 max_connections: int, max_retries: int, ledger: QuotaLedger):
+        self.api_key = api_key
+        self.ledger = ledger
+        self.base_url = base_url.rstrip("/")
+        self.http2 = http2
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self._client = None
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "request_seconds": 0.0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, http2=self.http2, timeout=self.timeout,
+                                             limits=self.limits, params={"key": self.api_key})
+        return self._client
+
+    async def get(self, path: str, params: dict) -> dict:
+        """
+        Sends a GET request to an API endpoint and returns the decoded JSON response.
+
+        Parameters:
+        - path (str): The endpoint path, e.g. "/search".
+        - params (dict): The query parameters, the API key is added automatically.
+
+        Returns:
+        - dict: The JSON response.
+
+        Raises:
+        - HTTPException: If the request fails with a non-retryable error or the retries are exhausted,
+          or 429 if the daily quota budget is used up.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.ledger.charge(path.strip("/"))
+            request_start_time = time.monotonic()
+            self._counters["requests"] += 1
+            try:
+                response = await self._get_client().get(path, params=params)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.HTTPStatusError as http_err:
+                self._counters["failures"] += 1
+                raise HTTPException(status_code=500, detail=f"YouTube API request {path} failed: "
+                                                            f"HTTP {http_err.response.status_code}: "
+                                                            f"{http_err.response.text[:200]}")
+            except (httpx.TimeoutException, httpx.TransportError) as transport_err:
+                error = f"{type(transport_err).__name__}: {transport_err}"
+            finally:
+                self._counters["request_seconds"] += time.monotonic() - request_start_time
+
+            if attempt == self.max_retries:
+                break
+            self._counters["retries"] += 1
+            await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * 2 ** attempt)))
+
+        self._counters["failures"] += 1
+        raise HTTPException(status_code=500, detail=f"YouTube API request {path} failed: {error}")
+
+    async def search(self, topic: str, max_results: int, page_token: str = None, video_duration: str = "any") -> dict:
+        """
+        Runs a search.list request with the parameters used by the previews.
+        """
+        params = {
+            "q": topic,
+            "part": "snippet",
+            "type": "video",
+            "order": "relevance",
+            "maxResults": max_results,
+            "safeSearch": "strict",
+            "relevanceLanguage": "en",
+            "videoDuration": video_duration,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        return await self.get("/search", params)
+
+    async def videos(self, video_ids: list, part: str = "contentDetails") -> dict:
+        """
+        Runs a videos.list request for the given video IDs.
+        """
+        return await self.get("/videos", {"part": part, "id": ",".join(video_ids)})
+
+    async def aclose(self):
+        """Closes the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        """
+        Returns the request counters of the client.
+        """
+        return {"base_url": self.base_url, "http2": self.http2, **self._counters,
+                "request_seconds": round(self._counters["request_seconds"], 3)}
+
+
+class ThreadedYouTubeClient:
+    """
+    The same interface as AsyncYouTubeClient, on top of the shared googleapiclient client run in worker threads.
+    """
+
+    def __init__(self, ledger: QuotaLedger):
+        self.ledger = ledger
+        self._counters = {"requests": 0, "request_seconds": 0.0}
+
+    async def _execute(self, endpoint: str, build_request) -> dict:
+        self.ledger.charge(endpoint)
+        request_start_time = time.monotonic()
+        self._counters["requests"] += 1
+        try:
+            return await asyncio.to_thread(lambda: build_request(get_youtube_service()).execute())
+        finally:
+            self._counters["request_seconds"] += time.monotonic() - request_start_time
+
+    async def search(self, topic: str, max_results: int, page_token: str = None, video_duration: str = "any") -> dict:
+        """
+        Runs a search.list request with the parameters used by the previews.
+        """
+        return await self._execute("search", lambda youtube_service: youtube_service.search().list(
+            q=topic,
+            part='snippet',
+            type='video',
+            order='relevance',
+            maxResults=max_results,
+            safeSearch='strict',
+            relevanceLanguage='en',
+            videoDuration=video_duration,
+            pageToken=page_token
+        ))
+
+    async def videos(self, video_ids: list, part: str = "contentDetails") -> dict:
+        """
+        Runs a videos.list request for the given video IDs.
+        """
+        return await self._execute("videos", lambda youtube_service: youtube_service.videos().list(
+            part=part, id=",".join(video_ids)))
+
+    async def aclose(self):
+        """Nothing to close, the transports belong to the worker threads."""
+
+    def stats(self) -> dict:
+        """
+        Returns the request counters of the client.
+        """
+        return {"base_url": None, "http2": False, **self._counters,
+                "request_seconds": round(self._counters["request_seconds"], 3)}
+
+
+if YOUTUBE_ASYNC_CLIENT:
+    youtube_client = AsyncYouTubeClient(YOUTUBE_API_KEY, YOUTUBE_API_BASE_URL, YOUTUBE_HTTP2, YOUTUBE_HTTP_TIMEOUT,
+                                        YOUTUBE_CONNECT_TIMEOUT, YOUTUBE_MAX_CONNECTIONS, YOUTUBE_MAX_RETRIES,
+                                        quota_ledger)
+else:
+    youtube_client = ThreadedYouTubeClient(quota_ledger)
@@ -0,0 +1,198 @@
+import os
+import asyncio
+import datetime
+import contextvars
+from contextlib import contextmanager
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException
+from app.database import database_connection
+from app.database.cruds.quota_crud import QuotaCRUD
+
+# Quota cost of one call of each YouTube Data API endpoint we use
+ENDPOINT_COSTS = {"search": 100, "videos": 1}
+# The YouTube quota resets at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+YOUTUBE_DAILY_QUOTA = int(os.getenv('YOUTUBE_DAILY_QUOTA', '10000'))
+# Share of the daily quota after which previews degrade to the reduced, then the cache-only mode
+YOUTUBE_QUOTA_REDUCED_AT = float(os.getenv('YOUTUBE_QUOTA_REDUCED_AT', '0.7'))
+YOUTUBE_QUOTA_CACHE_ONLY_AT = float(os.getenv('YOUTUBE_QUOTA_CACHE_ONLY_AT', '0.9'))
+YOUTUBE_QUOTA_FLUSH_INTERVAL = float(os.getenv('YOUTUBE_QUOTA_FLUSH_INTERVAL', '5'))
+
+# The usage counters of the `QuotaLedger.track` blocks the current task runs in
+tracked_usage = contextvars.ContextVar("tracked_quota_usage", default=())
+
+
+class QuotaLedger:
+    """
+    Ledger of the YouTube Data API quota used per endpoint and per day, with a daily budget.
+
+    Every call is charged before it is sent and refused once it would exceed the budget. Usage is
+    counted in memory and flushed to the `youtube_quota_usage` table every few seconds. Each flush
+    reloads the day's totals, so every worker also sees the calls made by the others.
+    The mode tells callers how to degrade as the budget depletes:
+    - "normal": everything is allowed.
+    - "reduced": fewer results are requested and stale cached searches are not refreshed.
+    - "cache_only": searches are only served from the cache.
+    """
+
+    def __init__(self, quota_crud: QuotaCRUD, daily_budget: int, reduced_at: float, cache_only_at: float,
+                 flush_interval: float):
+        self.quota_crud = quota_crud
+        self.daily_budget = daily_budget
+        self.reduced_at = reduced_at
+        self.cache_only_at = cache_only_at
+        self.flush_interval = flush_interval
+        self._day = None
+        self._usage = {}
+        self._pending = {}
+        self._flush_task = None
+        self._counters = {"refused_calls": 0, "flushes": 0, "flush_failures": 0}
+
+    @staticmethod
+    def today() -> str:
+        """Returns the current quota day, as a Pacific date."""
+        return datetime.datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def used_units(self) -> int:
+        """Returns the quota units used today."""
+        self._roll_day()
+        return sum(usage["units"] for usage in self._usage.values())
+
+    def mode(self) -> str:
+        """Returns "normal", "reduced" or "cache_only" depending on the share of today's budget already used."""
+        used_share = self.used_units() / self.daily_budget if self.daily_budget else 0.0
+        if used_share >= self.cache_only_at:
+            return "cache_only"
+        if used_share >= self.reduced_at:
+            return "reduced"
+        return "normal"
+
+    def charge(self, endpoint: str):
+        """
+        Records one call of an endpoint, refusing it if it would exceed today's budget.
+
+        Parameters:
+        - endpoint (str): The endpoint name, a key of ENDPOINT_COSTS.
+
+        Raises:
+        - HTTPException: 429 if the call would exceed the daily budget.
+        """
+        cost = ENDPOINT_COSTS[endpoint]
+        if self.daily_budget and self.used_units() + cost > self.daily_budget:
+            self._counters["refused_calls"] += 1
+            raise HTTPException(status_code=429, detail=f"The daily YouTube quota budget is used up, "
+                                                        f"it resets at midnight Pacific time")
+        usage = self._usage.setdefault(endpoint, {"calls": 0, "units": 0})
+        usage["calls"] += 1
+        usage["units"] += cost
+        pending = self._pending.setdefault((self._day, endpoint), {"calls": 0, "units": 0})
+        pending["calls"] += 1
+        pending["units"] += cost
+        for tracked in tracked_usage.get():
+            tracked["calls"] += 1
+            tracked["units"] += cost
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    @contextmanager
+    def track(self):
+        """
+        Counts the calls charged within the block, including those of the tasks it starts, apart from the
+        calls made meanwhile by other requests.
+
+        Yields:
+        - dict: The "calls" and "units" charged so far, updated as calls are made.
+        """
+        usage = {"calls": 0, "units": 0}
+        token = tracked_usage.set(tracked_usage.get() + (usage,))
+        try:
+            yield usage
+        finally:
+            tracked_usage.reset(token)
+
+    async def load(self):
+        """Loads today's usage from the database, as recorded by every worker."""
+        self._roll_day()
+        day = self._day
+        rows = await asyncio.to_thread(self.quota_crud.get_days, [day])
+        if day == self._day:
+            self._usage = self._merge_pending(day, rows)
+
+    async def flush(self):
+        """
+        Persists the usage counted since the last flush and reloads today's totals.
+        """
+        pending, self._pending = self._pending, {}
+        try:
+            for (day, endpoint), usage in pending.items():
+                await asyncio.to_thread(self.quota_crud.increment, day, endpoint, usage["calls"], usage["units"])
+                usage["calls"] = usage["units"] = 0
+            self._counters["flushes"] += 1
+        except Exception as e:
+            # Keep what was not persisted for the next flush
+            self._counters["flush_failures"] += 1
+            for key, usage in pending.items():
+                if usage["units"]:
+                    merged = self._pending.setdefault(key, {"calls": 0, "units": 0})
+                    merged["calls"] += usage["calls"]
+                    merged["units"] += usage["units"]
+            print(f"Could not persist the YouTube quota usage: {e}")
+            return
+        await self.load()
+
+    async def report(self, days: int = 7) -> dict:
+        """
+        Returns the budget, today's usage and mode, and the stored usage of the last `days` days.
+        """
+        today = datetime.date.fromisoformat(self.today())
+        history_days = [(today - datetime.timedelta(days=offset)).isoformat() for offset in range(days)]
+        rows = await asyncio.to_thread(self.quota_crud.get_days, history_days)
+        history = {}
+        for row in rows:
+            history.setdefault(row.day, {})[row.endpoint] = {"calls": row.calls, "units": row.units}
+        return {**self.stats(), "history": history}
+
+    def stats(self) -> dict:
+        """
+        Returns the budget, today's usage per endpoint and the current mode.
+        """
+        used_units = self.used_units()
+        return {
+            "day": self._day,
+            "daily_budget": self.daily_budget,
+            "used_units": used_units,
+            "remaining_units": max(0, self.daily_budget - used_units) if self.daily_budget else None,
+            "mode": self.mode(),
+            "endpoints": {endpoint: dict(usage) for endpoint, usage in self._usage.items()},
+            **self._counters,
+        }
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+        finally:
+            self._flush_task = None
+            if self._pending:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    def _roll_day(self):
+        today = self.today()
+        if today != self._day:
+            self._day = today
+            self._usage = {}
+
+    def _merge_pending(self, day: str, rows: list) -> dict:
+        usage = {row.endpoint: {"calls": row.calls, "units": row.units} for row in rows}
+        for (pending_day, endpoint), pending in self._pending.items():
+            if pending_day == day:
+                merged = usage.setdefault(endpoint, {"calls": 0, "units": 0})
+                merged["calls"] += pending["calls"]
+                merged["units"] += pending["units"]
+        return usage
+
+
+quota_ledger = QuotaLedger(QuotaCRUD(database_connection), YOUTUBE_DAILY_QUOTA, YOUTUBE_QUOTA_REDUCED_AT,
+                           YOUTUBE_QUOTA_CACHE_ONLY_AT, YOUTUBE_QUOTA_FLUSH_INTERVAL)
@@ -1,41 +1,88 @@
+import os
+import math
+import asyncio
 from isodate import parse_duration
 from fastapi import HTTPException
 from googleapiclient.errors import HttpError
 from app.schemas import Video
-from app.youtube_services import initialize_youtube_service
+from app.youtube_services.async_youtube_client import youtube_client
+from app.youtube_services.quota_ledger import quota_ledger, ENDPOINT_COSTS
+from app.main_processing_services.concurrency import ConcurrencyLimiter
+from app.cache_services.search_cache import search_cache, video_details_cache, normalize_query
+
+# A search page costs 100 quota units whatever its size, so pages are requested as large as the API allows
+YOUTUBE_SEARCH_PAGE_SIZE = int(os.getenv('YOUTUBE_SEARCH_PAGE_SIZE', '50'))
+# Search pages fetched at most per preview while filling it, and while the quota is in its reduced mode
+YOUTUBE_PREVIEW_MAX_PAGES = int(os.getenv('YOUTUBE_PREVIEW_MAX_PAGES', '3'))
+YOUTUBE_REDUCED_MAX_PAGES = int(os.getenv('YOUTUBE_REDUCED_MAX_PAGES', '1'))
+# Largest number of IDs accepted by one videos.list call
+VIDEOS_LIST_BATCH_SIZE = 50
+# Search calls in flight at once across every preview request of the process
+YOUTUBE_SEARCH_CONCURRENCY = int(os.getenv('YOUTUBE_SEARCH_CONCURRENCY', '8'))
+
+preview_search_limiter = ConcurrencyLimiter(YOUTUBE_SEARCH_CONCURRENCY)
+# Quota units one search page of a preview costs at most: the search, and the videos.list calls of its results
+PREVIEW_PAGE_MAX_UNITS = (ENDPOINT_COSTS["search"]
+                          + math.ceil(YOUTUBE_SEARCH_PAGE_SIZE / VIDEOS_LIST_BATCH_SIZE) * ENDPOINT_COSTS["videos"])
+
+
+def search_duration_bucket(min_duration: int, max_duration: int) -> str:
+    """
+    Returns the search.list videoDuration value matching a duration range, so the search itself drops
+    videos outside of it. The API only knows short (< 4 min), medium (4-20 min) and long (> 20 min)
+    videos, ranges spanning several of them are searched with "any" and filtered afterwards.
+    """
+    if max_duration <= 240:
+        return "short"
+    if min_duration >= 240 and max_duration <= 1200:
+        return "medium"
+    if min_duration >= 1200:
+        return "long"
+    return "any"
 
 
-def retrieve_youtube_search_results(youtube_service, topic: str, max_results: int) -> list:
+async def retrieve_youtube_search_results(youtube_client, topic: str, max_results: int, page_token: str = None,
+                                          video_duration: str = "any") -> list:
     """
     Retrieves a list of YouTube search results for a given topic.
+    Results are served from the search cache, keyed by the normalized topic and the search parameters.
+    As the daily quota budget depletes, stale entries are no longer refreshed, then only cached
+    searches are served.
     
     Parameters:
-    - youtube_service (object): The initialized YouTube service client.
+    - youtube_client (AsyncYouTubeClient): The YouTube Data API client.
     - topic (str): The search query or topic.
     - max_results (int): The maximum number of search results to return.
+    - page_token (str): The nextPageToken of the previous page, None for the first page.
+    - video_duration (str): The videoDuration search filter.
 
     Returns:
     - list: A list of search results from YouTube.
 
     Raises:
-    - HTTPException: If the search request fails.
+    - HTTPException: If the search request fails, or 503 if the quota only allows cached searches and
+      this one is not cached.
     """
     try:
-        search_request = youtube_service.search().list(
-            q=topic,
-            part='snippet',
-            type='video',
-            order='relevance',
-            maxResults=max_results,
-            safeSearch='strict',
-            relevanceLanguage='en'
-        )
-        search_response = search_request.execute()
+        quota_mode = quota_ledger.mode()
+        cache_key = ("search", normalize_query(topic), max_results, video_duration, page_token)
+        if quota_mode == "cache_only":
+            search_response = search_cache.peek(cache_key)
+            if search_response is None:
+                raise HTTPException(status_code=503, detail="The YouTube quota budget is nearly used up, "
+                                                            "only cached searches are served until the daily reset")
+        else:
+            search_response = await search_cache.get_or_fetch(cache_key,
+                                                              lambda: youtube_client.search(topic, max_results,
+                                                                                            page_token, video_duration),
+                                                              revalidate=quota_mode == "normal")
         
         if 'items' not in search_response:
             raise KeyError("The 'items' key is missing from the search response.")
         
         return search_response
+    except HTTPException:
+        raise
     except HttpError as http_err:
         raise HTTPException(status_code=500, detail=f"YouTube search API request failed: {http_err}")
     except KeyError as key_err:
@@ -63,12 +110,14 @@ def extract_ids_from_search_results(search_results: dict) -> list:
 
 
 
-def retrieve_youtube_video_details(youtube_service, video_ids: list) -> dict:
+async def retrieve_youtube_video_details(youtube_client, video_ids: list) -> dict:
     """
     Fetches details for a list of YouTube video IDs.
+    Durations are cached per video, the videos missing from the cache are looked up with as few
+    videos.list calls as possible, at most VIDEOS_LIST_BATCH_SIZE IDs each.
 
     Parameters:
-    - youtube_service (object): The initialized YouTube service client.
+    - youtube_client (AsyncYouTubeClient): The YouTube Data API client.
     - video_ids (list): A list of YouTube video IDs.
 
     Returns:
@@ -78,13 +127,25 @@ def retrieve_youtube_video_details(youtube_service, video_ids: list) -> dict:
     - HTTPException: If fetching video details fails.
     """
     try:
-        video_details_request = youtube_service.videos().list(
-            part="contentDetails",
-            id=",".join(video_ids)
-        )
-        video_details_response = video_details_request.execute()
-        return {item['id']: parse_duration(item['contentDetails']['duration']).total_seconds()
-                for item in video_details_response['items']}
+        video_details = {}
+        missing_video_ids = []
+        for video_id in dict.fromkeys(video_ids):
+            duration = video_details_cache.peek(("videos", video_id), max_age=video_details_cache.ttl_seconds)
+            if duration is None:
+                missing_video_ids.append(video_id)
+            else:
+                video_details[video_id] = duration
+
+        batches = [missing_video_ids[start:start + VIDEOS_LIST_BATCH_SIZE]
+                   for start in range(0, len(missing_video_ids), VIDEOS_LIST_BATCH_SIZE)]
+        for video_details_response in await asyncio.gather(*(youtube_client.videos(batch) for batch in batches)):
+            for item in video_details_response['items']:
+                duration = parse_duration(item['contentDetails']['duration']).total_seconds()
+                video_details_cache.put(("videos", item['id']), duration)
+                video_details[item['id']] = duration
+        return video_details
+    except HTTPException as exc:
+        raise HTTPException(status_code=exc.status_code, detail=f"Fetching video details failed: {exc.detail}")
     except Exception as exc:
         raise HTTPException(status_code=500, detail="Fetching video details failed: " + str(exc))
 
@@ -130,6 +191,7 @@ def format_video_data_for_display(video_ids: list, search_results: dict, video_d
     - HTTPException: If formatting the video data fails.
     """
     try:
+        video_ids = set(video_ids)
         formatted_video_data = []
         for item in search_results['items']:
             video_id = item['id']['videoId']
@@ -150,13 +212,105 @@ def format_video_data_for_display(video_ids: list, search_results: dict, video_d
 
 
 
-def return_filtered_and_formatted_videos(video: Video, max_results: int = 10) -> list:
+async def fill_previews(topics: list, max_results: int = 10, min_duration: int = 60,
+                        max_duration: int = 3600, max_pages: int = None) -> dict:
+    """
+    Builds the video previews of several topics, sharing the video details lookups between them.
+
+    The topics are filled in rounds. Each round fetches the next search page of every topic still short
+    of `max_results` videos, concurrently under the shared search limiter, then looks up the durations of
+    all the new videos of the round at once, in as few videos.list calls as possible. A topic is done
+    once `max_results` videos passed the duration filter or its results run out. The number of rounds
+    is capped at YOUTUBE_PREVIEW_MAX_PAGES, or YOUTUBE_REDUCED_MAX_PAGES when the quota is in its reduced
+    mode, and at `max_pages` when given. A page that the quota no longer allows ends its topic with the
+    videos found so far.
+
+    Parameters:
+    - topics (list): The search topics.
+    - max_results (int): The maximum number of videos per topic.
+    - min_duration (int): The minimum duration of the videos in seconds.
+    - max_duration (int): The maximum duration of the videos in seconds.
+    - max_pages (int): Optional lower cap of the search pages per topic.
+
+    Returns:
+    - dict: For each topic, the list of formatted videos, or the HTTPException that failed it.
+    """
+    mode_max_pages = YOUTUBE_REDUCED_MAX_PAGES if quota_ledger.mode() != "normal" else YOUTUBE_PREVIEW_MAX_PAGES
+    max_pages = mode_max_pages if max_pages is None else min(max_pages, mode_max_pages)
+    video_duration = search_duration_bucket(min_duration, max_duration)
+    states = {topic: {"videos": [], "seen_video_ids": set(), "page_token": None} for topic in dict.fromkeys(topics)}
+    results = {}
+
+    async def search_page(topic: str):
+        async with preview_search_limiter.slot():
+            return await retrieve_youtube_search_results(youtube_client, topic.lower(), YOUTUBE_SEARCH_PAGE_SIZE,
+                                                         states[topic]["page_token"], video_duration)
+
+    active_topics = list(states)
+    for page in range(max_pages):
+        if not active_topics:
+            break
+        search_responses = await asyncio.gather(*(search_page(topic) for topic in active_topics),
+                                                return_exceptions=True)
+
+        page_results = {}
+        for topic, search_response in zip(active_topics, search_responses):
+            if isinstance(search_response, HTTPException) and page and search_response.status_code in (429, 503):
+                results[topic] = states[topic]["videos"][:max_results]
+            elif isinstance(search_response, Exception):
+                results[topic] = search_response
+            elif not isinstance(search_response, dict) or 'items' not in search_response:
+                results[topic] = HTTPException(status_code=500, detail="Invalid search response format.")
+            else:
+                state = states[topic]
+                try:
+                    video_ids = [video_id for video_id in extract_ids_from_search_results(search_response)
+                                 if video_id not in state["seen_video_ids"]]
+                except HTTPException as exc:
+                    results[topic] = exc
+                    continue
+                state["seen_video_ids"].update(video_ids)
+                page_results[topic] = (search_response, video_ids)
+
+        try:
+            video_details = await retrieve_youtube_video_details(
+                youtube_client, [video_id for _, video_ids in page_results.values() for video_id in video_ids])
+        except HTTPException as exc:
+            results.update({topic: exc for topic in page_results})
+            page_results = {}
+
+        active_topics = []
+        for topic, (search_response, video_ids) in page_results.items():
+            state = states[topic]
+            topic_video_details = {video_id: video_details[video_id] for video_id in video_ids
+                                   if video_id in video_details}
+            filtered_video_ids = filter_videos_by_duration(topic_video_details, min_duration, max_duration)
+            state["videos"].extend(format_video_data_for_display(filtered_video_ids, search_response,
+                                                                 topic_video_details))
+            state["page_token"] = search_response.get('nextPageToken')
+            if len(state["videos"]) >= max_results or not state["page_token"]:
+                results[topic] = state["videos"][:max_results]
+            else:
+                active_topics.append(topic)
+
+    for topic in active_topics:
+        results[topic] = states[topic]["videos"][:max_results]
+    return results
+
+
+async def return_filtered_and_formatted_videos(video: Video, max_results: int = 10, min_duration: int = 60,
+                                               max_duration: int = 3600) -> list:
     """
     Orchestrates the process of filtering and formatting video previews based on a search topic.
 
+    Search pages are fetched one after the other until `max_results` videos pass the duration filter,
+    see `fill_previews`.
+
     Parameters:
     - video (Video): An instance of Video schema containing the search topic.
     - max_results (int): The maximum number of videos to return after filtering.
+    - min_duration (int): The minimum duration of the videos in seconds.
+    - max_duration (int): The maximum duration of the videos in seconds.
 
     Returns:
     - list: A list of filtered and formatted video data for previews.
@@ -165,18 +319,36 @@ def return_filtered_and_formatted_videos(video: Video, max_results: int = 10) ->
     - HTTPException: If any step in the process fails.
     """
     try:
-        youtube_service = initialize_youtube_service()
-        search_response = retrieve_youtube_search_results(youtube_service, video.video.lower(), max_results)
-        
-        if not isinstance(search_response, dict) or 'items' not in search_response:
-            raise ValueError("Invalid search response format.")
-        
-        video_ids = extract_ids_from_search_results(search_response)
-        video_details = retrieve_youtube_video_details(youtube_service, video_ids)
-        
-        filtered_video_ids = filter_videos_by_duration(video_details)
-        videos_data = format_video_data_for_display(filtered_video_ids, search_response, video_details) 
-        
-        return videos_data[:max_results]
-    except (HTTPException, ValueError) as exc:
+        videos_data = (await fill_previews([video.video], max_results, min_duration, max_duration))[video.video]
+        if isinstance(videos_data, Exception):
+            raise videos_data
+        return videos_data
+    except HTTPException as exc:
+        # Quota errors keep their 429/503 status so clients can tell them from failures
+        raise HTTPException(status_code=exc.status_code, detail=f"Failed to return video previews: {exc.detail}")
+    except ValueError as exc:
         raise HTTPException(status_code=500, detail=f"Failed to return video previews: {exc}")
+
+
+async def return_batch_video_previews(topics: list, max_results: int = 10) -> list:
+    """
+    Builds the video previews of several topics in one go.
+
+    Parameters:
+    - topics (list): The search topics.
+    - max_results (int): The maximum number of videos per topic.
+
+    Returns:
+    - list: One dictionary per topic, in the order of the request, with the topic, its videos and the
+      error that failed it, if any.
+    """
+    results = await fill_previews(topics, max_results)
+    previews = []
+    for topic in topics:
+        result = results[topic]
+        if isinstance(result, Exception):
+            detail = result.detail if isinstance(result, HTTPException) else str(result)
+            previews.append({"topic": topic, "videos": [], "error": detail})
+        else:
+            previews.append({"topic": topic, "videos": result, "error": None})
+    return previews
@@ -0,0 +1,139 @@
+"""
+Compares the reuse check on the unindexed deployment_video column with the hash index and the Bloom filter.
+
+Run from the backend directory:
+
+    python -m benchmarks.deployment_lookup_benchmark --rows 1000000
+
+The script fills a SQLite copy of the deployments table with random video sets, then times lookups of
+stored sets (hits) and of new ones (misses) through each path:
+- the previous check, an equality filter on the unindexed deployment_video column, which scans the table,
+- the index seek on deployment_video_hash,
+- the Bloom filter in front of the index seek, which answers the misses without a query.
+It needs no MySQL server and no API key. MySQL has the same plans, a full scan against a B-tree seek.
+"""
+import os
+import time
+import random
+import string
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+from app.cache_services.bloom_filter import BloomFilter
+
+VIDEO_ID_CHARACTERS = string.ascii_letters + string.digits + "-_"
+
+
+def random_video_set(generator: random.Random) -> list:
+    return ["".join(generator.choices(VIDEO_ID_CHARACTERS, k=11)) for _ in range(generator.randint(1, 5))]
+
+
+def video_set_hash(video_ids: list) -> str:
+    """The key of app.main_processing_services.utils.video_set_hash, without importing the LLM clients."""
+    return hashlib.sha256(' '.join(sorted(set(video_ids))).encode("utf-8")).hexdigest()
+
+
+def build_table(connection: sqlite3.Connection, rows: int, generator: random.Random) -> list:
+    connection.execute("CREATE TABLE deployments (id INTEGER PRIMARY KEY, deployment_name VARCHAR(255) NOT NULL, "
+                       "deployment_video TEXT NOT NULL, deployment_video_hash CHAR(64), user_id INTEGER, "
+                       "blog_id INTEGER)")
+    stored_sets = []
+    batch = []
+    for row_id in range(1, rows + 1):
+        video_ids = random_video_set(generator)
+        if len(stored_sets) < 10000:
+            stored_sets.append(video_ids)
+        batch.append((row_id, f"deployment_{row_id}", ' '.join(sorted(video_ids)), video_set_hash(video_ids), 1,
+                      row_id))
+        if len(batch) == 50000:
+            connection.executemany("INSERT INTO deployments VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    connection.executemany("INSERT INTO deployments VALUES (?, ?, ?, ?, ?, ?)", batch)
+    connection.execute("CREATE UNIQUE INDEX ix_deployments_deployment_video_hash ON deployments (deployment_video_hash)")
+    connection.commit()
+    return stored_sets
+
+
+def time_lookups(lookup, video_sets: list) -> tuple:
+    timings = []
+    found = 0
+    for video_ids in video_sets:
+        start_time = time.perf_counter()
+        if lookup(video_ids) is not None:
+            found += 1
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return timings, found
+
+
+def report(label: str, timings: list, found: int):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(f"{label:<32} mean {statistics.mean(timings):9.4f} ms   p50 {statistics.median(timings):9.4f} ms   "
+          f"p95 {p95:9.4f} ms   found {found}/{len(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups per indexed path")
+    parser.add_argument("--scan-lookups", type=int, default=20, help="lookups through the full scan, which is slow")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    directory = tempfile.mkdtemp()
+    connection = sqlite3.connect(os.path.join(directory, "deployments.db"))
+
+    start_time = time.perf_counter()
+    stored_sets = build_table(connection, args.rows, generator)
+    print(f"Stored {args.rows} deployments in {time.perf_counter() - start_time:.1f} s")
+
+    start_time = time.perf_counter()
+    bloom = BloomFilter(max(args.rows, 1) * 2, 0.01)
+    for (hash_value,) in connection.execute("SELECT deployment_video_hash FROM deployments ORDER BY id"):
+        bloom.add(hash_value)
+    print(f"Loaded the Bloom filter ({len(bloom.bits) / 1024 / 1024:.1f} MiB, {bloom.hash_count} hashes) in "
+          f"{time.perf_counter() - start_time:.1f} s\n")
+
+    hits = [generator.choice(stored_sets) for _ in range(args.lookups)]
+    misses = [random_video_set(generator) for _ in range(args.lookups)]
+
+    def scan(video_ids):
+        return connection.execute("SELECT id FROM deployments WHERE deployment_video = ?",
+                                  (' '.join(sorted(video_ids)),)).fetchone()
+
+    def index_seek(video_ids):
+        return connection.execute("SELECT id FROM deployments WHERE deployment_video_hash = ?",
+                                  (video_set_hash(video_ids),)).fetchone()
+
+    queries = 0
+
+    def filtered_index_seek(video_ids):
+        nonlocal queries
+        hash_value = video_set_hash(video_ids)
+        if hash_value not in bloom:
+            return None
+        queries += 1
+        return connection.execute("SELECT id FROM deployments WHERE deployment_video_hash = ?",
+                                  (hash_value,)).fetchone()
+
+    report("unindexed scan, hits", *time_lookups(scan, hits[:args.scan_lookups]))
+    report("unindexed scan, misses", *time_lookups(scan, misses[:args.scan_lookups]))
+    report("hash index, hits", *time_lookups(index_seek, hits))
+    report("hash index, misses", *time_lookups(index_seek, misses))
+    report("Bloom filter + index, hits", *time_lookups(filtered_index_seek, hits))
+    queries_before_misses = queries
+    report("Bloom filter + index, misses", *time_lookups(filtered_index_seek, misses))
+    print(f"\nMisses that still reached the database through the Bloom filter: "
+          f"{queries - queries_before_misses}/{len(misses)}")
+
+    connection.close()
+    os.remove(os.path.join(directory, "deployments.db"))
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
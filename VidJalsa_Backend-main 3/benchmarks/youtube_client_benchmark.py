@@ -0,0 +1,71 @@
+"""
+Compares building the YouTube Data API client per request with reusing the cached client.
+
+Run from the backend directory:
+
+    python -m benchmarks.youtube_client_benchmark --iterations 50
+    python -m benchmarks.youtube_client_benchmark --iterations 20 --live
+
+The offline part times the client construction alone. With --live, the script also sends a cheap
+videos.list call (1 quota unit per call) through each path, which adds the connection setup that a
+new transport pays on every request. The live part needs a real YOUTUBE_API_KEY.
+"""
+import os
+import time
+import argparse
+import statistics
+
+# The offline benchmark never calls the API, any key lets the module import
+os.environ.setdefault('YOUTUBE_API_KEY', 'benchmark-key')
+
+from googleapiclient.discovery import build
+from app.youtube_services import YOUTUBE_API_KEY, get_youtube_service
+
+SAMPLE_VIDEO_ID = "dQw4w9WgXcQ"
+
+
+def build_per_request():
+    """The previous behaviour: a new client, and a new transport, for every request."""
+    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+
+
+def time_calls(function, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(f"{label:<32} mean {statistics.mean(timings):9.3f} ms   p50 {statistics.median(timings):9.3f} ms   "
+          f"p95 {p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="also time a real videos.list call through each path")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    get_youtube_service()
+    print(f"First build of the cached client: {(time.perf_counter() - start_time) * 1000:.3f} ms\n")
+
+    report("build per request", time_calls(build_per_request, args.iterations))
+    report("cached client", time_calls(get_youtube_service, args.iterations))
+
+    if args.live:
+        def list_video(service):
+            service.videos().list(part="id", id=SAMPLE_VIDEO_ID).execute()
+
+        print()
+        report("build + videos.list", time_calls(lambda: list_video(build_per_request()), args.iterations))
+        report("cached + videos.list", time_calls(lambda: list_video(get_youtube_service()), args.iterations))
+
+
+if __name__ == "__main__":
+    main()
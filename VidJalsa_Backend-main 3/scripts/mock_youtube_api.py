@@ -0,0 +1,107 @@
+"""
+Local stand-in for the YouTube Data API endpoints used by the previews.
+
+Run it from the backend directory and point the backend at it:
+
+    python scripts/mock_youtube_api.py --port 8090 --latency 0.2
+    YOUTUBE_API_BASE_URL=http://127.0.0.1:8090/youtube/v3 uvicorn app.main:app
+
+search.list returns `maxResults` deterministic videos for any query, paged with pageToken over
+--total-results results, and videos.list returns a duration for every requested ID. --latency adds a delay to every response and --error-rate makes that share
+of the responses fail with HTTP 503, to exercise the client retries.
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+API_PREFIX = "/youtube/v3"
+
+
+def fake_video_id(query: str, index: int) -> str:
+    return hashlib.sha1(f"{query}:{index}".encode("utf-8")).hexdigest()[:11]
+
+
+def search_response(params: dict, total_results: int) -> dict:
+    query = params.get("q", [""])[0]
+    max_results = int(params.get("maxResults", ["5"])[0])
+    offset = int(params.get("pageToken", ["0"])[0])
+    items = []
+    for index in range(offset, min(offset + max_results, total_results)):
+        video_id = fake_video_id(query, index)
+        items.append({
+            "kind": "youtube#searchResult",
+            "id": {"kind": "youtube#video", "videoId": video_id},
+            "snippet": {
+                "title": f"{query} video {index + 1}",
+                "thumbnails": {"high": {"url": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}},
+            },
+        })
+    response = {"kind": "youtube#searchListResponse",
+                "pageInfo": {"totalResults": total_results, "resultsPerPage": max_results}, "items": items}
+    if offset + max_results < total_results:
+        response["nextPageToken"] = str(offset + max_results)
+    return response
+
+
+def videos_response(params: dict, total_results: int) -> dict:
+    video_ids = [video_id for video_id in params.get("id", [""])[0].split(",") if video_id]
+    items = []
+    for video_id in video_ids:
+        # Between 30 seconds and 2 hours, so the duration filter drops some videos
+        seconds = 30 + int(hashlib.sha1(video_id.encode("utf-8")).hexdigest(), 16) % 7200
+        items.append({
+            "kind": "youtube#video",
+            "id": video_id,
+            "contentDetails": {"duration": f"PT{seconds // 3600}H{seconds % 3600 // 60}M{seconds % 60}S"},
+        })
+    return {"kind": "youtube#videoListResponse", "items": items}
+
+
+class MockYouTubeHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    total_results = 200
+    routes = {f"{API_PREFIX}/search": search_response, f"{API_PREFIX}/videos": videos_response}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        route = self.routes.get(url.path)
+        time.sleep(self.latency)
+        if route is None:
+            return self._send(404, {"error": {"code": 404, "message": f"Unknown endpoint {url.path}"}})
+        if random.random() < self.error_rate:
+            return self._send(503, {"error": {"code": 503, "message": "Backend Error"}})
+        self._send(200, route(parse_qs(url.query), self.total_results))
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of responses failing with HTTP 503")
+    parser.add_argument("--total-results", type=int, default=200, help="search results available per query")
+    args = parser.parse_args()
+
+    MockYouTubeHandler.latency = args.latency
+    MockYouTubeHandler.error_rate = args.error_rate
+    MockYouTubeHandler.total_results = args.total_results
+    server = ThreadingHTTPServer((args.host, args.port), MockYouTubeHandler)
+    print(f"Mock YouTube Data API on http://{args.host}:{args.port}{API_PREFIX}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()